@@ -0,0 +1,56 @@
+"""
+Compares the match-based tree interpreter with the closure compiler on a
+tight `while a < x do { ... }` loop.
+
+    poetry run python benchmarks/bench_closures.py [iterations]
+"""
+import sys
+import time
+
+from compiler.closure_compiler import compile_closures
+from compiler.interpreter import interpret
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+
+
+def loop_program(iterations: int) -> str:
+    return f"""
+    {{
+        var a = 0;
+        var x = {iterations};
+        var acc = 0;
+        while a < x do {{
+            var asd = 2;
+            acc = acc + asd * a;
+            a = a + 1;
+        }}
+        acc
+    }}
+    """
+
+
+def best_of(repeats: int, run) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    tree = parse(Tokenizer.tokenize(loop_program(iterations)))
+    program = compile_closures(tree)
+    assert program() == interpret(tree)
+
+    tree_time = best_of(3, lambda: interpret(tree))
+    closure_time = best_of(3, program)
+    print(f"iterations:       {iterations}")
+    print(f"tree interpreter: {tree_time:.3f} s")
+    print(f"closures:         {closure_time:.3f} s")
+    print(f"speedup:          {tree_time / closure_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Compares two result files written by the `bench` command, phase by phase.
+Ratios above 1 mean the new run is slower.
+
+    poetry run python -m compiler bench --output=old.json
+    # ... change the compiler ...
+    poetry run python -m compiler bench --output=new.json
+    poetry run python benchmarks/compare.py old.json new.json
+"""
+import json
+import sys
+
+
+def key(benchmark: dict) -> tuple:
+    return (benchmark['name'], benchmark['size'])
+
+
+def main() -> int:
+    if len(sys.argv) != 3:
+        print(__doc__.strip(), file=sys.stderr)
+        return 1
+    with open(sys.argv[1]) as f:
+        old = json.load(f)
+    with open(sys.argv[2]) as f:
+        new = json.load(f)
+    if old['version'] != new['version']:
+        print("Error: result files have different format versions", file=sys.stderr)
+        return 1
+
+    old_benchmarks = {key(b): b for b in old['benchmarks']}
+    phases = list(new['benchmarks'][0]['phases']) if new['benchmarks'] else []
+    print(f"{'benchmark':<24} {'size':>8}" + ''.join(f' {p:>10}' for p in phases))
+    for b in new['benchmarks']:
+        previous = old_benchmarks.get(key(b))
+        if previous is None:
+            continue
+        ratios = [b['phases'][p]['median'] / previous['phases'][p]['median'] for p in phases]
+        size = '' if b['size'] is None else str(b['size'])
+        print(f"{b['name']:<24} {size:>8}" + ''.join(f' {r:>9.2f}x' for r in ratios))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
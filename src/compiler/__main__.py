@@ -1,58 +1,456 @@
+import contextlib
+import io
+import os
 import sys
-from compiler import type_checker
+from typing import TYPE_CHECKING, Iterable, TextIO
 
-from compiler.tokenizer import Tokenizer
-from compiler.parser import parse # name overrides stdlib parser
+# Compiler modules are imported where they are first needed, so that
+# `--help` and small programs don't pay for loading the whole compiler.
+if TYPE_CHECKING:
+    from compiler import ast, ir
+    from compiler.diagnostics import Diagnostic
+    from compiler.tokenizer import Token
 
 # TODO(student): add more commands as needed
 usage = f"""
-Usage: {sys.argv[0]} <command> [source_code_file]
+Usage: {sys.argv[0]} <command> [source_code_file...]
+
+Command 'check':
+    Tokenizes, parses and typechecks the source code without running it,
+    reporting every syntax and type error instead of only the first.
 
 Command 'interpret':
     Runs the interpreter on source code.
 
+    --engine=ENGINE         Execution engine: 'closures' (default) compiles
+                            the program into Python closures first, 'tree'
+                            walks the AST directly, 'ir' lowers it to IR
+                            and runs that on the bytecode VM, 'python'
+                            translates it into a Python function compiled
+                            to CPython bytecode.
+    --exec-profile=PREFIX   Count how often every node ('tree') or IR
+                            instruction ('ir') runs and time every while
+                            loop body. Writes the source annotated with
+                            the counts to PREFIX.listing, the profiled IR
+                            to PREFIX.ir.listing and flamegraph.pl input
+                            to PREFIX.folded. The 'closures' engine
+                            falls back to 'tree'.
+    --max-steps=N           Stop the program with an error after N loop
+                            iterations and function calls in total.
+    --max-scope-depth=N     Refuse to run programs nesting blocks more than
+                            N deep.
+    --max-variables=N       Refuse to run programs that can have more than
+                            N variables declared at once.
+    --timeout=SECONDS       Stop the program with an error once it has run
+                            for SECONDS. The limits need the 'closures' or
+                            'tree' engine; with any of them set, 'closures'
+                            doesn't vectorize loops.
+
+Command 'ir':
+    Prints the IR of the source code.
+
+Command 'asm':
+    Prints the x86-64 assembly of the source code.
+
+Command 'compile':
+    Compiles the source code into a standalone x86-64 Linux executable
+    using the system `as` and `ld`.
+
+    --output=FILE           Output executable. Defaults to 'a.out'.
+
+Command 'bench':
+    Times tokenizing, parsing, typechecking and executing synthetic programs
+    of growing size, or the given source files, and prints the results as
+    JSON. A table of median times goes to standard error.
+
+    --only=NAME,...         Run only these workloads: nested_blocks,
+                            expression_chain, large_loop, many_variables.
+    --warmups=N             Untimed runs before measuring. Defaults to 1.
+    --repeats=N             Timed runs per phase. Defaults to 5.
+    --scale=FACTOR          Multiply every workload size by FACTOR.
+    --engine=ENGINE         Engine for the execute phase, as for 'interpret'.
+    --output=FILE           Write the JSON to FILE instead of standard output.
+
+Command 'serve':
+    Keeps the compiler loaded in a daemon listening on a Unix socket. Run
+    `python -m compiler.client <command> [arguments...]` to send source code
+    to it instead of starting the compiler anew for every program.
+
+    --socket=PATH           Socket to listen on. Defaults to
+                            $XDG_RUNTIME_DIR/compiler.sock, or
+                            /tmp/compiler-UID.sock without XDG_RUNTIME_DIR.
+
 Common arguments:
     source_code_file        Optional. Defaults to standard input if missing.
+                            'check' and 'interpret' also accept several
+                            files, directories (searched recursively for
+                            *.txt) or glob patterns, and then process them
+                            in parallel and print a summary.
+    --jobs=N                Worker processes for multiple files. Defaults to
+                            the number of available cores.
+    -O0                     Disable the constant folding and simplification
+                            pass that runs after type checking, the SSA
+                            optimization passes run on the IR, register
+                            allocation in the native backend and running
+                            counted loops as NumPy array operations in the
+                            'closures' engine.
+    --pass-stats            Print how many instructions each IR pass removed
+                            to standard error.
+    --no-cache              Always tokenize, parse and typecheck from scratch
+                            instead of reusing type-checked trees cached in
+                            ~/.cache/compiler. The cache is only used if that
+                            directory is yours and only you can write to it.
+    --emit-ast=FILE         Write the type-checked tree to FILE in a compact
+                            binary format.
+    --load-ast=FILE         Read a tree written by --emit-ast instead of
+                            tokenizing, parsing and typechecking source code.
+    --timings               Print the wall time, memory allocated and number
+                            of tokens, nodes or instructions of every stage
+                            to standard error.
+    --profile=FILE          Write cProfile data for the whole run to FILE,
+                            for use with `python -m pstats FILE`.
  """.strip() + "\n"
 
 
-def main() -> int:
+def main(argv: list[str] | None = None, source_code: str | None = None) -> int:
+    """
+    Runs the command line `argv` (default: sys.argv[1:]). When `source_code`
+    is given, it is compiled in place of standard input.
+    """
     command: str | None = None
-    input_file: str | None = None
-    for arg in sys.argv[1:]:
+    input_files: list[str] = []
+    jobs: int | None = None
+    engine = 'closures'
+    output_file: str | None = None
+    bench_names: list[str] | None = None
+    warmups = 1
+    repeats = 5
+    scale = 1.0
+    use_cache = True
+    optimization_level = 1
+    pass_stats = False
+    timings = False
+    profile_file: str | None = None
+    exec_profile: str | None = None
+    socket_path: str | None = None
+    emit_ast: str | None = None
+    load_ast: str | None = None
+    max_steps: int | None = None
+    max_scope_depth: int | None = None
+    max_variables: int | None = None
+    timeout: float | None = None
+    for arg in sys.argv[1:] if argv is None else argv:
         if arg in ['-h', '--help']:
             print(usage)
             return 0
+        elif arg.startswith('--engine='):
+            engine = arg.split('=', 1)[1]
+        elif arg.startswith('--output='):
+            output_file = arg.split('=', 1)[1]
+        elif arg.startswith('--only='):
+            bench_names = arg.split('=', 1)[1].split(',')
+        elif arg.startswith('--warmups='):
+            warmups = int(arg.split('=', 1)[1])
+        elif arg.startswith('--repeats='):
+            repeats = int(arg.split('=', 1)[1])
+        elif arg.startswith('--scale='):
+            scale = float(arg.split('=', 1)[1])
+        elif arg.startswith('--jobs='):
+            jobs = int(arg.split('=', 1)[1])
+        elif arg in ['-O0', '-O1']:
+            optimization_level = int(arg[2:])
+        elif arg == '--pass-stats':
+            pass_stats = True
+        elif arg == '--timings':
+            timings = True
+        elif arg.startswith('--profile='):
+            profile_file = arg.split('=', 1)[1]
+        elif arg.startswith('--exec-profile='):
+            exec_profile = arg.split('=', 1)[1]
+        elif arg.startswith('--socket='):
+            socket_path = arg.split('=', 1)[1]
+        elif arg.startswith('--emit-ast='):
+            emit_ast = arg.split('=', 1)[1]
+        elif arg.startswith('--load-ast='):
+            load_ast = arg.split('=', 1)[1]
+        elif arg.startswith('--max-steps='):
+            max_steps = int(arg.split('=', 1)[1])
+        elif arg.startswith('--max-scope-depth='):
+            max_scope_depth = int(arg.split('=', 1)[1])
+        elif arg.startswith('--max-variables='):
+            max_variables = int(arg.split('=', 1)[1])
+        elif arg.startswith('--timeout='):
+            timeout = float(arg.split('=', 1)[1])
+        elif arg == '--no-cache':
+            use_cache = False
         elif arg.startswith('-'):
             raise Exception(f"Unknown argument: {arg}")
         elif command is None:
             command = arg
-        elif input_file is None:
-            input_file = arg
         else:
-            raise Exception("Multiple input files not supported")
-
-    def read_source_code() -> str:
-        if input_file is not None:
-            with open(input_file) as f:
-                return f.read()
-        else:
-            return sys.stdin.read()
+            input_files.append(arg)
 
     if command is None:
         print(f"Error: command argument missing\n\n{usage}", file=sys.stderr)
         return 1
 
-    if command == 'interpret':
-        source_code = read_source_code()
-        tokenized_code = Tokenizer.tokenize(source_code=source_code)
-        parsed = parse(tokens=tokenized_code)
-        #print(parsed)
-        type_checker.typecheck(parsed)
-    else:
-        print(f"Error: unknown command: {command}\n\n{usage}", file=sys.stderr)
-        return 1
-    return 0
+    if command == 'serve':
+        from compiler import server
+        server.serve(socket_path)
+        return 0
+
+    from compiler.metrics import Instrumentation, load_hooks
+
+    input_file = input_files[0] if input_files else None
+    metrics = Instrumentation(load_hooks(), track_memory=timings, collect=timings)
+    # Kept when read in full, for the execution profile's annotated listing.
+    source_text: str | None = None
+
+    def open_source_code() -> contextlib.AbstractContextManager[TextIO]:
+        if input_file is not None:
+            return open(input_file)
+        elif source_code is not None:
+            return io.StringIO(source_code)
+        else:
+            return contextlib.nullcontext(sys.stdin)
+
+    def parse_source_code() -> 'ast.Expression':
+        parsed = typecheck_source_code()
+        if optimization_level > 0:
+            from compiler import ast
+            from compiler.optimizer import optimize
+            with metrics.stage('optimize', unit='nodes') as stage:
+                parsed = optimize(parsed)
+                stage.count = lambda: len(ast.walk(parsed))
+        return parsed
+
+    def typecheck_source_code(diagnostics: list['Diagnostic'] | None = None) -> 'ast.Expression':
+        """
+        The type-checked tree. With `diagnostics`, errors are collected
+        there and the tree is only usable if none were found.
+        """
+        if load_ast is not None:
+            from compiler import ast, ast_binary
+            with metrics.stage('load-ast', unit='nodes') as stage:
+                parsed = ast_binary.load(load_ast)
+                stage.count = lambda: len(ast.walk(parsed))
+        else:
+            parsed = read_and_typecheck(diagnostics)
+        if emit_ast is not None and not diagnostics:
+            from compiler import ast_binary
+            with metrics.stage('emit-ast'):
+                ast_binary.dump(parsed, emit_ast)
+        return parsed
+
+    def read_and_typecheck(diagnostics: list['Diagnostic'] | None) -> 'ast.Expression':
+        from compiler import ast
+        from compiler.parser import parse  # name overrides stdlib parser
+        from compiler.tokenizer import Tokenizer
+        from compiler.type_checker import typecheck
+
+        nonlocal source_text
+        cache = None
+        if use_cache:
+            from compiler.cache import CompilationCache
+            cache = CompilationCache()
+        if not metrics.enabled and exec_profile is None:
+            # Tokens are streamed from the file straight into the parser. With
+            # the cache, a seekable file is first hashed a chunk at a time and
+            # then read again; anything else is read into memory below.
+            with open_source_code() as f:
+                if cache is None or f.seekable():
+                    key = None
+                    if cache is not None:
+                        key = cache.file_key(f)
+                        cached = cache.load_key(key)
+                        if cached is not None:
+                            return cached
+                        f.seek(0)
+                    parsed = parse(tokens=Tokenizer.iter_tokens(f), diagnostics=diagnostics)
+                    typecheck(parsed, diagnostics=diagnostics)
+                    if cache is not None and key is not None and not diagnostics:
+                        cache.store_key(key, parsed)
+                    return parsed
+
+        with metrics.stage('read', unit='chars') as stage:
+            with open_source_code() as f:
+                source_code = f.read()
+            stage.count = lambda: len(source_code)
+        source_text = source_code
+        if cache is not None:
+            with metrics.stage('cache-load', unit='nodes') as stage:
+                cached = cache.load(source_code)
+                stage.count = lambda: len(ast.walk(cached)) if cached is not None else 0
+            if cached is not None:
+                return cached
+        if metrics.enabled:
+            # Materialize the tokens so tokenizing is timed on its own.
+            with metrics.stage('tokenize', unit='tokens') as stage:
+                token_list = Tokenizer.tokenize(source_code)
+                stage.count = lambda: len(token_list)
+            tokens: Iterable['Token'] = token_list
+        else:
+            tokens = Tokenizer.iter_tokens(source_code)
+        with metrics.stage('parse', unit='nodes') as stage:
+            parsed = parse(tokens=tokens, diagnostics=diagnostics)
+            stage.count = lambda: len(ast.walk(parsed))
+        with metrics.stage('typecheck', unit='nodes') as stage:
+            typecheck(parsed, diagnostics=diagnostics)
+            stage.count = lambda: len(ast.walk(parsed))
+        if cache is not None and not diagnostics:
+            with metrics.stage('cache-store'):
+                cache.store(source_code, parsed)
+        return parsed
+
+    def generate_optimized_ir(parsed: 'ast.Expression') -> 'ir.IRProgram':
+        from compiler.ir_generator import generate_ir
+        from compiler.ir_optimizer import PassManager
+
+        with metrics.stage('lower', unit='instructions') as stage:
+            program = generate_ir(parsed)
+            stage.count = lambda: len(program.instructions)
+        if optimization_level == 0:
+            return program
+        pass_manager = PassManager()
+        with metrics.stage('ir-passes', unit='instructions') as stage:
+            optimized = pass_manager.run(program)
+            stage.count = lambda: len(optimized.instructions)
+        if pass_stats:
+            print(pass_manager.report(), file=sys.stderr)
+        return optimized
+
+    def profile_execution(parsed: 'ast.Expression', prefix: str) -> None:
+        from compiler import execution_profiler
+
+        with metrics.stage('execute'):
+            if engine == 'ir':
+                _, profile = execution_profiler.profile_ir(generate_optimized_ir(parsed))
+            else:
+                _, profile = execution_profiler.profile_tree(parsed)
+        if source_text is not None:
+            with open(f'{prefix}.listing', 'w') as f:
+                f.write(execution_profiler.annotate_source(source_text, profile))
+        if profile.instructions:
+            with open(f'{prefix}.ir.listing', 'w') as f:
+                f.write(execution_profiler.annotate_ir(profile))
+        with open(f'{prefix}.folded', 'w') as f:
+            f.write(execution_profiler.folded_stacks(profile))
+
+    def run_command() -> int:
+        if command == 'check':
+            diagnostics: list['Diagnostic'] = []
+            typecheck_source_code(diagnostics)
+            for diagnostic in diagnostics:
+                print(f"Error: {diagnostic}", file=sys.stderr)
+            if diagnostics:
+                return 1
+        elif command == 'interpret':
+            parsed = parse_source_code()
+            if any(limit is not None for limit in [max_steps, max_scope_depth, max_variables, timeout]):
+                from compiler.sandbox import (Limits, ResourceLimitExceeded,
+                                              run_governed)
+                if engine not in ['closures', 'tree']:
+                    print(f"Error: resource limits need --engine=closures or --engine=tree\n\n{usage}",
+                          file=sys.stderr)
+                    return 1
+                try:
+                    with metrics.stage('execute'):
+                        run_governed(parsed, Limits(max_steps, max_scope_depth, max_variables, timeout), engine)
+                except ResourceLimitExceeded as e:
+                    print(f"Error: {e}", file=sys.stderr)
+                    return 1
+            elif exec_profile is not None and engine in ['closures', 'tree', 'ir']:
+                profile_execution(parsed, exec_profile)
+            elif engine == 'closures':
+                from compiler.closure_compiler import compile_closures
+                with metrics.stage('closures'):
+                    program = compile_closures(parsed, vectorize=optimization_level > 0)
+                with metrics.stage('execute'):
+                    program()
+            elif engine == 'tree':
+                from compiler.interpreter import interpret
+                with metrics.stage('execute'):
+                    interpret(parsed)
+            elif engine == 'python':
+                from compiler.transpiler import compile_python
+                with metrics.stage('transpile'):
+                    function = compile_python(parsed)
+                with metrics.stage('execute'):
+                    function()
+            elif engine == 'ir':
+                from compiler import vm
+                program_ir = generate_optimized_ir(parsed)
+                with metrics.stage('execute'):
+                    vm.execute(program_ir)
+            else:
+                print(f"Error: unknown engine: {engine}\n\n{usage}", file=sys.stderr)
+                return 1
+        elif command == 'ir':
+            parsed = parse_source_code()
+            print(generate_optimized_ir(parsed))
+        elif command in ['asm', 'compile']:
+            from compiler.assembler import assemble_and_link
+            from compiler.assembly_generator import generate_assembly
+            parsed = parse_source_code()
+            program_ir = generate_optimized_ir(parsed)
+            with metrics.stage('codegen', unit='lines') as stage:
+                assembly_code = generate_assembly(program_ir, allocate=optimization_level > 0)
+                stage.count = lambda: assembly_code.count('\n')
+            if command == 'asm':
+                print(assembly_code)
+            else:
+                with metrics.stage('assemble'):
+                    assemble_and_link(assembly_code, output_file or 'a.out')
+        else:
+            print(f"Error: unknown command: {command}\n\n{usage}", file=sys.stderr)
+            return 1
+        return 0
+
+    if command == 'bench':
+        import json
+        from compiler import bench
+        if bench_names is None and input_files:
+            bench_names = []
+        report = bench.run_benchmarks(bench_names, input_files, engine, warmups, repeats, scale)
+        print(bench.format_table(report), file=sys.stderr)
+        if output_file is None:
+            print(json.dumps(report, indent=2))
+        else:
+            with open(output_file, 'w') as f:
+                json.dump(report, f, indent=2)
+        return 0
+
+    import glob
+    if len(input_files) > 1 or any(os.path.isdir(f) or glob.has_magic(f) for f in input_files):
+        from compiler import batch
+        if command not in ['check', 'interpret']:
+            raise Exception(f"Multiple input files not supported for command: {command}")
+        if command == 'interpret' and engine != 'closures':
+            raise Exception("Multiple input files only supported with --engine=closures")
+        limits = None
+        if any(limit is not None for limit in [max_steps, max_scope_depth, max_variables, timeout]):
+            from compiler.sandbox import Limits
+            limits = Limits(max_steps, max_scope_depth, max_variables, timeout)
+        results = batch.run_batch(batch.expand_inputs(input_files), command, jobs,
+                                  optimize=optimization_level > 0, limits=limits)
+        return batch.report(results, sys.stdout)
+
+    profiler = None
+    if profile_file is not None:
+        import cProfile
+        profiler = cProfile.Profile()
+    metrics.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        return run_command()
+    finally:
+        if profiler is not None and profile_file is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_file)
+        metrics.stop()
+        if timings:
+            print(metrics.format_table(), file=sys.stderr)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,14 @@
+import os
+import subprocess
+import tempfile
+
+
+def assemble_and_link(assembly_code: str, output_file: str) -> None:
+    """Assembles and links a standalone executable using the system `as` and `ld`."""
+    with tempfile.TemporaryDirectory(prefix='compiler_') as workdir:
+        asm_file = os.path.join(workdir, 'program.s')
+        obj_file = os.path.join(workdir, 'program.o')
+        with open(asm_file, 'w') as f:
+            f.write(assembly_code)
+        subprocess.run(['as', '-g', '-o', obj_file, asm_file], check=True)
+        subprocess.run(['ld', '-o', output_file, obj_file], check=True)
@@ -0,0 +1,339 @@
+from typing import Callable
+
+from compiler import ir
+from compiler.builtins import wrap_int
+from compiler.register_allocator import allocate_registers
+
+# Runtime stubs called by generated code. They take their argument in %rdi,
+# return in %rax and preserve every other register. Generated code jumps to
+# `division_by_zero`, which never returns.
+runtime_asm = """
+division_by_zero:
+    movq $1, %rax
+    movq $2, %rdi
+    leaq .Ldivision_by_zero_str(%rip), %rsi
+    movq $24, %rdx
+    syscall
+    movq $60, %rax
+    movq $1, %rdi
+    syscall
+
+print_int:
+    pushq %rbp
+    movq %rsp, %rbp
+    subq $32, %rsp
+    pushq %rdi
+    pushq %rsi
+    pushq %rdx
+    pushq %rcx
+    pushq %r8
+    pushq %r11
+    movq %rdi, %rax
+    movq %rdi, %r8
+    leaq -1(%rbp), %rsi
+    movb $10, (%rsi)
+    movq $10, %rcx
+    testq %rax, %rax
+    jns 1f
+    negq %rax
+1:
+    xorq %rdx, %rdx
+    divq %rcx
+    addb $48, %dl
+    decq %rsi
+    movb %dl, (%rsi)
+    testq %rax, %rax
+    jnz 1b
+    testq %r8, %r8
+    jns 2f
+    decq %rsi
+    movb $45, (%rsi)
+2:
+    movq %rbp, %rdx
+    subq %rsi, %rdx
+    movq $1, %rax
+    movq $1, %rdi
+    syscall
+    popq %r11
+    popq %r8
+    popq %rcx
+    popq %rdx
+    popq %rsi
+    popq %rdi
+    movq %rbp, %rsp
+    popq %rbp
+    ret
+
+print_bool:
+    pushq %rdi
+    pushq %rsi
+    pushq %rdx
+    pushq %rcx
+    pushq %r11
+    testq %rdi, %rdi
+    jz 1f
+    leaq .Ltrue_str(%rip), %rsi
+    movq $5, %rdx
+    jmp 2f
+1:
+    leaq .Lfalse_str(%rip), %rsi
+    movq $6, %rdx
+2:
+    movq $1, %rax
+    movq $1, %rdi
+    syscall
+    popq %r11
+    popq %rcx
+    popq %rdx
+    popq %rsi
+    popq %rdi
+    ret
+
+read_int:
+    pushq %rbp
+    movq %rsp, %rbp
+    subq $16, %rsp
+    pushq %rdi
+    pushq %rsi
+    pushq %rdx
+    pushq %rcx
+    pushq %r8
+    pushq %r9
+    pushq %r11
+    xorq %r8, %r8
+    xorq %r9, %r9
+1:
+    movq $0, %rax
+    movq $0, %rdi
+    leaq -1(%rbp), %rsi
+    movq $1, %rdx
+    syscall
+    cmpq $1, %rax
+    jne 3f
+    movzbq -1(%rbp), %rax
+    cmpq $10, %rax
+    je 3f
+    cmpq $45, %rax
+    jne 2f
+    movq $1, %r9
+    jmp 1b
+2:
+    subq $48, %rax
+    cmpq $9, %rax
+    ja 1b
+    imulq $10, %r8
+    addq %rax, %r8
+    jmp 1b
+3:
+    movq %r8, %rax
+    testq %r9, %r9
+    jz 4f
+    negq %rax
+4:
+    popq %r11
+    popq %r9
+    popq %r8
+    popq %rcx
+    popq %rdx
+    popq %rsi
+    popq %rdi
+    movq %rbp, %rsp
+    popq %rbp
+    ret
+
+    .section .rodata
+.Ltrue_str:
+    .ascii "true\\n"
+.Lfalse_str:
+    .ascii "false\\n"
+.Ldivision_by_zero_str:
+    .ascii "Error: division by zero\\n"
+"""
+
+argument_registers = ['%rdi', '%rsi', '%rdx', '%rcx', '%r8', '%r9']
+
+comparison_setters = {
+    '<': 'setl', '<=': 'setle', '>': 'setg', '>=': 'setge',
+    '==': 'sete', '!=': 'setne',
+}
+
+
+class Locals:
+    """
+    Maps IR registers to the x86-64 registers picked by the register
+    allocator, and every other IR register to its own stack slot below %rbp.
+    """
+
+    def __init__(self, var_count: int, registers: dict[ir.IRVar, str] | None = None) -> None:
+        self.var_count = var_count
+        self.registers = registers if registers is not None else {}
+        self.slots: dict[ir.IRVar, int] = {}
+
+    def __getitem__(self, var: ir.IRVar) -> str:
+        register = self.registers.get(var)
+        if register is not None:
+            return register
+        slot = self.slots.setdefault(var, len(self.slots))
+        return f'-{8 * (slot + 1)}(%rbp)'
+
+    def used_registers(self) -> set[str]:
+        return set(self.registers.values())
+
+    def stack_used(self) -> int:
+        size = 8 * len(self.slots)
+        return size + (-size % 16)
+
+
+def is_register(location: str) -> bool:
+    return location.startswith('%')
+
+
+def generate_assembly(program: ir.IRProgram, allocate: bool = True) -> str:
+    """
+    Generates a standalone x86-64 (AT&T syntax) program from IR.
+    With `allocate`, IR registers are kept in machine registers where
+    possible; otherwise each one lives in a stack slot.
+    """
+    lines: list[str] = []
+    registers = allocate_registers(program) if allocate else {}
+    locals = Locals(program.var_count, registers)
+
+    def emit(line: str) -> None:
+        lines.append(line)
+
+    emit('    .global _start')
+    emit('    .section .text')
+    emit('_start:')
+    emit('    pushq %rbp')
+    emit('    movq %rsp, %rbp')
+    # The frame size is known once every spilled register has a slot.
+    frame_line = len(lines)
+    emit('')
+
+    for ins in program.instructions:
+        emit(f'    # {ins}' if not isinstance(ins, ir.Label) else '')
+        match ins:
+            case ir.Label():
+                emit(f'{ins.name}:')
+            case ir.LoadIntConst():
+                value = wrap_int(ins.value)
+                dest = locals[ins.dest]
+                if -2**31 <= value < 2**31:
+                    emit(f'    movq ${value}, {dest}')
+                elif is_register(dest):
+                    emit(f'    movabsq ${value}, {dest}')
+                else:
+                    emit(f'    movabsq ${value}, %rax')
+                    emit(f'    movq %rax, {dest}')
+            case ir.LoadBoolConst():
+                emit(f'    movq ${int(ins.value)}, {locals[ins.dest]}')
+            case ir.Copy():
+                generate_move(locals[ins.source], locals[ins.dest], emit)
+            case ir.Jump():
+                emit(f'    jmp {ins.label.name}')
+            case ir.CondJump():
+                cond = locals[ins.cond]
+                if is_register(cond):
+                    emit(f'    testq {cond}, {cond}')
+                else:
+                    emit(f'    cmpq $0, {cond}')
+                emit(f'    jne {ins.then_label.name}')
+                emit(f'    jmp {ins.else_label.name}')
+            case ir.Call():
+                generate_call(ins, locals, emit)
+            case _:
+                raise ValueError(f"unknown instruction {ins}")
+
+    lines[frame_line] = f'    subq ${locals.stack_used()}, %rsp'
+    emit('    movq $60, %rax')
+    emit('    xorq %rdi, %rdi')
+    emit('    syscall')
+    emit(runtime_asm)
+    return '\n'.join(lines) + '\n'
+
+
+def generate_move(source: str, dest: str, emit: Callable[[str], None]) -> None:
+    if source == dest:
+        return
+    if is_register(source) or is_register(dest):
+        emit(f'    movq {source}, {dest}')
+    else:
+        emit(f'    movq {source}, %rax')
+        emit(f'    movq %rax, {dest}')
+
+
+def generate_call(ins: ir.Call, locals: Locals, emit: Callable[[str], None]) -> None:
+    args = [locals[arg] for arg in ins.args]
+    dest = locals[ins.dest]
+    match ins.fun:
+        case '+' | '-' | '*':
+            instruction = {'+': 'addq', '-': 'subq', '*': 'imulq'}[ins.fun]
+            if is_register(dest) and dest == args[1] and ins.fun != '-':
+                emit(f'    {instruction} {args[0]}, {dest}')
+            elif is_register(dest) and dest != args[1]:
+                generate_move(args[0], dest, emit)
+                emit(f'    {instruction} {args[1]}, {dest}')
+            else:
+                emit(f'    movq {args[0]}, %rax')
+                emit(f'    {instruction} {args[1]}, %rax')
+                emit(f'    movq %rax, {dest}')
+        case '/' | '%':
+            # `idivq` traps on a zero divisor and on INT_MIN / -1. Division by
+            # -1 is negation instead, which wraps like `int_div`, and its
+            # remainder is always 0.
+            result = '%rax' if ins.fun == '/' else '%rdx'
+            emit(f'    movq {args[0]}, %rax')
+            emit(f'    cmpq $-1, {args[1]}')
+            emit('    jne 1f')
+            emit('    negq %rax' if ins.fun == '/' else '    xorq %rdx, %rdx')
+            emit('    jmp 2f')
+            emit('1:')
+            emit(f'    cmpq $0, {args[1]}')
+            emit('    je division_by_zero')
+            emit('    cqto')
+            emit(f'    idivq {args[1]}')
+            emit('2:')
+            emit(f'    movq {result}, {dest}')
+        case '<' | '<=' | '>' | '>=' | '==' | '!=':
+            if is_register(args[0]):
+                emit(f'    cmpq {args[1]}, {args[0]}')
+            else:
+                emit(f'    movq {args[0]}, %rax')
+                emit(f'    cmpq {args[1]}, %rax')
+            emit(f'    {comparison_setters[ins.fun]} %al')
+            if is_register(dest):
+                emit(f'    movzbq %al, {dest}')
+            else:
+                emit('    movzbq %al, %rax')
+                emit(f'    movq %rax, {dest}')
+        case 'unary_-' | 'unary_not':
+            operation = '    negq {}' if ins.fun == 'unary_-' else '    xorq $1, {}'
+            if is_register(dest):
+                generate_move(args[0], dest, emit)
+                emit(operation.format(dest))
+            else:
+                emit(f'    movq {args[0]}, %rax')
+                emit(operation.format('%rax'))
+                emit(f'    movq %rax, {dest}')
+        case _:
+            if len(args) > len(argument_registers):
+                raise ValueError(f"too many arguments to '{ins.fun}' at {ins.location}")
+            used = argument_registers[:len(args)]
+            # The runtime preserves every register but %rax. Argument registers
+            # holding IR registers are saved around the call, and the arguments
+            # travel through the stack so no argument overwrites another.
+            saved = [r for r in used if r in locals.used_registers()]
+            for register in saved:
+                emit(f'    pushq {register}')
+            if saved:
+                for arg in reversed(args):
+                    emit(f'    pushq {arg}')
+                for register in used:
+                    emit(f'    popq {register}')
+            else:
+                for arg, register in zip(args, used):
+                    emit(f'    movq {arg}, {register}')
+            emit(f'    call {ins.fun}')
+            for register in reversed(saved):
+                emit(f'    popq {register}')
+            emit(f'    movq %rax, {dest}')
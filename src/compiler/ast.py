@@ -1,60 +1,102 @@
+import dataclasses
 from dataclasses import dataclass, field
 
+from compiler.tokenizer import Token
 from compiler.types import Type, Unit
 
-@dataclass
+@dataclass(slots=True)
 class Expression:
     """Base class for AST nodes representing expressions."""
-    location: tuple[str]
-    type: Type = field(kw_only=True,default_factory=lambda: Unit())
+    location: tuple[int, int]
+    type: Type = field(kw_only=True, default=Unit())
 
-@dataclass
+@dataclass(slots=True)
 class Literal(Expression):
     value: int | bool | None
     # (value=None is used when parsing the keyword `unit`)
 
-@dataclass
+@dataclass(slots=True)
 class Identifier(Expression):
     name: str
 
-@dataclass
+@dataclass(slots=True)
 class ControlFlow(Expression):
     if_exp: Expression
-    else_exp: str
-    then_exp: Expression | None
+    then_exp: Expression
+    else_exp: Expression | None
 
-@dataclass
+@dataclass(slots=True)
 class Function(Expression):
     identifier: Identifier
-    args: list
+    args: list[Expression]
 
-@dataclass
+@dataclass(slots=True)
 class BinaryOp(Expression):
     left: Expression
     op: str
     right: Expression
 
-@dataclass
+@dataclass(slots=True)
 class Assignment(Expression):
-    name: str
-    op_token: str
-    value: int | str
+    name: Identifier
+    op_token: Token
+    value: Expression
 
-@dataclass
+@dataclass(slots=True)
 class WhileLoop(Expression):
     while_expr: Expression
     do_expr: Expression
 
-@dataclass
+@dataclass(slots=True)
 class UnaryOp(Expression):
     operator: str
     operand: Expression
 
-@dataclass
+@dataclass(slots=True)
 class Block(Expression):
-    expressions: list
+    expressions: list[Expression]
 
-@dataclass
+@dataclass(slots=True)
 class Variable(Expression):
     name: Identifier
-    value: str
+    value: Expression
+    # The type written in the declaration (`var x: Int = ...`), if any.
+    declared_type: Type | None = field(kw_only=True, default=None)
+
+
+_child_fields_cache: dict[type, tuple[str, ...]] = {}
+
+
+def _child_fields(cls: type) -> tuple[str, ...]:
+    names = _child_fields_cache.get(cls)
+    if names is None:
+        names = _child_fields_cache[cls] = tuple(
+            f.name for f in dataclasses.fields(cls) if f.name not in ('location', 'type')
+        )
+    return names
+
+
+def children(node: Expression) -> list[Expression]:
+    """The direct child nodes of `node`."""
+    result: list[Expression] = []
+    for name in _child_fields(type(node)):
+        value = getattr(node, name)
+        if isinstance(value, list):
+            result.extend(value)
+        elif isinstance(value, Expression):
+            result.append(value)
+    return result
+
+
+def walk(node: Expression) -> list[Expression]:
+    """
+    Every node of the tree under `node`, including itself, without recursion.
+    Parents come before their children.
+    """
+    nodes: list[Expression] = []
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        nodes.append(n)
+        stack.extend(children(n))
+    return nodes
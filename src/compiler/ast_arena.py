@@ -0,0 +1,209 @@
+from array import array
+from typing import cast
+
+import compiler.ast as ast
+from compiler.tokenizer import Token
+from compiler.types import Bool, Int, Type, Unit
+
+# Node kinds, stored as one byte per node.
+node_classes: list[type[ast.Expression]] = [
+    ast.Literal, ast.Identifier, ast.ControlFlow, ast.Function, ast.BinaryOp,
+    ast.Assignment, ast.WhileLoop, ast.UnaryOp, ast.Block, ast.Variable,
+]
+(LITERAL, IDENTIFIER, CONTROL_FLOW, FUNCTION, BINARY_OP,
+ ASSIGNMENT, WHILE_LOOP, UNARY_OP, BLOCK, VARIABLE) = range(len(node_classes))
+kind_of_class = {cls: kind for kind, cls in enumerate(node_classes)}
+
+# How the `value` column of a Literal is to be read.
+LITERAL_INT, LITERAL_BOOL, LITERAL_UNIT, LITERAL_BIG_INT = range(4)
+
+
+class Arena:
+    """
+    Struct-of-arrays AST: a node is an integer index into typed columns.
+    Nodes are stored in post-order, so children always precede their
+    parent and the root is the last node. The children of node `i` are
+    `children[first_child[i]:first_child[i] + child_count[i]]`.
+    `value` holds a literal's value, a string table index (identifier
+    names and operators) or a Variable's declared type (see `to_arena`).
+    """
+
+    def __init__(self) -> None:
+        self.kind = array('B')
+        self.line = array('i')
+        self.column = array('i')
+        self.value = array('q')
+        self.flags = array('B')
+        self.type_id = array('B')
+        self.first_child = array('i')
+        self.child_count = array('i')
+        self.children = array('i')
+        self.strings: list[str] = []
+        self.string_ids: dict[str, int] = {}
+        self.types: list[Type] = [Unit(), Int(), Bool()]
+        self.type_ids: dict[Type, int] = {t: i for i, t in enumerate(self.types)}
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    @property
+    def root(self) -> int:
+        return len(self.kind) - 1
+
+    def intern_string(self, text: str) -> int:
+        index = self.string_ids.get(text)
+        if index is None:
+            index = self.string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return index
+
+    def intern_type(self, type: Type) -> int:
+        index = self.type_ids.get(type)
+        if index is None:
+            index = self.type_ids[type] = len(self.types)
+            self.types.append(type)
+        return index
+
+    def add(self, kind: int, location: tuple, type: Type, value: int = 0,
+            flags: int = 0, children: tuple[int, ...] = ()) -> int:
+        self.kind.append(kind)
+        line, column = location if location is not None else (0, 0)
+        self.line.append(line)
+        self.column.append(column)
+        self.value.append(value)
+        self.flags.append(flags)
+        self.type_id.append(self.intern_type(type))
+        self.first_child.append(len(self.children))
+        self.child_count.append(len(children))
+        self.children.extend(children)
+        return len(self.kind) - 1
+
+    def children_of(self, index: int) -> memoryview:
+        start = self.first_child[index]
+        return memoryview(self.children)[start:start + self.child_count[index]]
+
+    def location_of(self, index: int) -> tuple[int, int]:
+        return (self.line[index], self.column[index])
+
+
+def to_arena(root: ast.Expression, arena: Arena | None = None) -> Arena:
+    """Flattens an AST into an arena. The root ends up at `arena.root`."""
+    if arena is None:
+        arena = Arena()
+
+    def add(node: ast.Expression, children: tuple[int, ...]) -> int:
+        loc = node.location
+        kind = kind_of_class[type(node)]
+        match node:
+            case ast.Literal():
+                if node.value is None:
+                    return arena.add(kind, loc, node.type, 0, LITERAL_UNIT)
+                elif isinstance(node.value, bool):
+                    return arena.add(kind, loc, node.type, int(node.value), LITERAL_BOOL)
+                elif -2**63 <= node.value < 2**63:
+                    return arena.add(kind, loc, node.type, node.value, LITERAL_INT)
+                else:
+                    return arena.add(kind, loc, node.type,
+                                     arena.intern_string(str(node.value)), LITERAL_BIG_INT)
+            case ast.Identifier():
+                return arena.add(kind, loc, node.type, arena.intern_string(node.name))
+            case ast.BinaryOp():
+                return arena.add(kind, loc, node.type, arena.intern_string(node.op), 0, children)
+            case ast.UnaryOp():
+                return arena.add(kind, loc, node.type, arena.intern_string(node.operator), 0, children)
+            case ast.Assignment():
+                # The `=` token's location is packed into the value column.
+                op_line, op_column = node.op_token.location
+                return arena.add(kind, loc, node.type, (op_line << 32) | op_column, 0, children)
+            case ast.Variable():
+                # The declared type, if any, is packed into the value column as its id + 1.
+                declared = 0 if node.declared_type is None else arena.intern_type(node.declared_type) + 1
+                return arena.add(kind, loc, node.type, declared, 0, children)
+            case ast.ControlFlow() | ast.Function() | ast.WhileLoop() | ast.Block():
+                return arena.add(kind, loc, node.type, 0, 0, children)
+            case _:
+                raise ValueError(f"unknown node {type(node).__name__} at {loc}")
+
+    # Post-order without recursion: a node is added once all its children
+    # have been, taking their indices off the top of `added`.
+    stack: list[tuple[ast.Expression, bool]] = [(root, False)]
+    added: list[int] = []
+    while stack:
+        node, expanded = stack.pop()
+        child_nodes = ast.children(node)
+        if child_nodes and not expanded:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(child_nodes))
+            continue
+        children = tuple(added[len(added) - len(child_nodes):])
+        del added[len(added) - len(child_nodes):]
+        added.append(add(node, children))
+    return arena
+
+
+def from_arena(arena: Arena, index: int | None = None) -> ast.Expression:
+    """
+    Materializes the subtree rooted at `index` (default: the root) as AST
+    nodes, touching only that subtree's nodes.
+    """
+
+    def build(i: int, children: list[ast.Expression]) -> ast.Expression:
+        kind = arena.kind[i]
+        loc = arena.location_of(i)
+        type = arena.types[arena.type_id[i]]
+        value = arena.value[i]
+        if kind == LITERAL:
+            flags = arena.flags[i]
+            literal: int | bool | None
+            if flags == LITERAL_UNIT:
+                literal = None
+            elif flags == LITERAL_BOOL:
+                literal = bool(value)
+            elif flags == LITERAL_BIG_INT:
+                literal = int(arena.strings[value])
+            else:
+                literal = value
+            return ast.Literal(loc, literal, type=type)
+        elif kind == IDENTIFIER:
+            return ast.Identifier(loc, arena.strings[value], type=type)
+        elif kind == CONTROL_FLOW:
+            else_exp = children[2] if len(children) > 2 else None
+            return ast.ControlFlow(loc, children[0], children[1], else_exp, type=type)
+        elif kind == FUNCTION:
+            return ast.Function(loc, cast(ast.Identifier, children[0]), children[1:], type=type)
+        elif kind == BINARY_OP:
+            return ast.BinaryOp(loc, children[0], arena.strings[value], children[1], type=type)
+        elif kind == ASSIGNMENT:
+            op_token = Token(type='Operator', text='=', location=(value >> 32, value & 0xFFFFFFFF))
+            return ast.Assignment(loc, cast(ast.Identifier, children[0]), op_token, children[1], type=type)
+        elif kind == WHILE_LOOP:
+            return ast.WhileLoop(loc, children[0], children[1], type=type)
+        elif kind == UNARY_OP:
+            return ast.UnaryOp(loc, arena.strings[value], children[0], type=type)
+        elif kind == BLOCK:
+            return ast.Block(loc, children, type=type)
+        elif kind == VARIABLE:
+            declared_type = arena.types[value - 1] if value else None
+            return ast.Variable(loc, cast(ast.Identifier, children[0]), children[1],
+                                type=type, declared_type=declared_type)
+        else:
+            raise ValueError(f"unknown node kind {kind} at index {i}")
+
+    # In post-order a subtree is the contiguous run of nodes ending at its
+    # root and starting at its leftmost leaf, so it can be built in one pass.
+    root = arena.root if index is None else index
+    start = root
+    while arena.child_count[start]:
+        start = arena.children[arena.first_child[start]]
+    # Each node's children are then the topmost entries of the stack.
+    stack: list[ast.Expression] = []
+    child_count = arena.child_count
+    for i in range(start, root + 1):
+        count = child_count[i]
+        if count:
+            children = stack[-count:]
+            del stack[-count:]
+        else:
+            children = []
+        stack.append(build(i, children))
+    return stack[0]
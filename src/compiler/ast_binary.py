@@ -0,0 +1,245 @@
+import mmap
+import struct
+import sys
+from array import array
+from typing import Iterator
+
+import compiler.ast as ast
+from compiler.ast_arena import Arena, from_arena, to_arena
+from compiler.types import Bool, FunType, Int, Type, Unit
+
+# File layout, all little-endian:
+#
+#   header      struct `header_format`
+#   columns     one array per Arena column, in `columns` order
+#   children    int32 node indices
+#   strings     uint32 offsets (string count + 1), then the UTF-8 bytes
+#   types       uint32 words, see `_encode_types`
+#
+# Every section starts at a multiple of 8 bytes, so the loader can view the
+# columns in place instead of copying them.
+MAGIC = b'CAST'
+AST_FORMAT_VERSION = 1
+
+header_format = struct.Struct('<4sHHIIIII')
+
+# (Arena attribute, array typecode). Together a row of these is one node record.
+columns = [
+    ('kind', 'B'), ('flags', 'B'), ('type_id', 'B'),
+    ('line', 'i'), ('column', 'i'), ('value', 'q'),
+    ('first_child', 'i'), ('child_count', 'i'),
+]
+
+TYPE_UNIT, TYPE_INT, TYPE_BOOL, TYPE_FUN = range(4)
+
+
+def _padding(size: int) -> int:
+    return -size % 8
+
+
+def _little_endian(data: array) -> bytes:
+    if sys.byteorder == 'big':
+        data = array(data.typecode, data)
+        data.byteswap()
+    return data.tobytes()
+
+
+def _encode_types(types: list[Type]) -> array:
+    """
+    Each type is a tag word, for function types followed by the parameter
+    count, the parameter type ids and the return type id. Ids refer to the
+    position of a type in `types`, extended with any component types missing
+    from it, which are appended after the types that need them.
+    """
+    order = list(types)
+    ids = {t: i for i, t in enumerate(order)}
+
+    def type_id(t: Type) -> int:
+        if t not in ids:
+            ids[t] = len(order)
+            order.append(t)
+        return ids[t]
+
+    words = array('I')
+    i = 0
+    while i < len(order):
+        t = order[i]
+        if isinstance(t, Unit):
+            words.append(TYPE_UNIT)
+        elif isinstance(t, Int):
+            words.append(TYPE_INT)
+        elif isinstance(t, Bool):
+            words.append(TYPE_BOOL)
+        elif isinstance(t, FunType):
+            words.extend([TYPE_FUN, len(t.param_types)])
+            words.extend(type_id(p) for p in t.param_types)
+            words.append(type_id(t.return_type))
+        else:
+            raise ValueError(f"cannot serialize type {t!r}")
+        i += 1
+    return words
+
+
+def _decode_types(words: memoryview) -> list[Type]:
+    # Function types may refer to types that come after them, so they are
+    # resolved once every entry is known.
+    entries: list[Type | tuple[list[int], int]] = []
+    i = 0
+    while i < len(words):
+        tag = words[i]
+        if tag == TYPE_UNIT:
+            entries.append(Unit())
+        elif tag == TYPE_INT:
+            entries.append(Int())
+        elif tag == TYPE_BOOL:
+            entries.append(Bool())
+        elif tag == TYPE_FUN:
+            count = words[i + 1]
+            params = list(words[i + 2:i + 2 + count])
+            entries.append((params, words[i + 2 + count]))
+            i += 2 + count
+        else:
+            raise ValueError(f"unknown type tag {tag}")
+        i += 1
+
+    def resolve(index: int, seen: tuple[int, ...] = ()) -> Type:
+        entry = entries[index]
+        if isinstance(entry, Type):
+            return entry
+        if index in seen:
+            raise ValueError("cyclic type table")
+        params, result = entry
+        fun = FunType([resolve(p, seen + (index,)) for p in params], resolve(result, seen + (index,)))
+        entries[index] = fun
+        return fun
+
+    return [resolve(i) for i in range(len(entries))]
+
+
+def encode_arena(arena: Arena) -> bytes:
+    string_data = array('I', [0])
+    blob = bytearray()
+    for text in arena.strings:
+        blob += text.encode()
+        string_data.append(len(blob))
+    types = _encode_types(arena.types)
+
+    sections = [_little_endian(getattr(arena, name)) for name, _ in columns]
+    sections.append(_little_endian(arena.children))
+    sections.append(_little_endian(string_data) + bytes(_padding(4 * len(string_data))) + bytes(blob))
+    sections.append(_little_endian(types))
+
+    header = header_format.pack(MAGIC, AST_FORMAT_VERSION, 0, len(arena), len(arena.children),
+                                len(arena.strings), len(blob), len(types))
+    parts = [header, bytes(_padding(header_format.size))]
+    for section in sections:
+        parts.append(section)
+        parts.append(bytes(_padding(len(section))))
+    return b''.join(parts)
+
+
+def dump(tree: ast.Expression, path: str) -> None:
+    """Writes a (type-checked) tree to `path` in the binary format."""
+    with open(path, 'wb') as f:
+        f.write(encode_arena(to_arena(tree)))
+
+
+class StringTable:
+    """The string table of a mapped file, decoding each string on first use."""
+
+    def __init__(self, offsets: memoryview, data: memoryview) -> None:
+        self.offsets = offsets
+        self.data = data
+        self.cache: dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        text = self.cache.get(index)
+        if text is None:
+            text = self.cache[index] = str(self.data[self.offsets[index]:self.offsets[index + 1]], 'utf-8')
+        return text
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[i] for i in range(len(self)))
+
+
+class MappedArena(Arena):
+    """
+    An Arena whose columns are views into a memory-mapped file. Nothing is
+    copied or decoded up front: `from_arena(mapped, index)` builds only the
+    nodes of the subtree asked for.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as f:
+            try:
+                self.mmap: mmap.mmap | None = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                buffer = memoryview(self.mmap)
+            except ValueError:
+                # Empty files can't be mapped.
+                self.mmap = None
+                buffer = memoryview(f.read())
+        self.buffer = buffer
+        if len(buffer) < header_format.size:
+            raise ValueError(f"{path}: not an AST file")
+        (magic, version, _, node_count, child_total, string_count,
+         blob_size, type_words) = header_format.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not an AST file")
+        if version != AST_FORMAT_VERSION:
+            raise ValueError(f"{path}: AST format version {version}, expected {AST_FORMAT_VERSION}")
+
+        offset = header_format.size + _padding(header_format.size)
+        # Every view into the buffer, released by `close`.
+        self.views: list[memoryview] = []
+
+        def section(typecode: str, count: int) -> memoryview:
+            nonlocal offset
+            size = array(typecode).itemsize * count
+            if offset + size > len(buffer):
+                raise ValueError(f"{path}: truncated AST file")
+            view = buffer[offset:offset + size]
+            offset += size + _padding(size)
+            if sys.byteorder == 'big' and typecode != 'B':
+                swapped = array(typecode, view.tobytes())
+                swapped.byteswap()
+                view = memoryview(swapped)
+            else:
+                view = view.cast(typecode)
+            self.views.append(view)
+            return view
+
+        # The columns are memoryviews standing in for the arrays of an Arena.
+        for name, typecode in columns:
+            setattr(self, name, section(typecode, node_count))
+        self.children = section('i', child_total)  # type: ignore[assignment]
+        offsets = section('I', string_count + 1)
+        data = buffer[offset:offset + blob_size]
+        self.views.append(data)
+        offset += blob_size + _padding(blob_size)
+        self.strings = StringTable(offsets, data)  # type: ignore[assignment]
+        self.types = _decode_types(section('I', type_words))
+        self.string_ids = {}
+        self.type_ids = {}
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    def close(self) -> None:
+        """Releases the mapping. Trees built from it stay valid."""
+        for view in self.views:
+            view.release()
+        self.buffer.release()
+        if self.mmap is not None:
+            self.mmap.close()
+
+
+def load(path: str) -> ast.Expression:
+    """Reads a whole tree written by `dump`."""
+    arena = MappedArena(path)
+    try:
+        return from_arena(arena)
+    finally:
+        arena.close()
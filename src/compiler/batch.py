@@ -0,0 +1,124 @@
+import contextlib
+import fnmatch
+import glob
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import TextIO
+
+from compiler.closure_compiler import compile_closures
+from compiler.diagnostics import Diagnostic
+from compiler.optimizer import optimize as optimize_tree
+from compiler.parser import parse
+from compiler.sandbox import Limits, run_governed
+from compiler.tokenizer import Tokenizer
+from compiler.type_checker import typecheck
+
+
+@dataclass
+class FileResult:
+    path: str
+    ok: bool
+    diagnostics: list[str] = field(default_factory=list)
+    output: str = ''
+    seconds: float = 0.0
+
+
+def expand_inputs(inputs: list[str], pattern: str = '*.txt') -> list[str]:
+    """
+    Expands input arguments into a sorted list of files. Arguments may be
+    files, glob patterns (`**` recurses) or directories, which are searched
+    recursively for files matching `pattern`.
+    """
+    paths: list[str] = []
+    for arg in inputs:
+        if os.path.isdir(arg):
+            for dirpath, _, filenames in os.walk(arg):
+                paths.extend(os.path.join(dirpath, f) for f in fnmatch.filter(filenames, pattern))
+        elif glob.has_magic(arg):
+            paths.extend(p for p in glob.glob(arg, recursive=True) if os.path.isfile(p))
+        else:
+            paths.append(arg)
+    return sorted(dict.fromkeys(paths))
+
+
+def process_file(path: str, command: str, optimize: bool = True,
+                 limits: Limits | None = None) -> FileResult:
+    """
+    Runs the front end (and for 'interpret' the program) on one file.
+    With `limits`, a program going over them fails like any other error.
+    """
+    start = time.perf_counter()
+    output = io.StringIO()
+    try:
+        # All syntax and type errors of a file are reported, not just the first.
+        diagnostics: list[Diagnostic] = []
+        with open(path) as f:
+            tree = parse(Tokenizer.iter_tokens(f), diagnostics=diagnostics)
+        typecheck(tree, diagnostics=diagnostics)
+        if diagnostics:
+            return FileResult(path, False, [str(d) for d in diagnostics], output.getvalue(),
+                              time.perf_counter() - start)
+        if command == 'interpret':
+            if optimize:
+                tree = optimize_tree(tree)
+            with contextlib.redirect_stdout(output):
+                if limits is None:
+                    compile_closures(tree)()
+                else:
+                    run_governed(tree, limits)
+    except Exception as e:
+        return FileResult(path, False, [f'{type(e).__name__}: {e}'], output.getvalue(),
+                          time.perf_counter() - start)
+    return FileResult(path, True, [], output.getvalue(), time.perf_counter() - start)
+
+
+def _process_chunk(paths: list[str], command: str, optimize: bool,
+                   limits: Limits | None) -> list[FileResult]:
+    return [process_file(path, command, optimize, limits) for path in paths]
+
+
+def default_jobs() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def run_batch(paths: list[str], command: str = 'check', jobs: int | None = None,
+              optimize: bool = True, limits: Limits | None = None) -> list[FileResult]:
+    """
+    Processes many files on a pool of worker processes, one process per core
+    by default. Files are sent in chunks to amortize the IPC round trips.
+    Results come back in the order of `paths`. `limits` apply to each
+    program on its own.
+    """
+    if jobs is None:
+        jobs = default_jobs()
+    if jobs <= 1 or len(paths) <= 1:
+        return _process_chunk(paths, command, optimize, limits)
+    chunk_size = max(1, min(64, len(paths) // (jobs * 4)))
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    results: list[FileResult] = []
+    with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as pool:
+        for chunk_results in pool.map(_process_chunk, chunks, [command] * len(chunks),
+                                      [optimize] * len(chunks), [limits] * len(chunks)):
+            results.extend(chunk_results)
+    return results
+
+
+def report(results: list[FileResult], out: TextIO) -> int:
+    """Prints per-file diagnostics and output plus a summary. Returns the exit status."""
+    failed = 0
+    for result in results:
+        if result.output:
+            print(f'==> {result.path}', file=out)
+            print(result.output, end='', file=out)
+        for diagnostic in result.diagnostics:
+            print(f'{result.path}: {diagnostic}', file=out)
+        if not result.ok:
+            failed += 1
+    print(f'{len(results)} files, {len(results) - failed} ok, {failed} failed', file=out)
+    return 1 if failed else 0
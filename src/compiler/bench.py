@@ -0,0 +1,161 @@
+import contextlib
+import io
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable
+
+from compiler import ast
+from compiler.closure_compiler import compile_closures
+from compiler.interpreter import interpret
+from compiler.ir_generator import generate_ir
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+from compiler.transpiler import compile_python
+from compiler.type_checker import typecheck
+from compiler import vm
+
+# Bump when the JSON layout changes, so old result files are not compared blindly.
+BENCH_FORMAT_VERSION = 1
+
+phases = ['tokenize', 'parse', 'typecheck', 'execute']
+
+
+def nested_blocks(depth: int) -> str:
+    """Blocks nested `depth` deep, each declaring and updating a variable."""
+    opening = ''.join(f'{{ var v{i} = {i}; v{i} = v{i} + 1; ' for i in range(depth))
+    return opening + 'print_int(v0)' + ' }' * depth
+
+
+def expression_chain(length: int) -> str:
+    """One long left-associative arithmetic expression."""
+    terms = ' + '.join(f'x * {i % 7 + 1} - {i % 3}' for i in range(length))
+    return f'{{ var x = 3; print_int({terms}); }}'
+
+
+def large_loop(iterations: int) -> str:
+    """A counted loop with a branch and a few arithmetic operations per iteration."""
+    return f"""
+    {{
+        var i = 0;
+        var acc = 0;
+        while i < {iterations} do {{
+            if i % 3 == 0 then acc = acc + i * 2 else acc = acc - 1;
+            i = i + 1;
+        }}
+        print_int(acc);
+    }}
+    """
+
+
+def many_variables(count: int) -> str:
+    """A flat block declaring `count` variables that each read the previous one."""
+    declarations = ' '.join(f'var v{i} = v{i - 1} + {i};' for i in range(1, count))
+    return f'{{ var v0 = 0; {declarations} print_int(v{count - 1}); }}'
+
+
+# Workload name -> (program generator, sizes).
+workloads: dict[str, tuple[Callable[[int], str], list[int]]] = {
+    'nested_blocks': (nested_blocks, [10, 50, 200]),
+    'expression_chain': (expression_chain, [100, 300, 700]),
+    'large_loop': (large_loop, [1_000, 10_000, 100_000]),
+    'many_variables': (many_variables, [100, 1_000, 10_000]),
+}
+
+
+def measure(run: Callable[[], Any], warmups: int, repeats: int) -> dict[str, float]:
+    """Runs `run` `warmups` times untimed, then times `repeats` runs."""
+    for _ in range(warmups):
+        run()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def executor(engine: str) -> Callable[[ast.Expression], Any]:
+    if engine == 'closures':
+        return lambda tree: compile_closures(tree)()
+    elif engine == 'tree':
+        return interpret
+    elif engine == 'ir':
+        return lambda tree: vm.execute(generate_ir(tree))
+    elif engine == 'python':
+        return lambda tree: compile_python(tree)()
+    raise ValueError(f"unknown engine: {engine}")
+
+
+def bench_source(name: str, size: int | None, source_code: str, engine: str = 'closures',
+                 warmups: int = 1, repeats: int = 5) -> dict[str, Any]:
+    """Times every phase of one program. Program output is discarded."""
+    execute = executor(engine)
+    tokens = Tokenizer.tokenize(source_code)
+    tree = parse(tokens)
+    typecheck(tree)
+
+    def run_program() -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            execute(tree)
+
+    results = {
+        'tokenize': measure(lambda: Tokenizer.tokenize(source_code), warmups, repeats),
+        'parse': measure(lambda: parse(tokens), warmups, repeats),
+        'typecheck': measure(lambda: typecheck(tree), warmups, repeats),
+        'execute': measure(run_program, warmups, repeats),
+    }
+    return {
+        'name': name,
+        'size': size,
+        'source_bytes': len(source_code.encode()),
+        'tokens': len(tokens),
+        'phases': results,
+    }
+
+
+def run_benchmarks(names: list[str] | None = None, files: list[str] | None = None,
+                   engine: str = 'closures', warmups: int = 1, repeats: int = 5,
+                   scale: float = 1.0) -> dict[str, Any]:
+    """
+    Benchmarks the synthetic workloads (all of them unless `names` is given)
+    at every size, scaled by `scale`, plus any source `files`.
+    Returns a JSON-serializable report.
+    """
+    benchmarks = []
+    for name in names if names is not None else list(workloads):
+        if name not in workloads:
+            raise ValueError(f"unknown benchmark: {name}")
+        generate, sizes = workloads[name]
+        for size in sizes:
+            size = max(1, int(size * scale))
+            benchmarks.append(bench_source(name, size, generate(size), engine, warmups, repeats))
+    for path in files or []:
+        with open(path) as f:
+            benchmarks.append(bench_source(path, None, f.read(), engine, warmups, repeats))
+    return {
+        'version': BENCH_FORMAT_VERSION,
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'engine': engine,
+        'warmups': warmups,
+        'repeats': repeats,
+        'benchmarks': benchmarks,
+    }
+
+
+def format_table(report: dict[str, Any]) -> str:
+    """A human-readable summary of median times in milliseconds."""
+    lines = [f"{'benchmark':<24} {'size':>8}" + ''.join(f' {p:>10}' for p in phases)]
+    for b in report['benchmarks']:
+        size = '' if b['size'] is None else str(b['size'])
+        lines.append(f"{b['name']:<24} {size:>8}"
+                     + ''.join(f" {b['phases'][p]['median'] * 1000:>10.3f}" for p in phases))
+    return '\n'.join(lines)
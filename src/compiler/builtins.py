@@ -0,0 +1,68 @@
+import sys
+from typing import Any
+
+from compiler.types import Bool, FunType, Int, SymTab, Unit
+
+INT_MIN = -(1 << 63)
+INT_MAX = (1 << 63) - 1
+
+
+def wrap_int(value: int) -> int:
+    """Wraps an integer into the signed 64-bit range of the language."""
+    return ((value - INT_MIN) & 0xFFFFFFFFFFFFFFFF) + INT_MIN
+
+
+def int_div(a: int, b: int) -> int:
+    """Integer division truncating towards zero, like x86 `idiv`."""
+    if b == 0:
+        raise ZeroDivisionError("division by zero")
+    q = abs(a) // abs(b)
+    return wrap_int(q if (a < 0) == (b < 0) else -q)
+
+
+def int_mod(a: int, b: int) -> int:
+    """Remainder matching `int_div`: the result has the sign of `a`."""
+    if b == 0:
+        raise ZeroDivisionError("division by zero")
+    r = abs(a) % abs(b)
+    return r if a >= 0 else -r
+
+
+def print_int(value: int) -> None:
+    print(value)
+
+
+def print_bool(value: bool) -> None:
+    print('true' if value else 'false')
+
+
+def read_int() -> int:
+    line = sys.stdin.readline()
+    if not line:
+        raise EOFError("read_int: end of input")
+    return wrap_int(int(line.strip()))
+
+
+builtin_types = {
+    'true': Bool(),
+    'false': Bool(),
+    'print_int': FunType([Int()], Unit()),
+    'print_bool': FunType([Bool()], Unit()),
+    'read_int': FunType([], Int()),
+}
+
+builtin_values: dict[str, Any] = {
+    'true': True,
+    'false': False,
+    'print_int': print_int,
+    'print_bool': print_bool,
+    'read_int': read_int,
+}
+
+
+def root_symbol_table() -> SymTab:
+    """Returns a fresh top-level symbol table holding the builtin types."""
+    symbol_table = SymTab()
+    for name, type in builtin_types.items():
+        symbol_table.define(name, type)
+    return symbol_table
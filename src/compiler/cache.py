@@ -0,0 +1,158 @@
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+from importlib import metadata
+from typing import Any, TextIO
+
+import compiler.ast as ast
+from compiler.ast_arena import Arena, from_arena, to_arena
+
+# Bump when the stored format or the meaning of a cached tree changes.
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Characters hashed at a time by `file_key`.
+READ_CHUNK = 1 << 16
+
+
+def default_cache_dir() -> str:
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'compiler')
+
+
+def compiler_version() -> str:
+    """
+    Identifies the front end that produced a cache entry: the package version
+    plus the size and mtime of every compiler module, so editing the compiler
+    invalidates old entries even while the version number stays the same.
+    """
+    try:
+        version = metadata.version('compilers-project')
+    except metadata.PackageNotFoundError:
+        version = '0.0.0'
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    stamps = []
+    for name in sorted(os.listdir(package_dir)):
+        if name.endswith('.py'):
+            st = os.stat(os.path.join(package_dir, name))
+            stamps.append(f'{name}:{st.st_size}:{st.st_mtime_ns}')
+    return f'{version}/{CACHE_FORMAT_VERSION}/' + ','.join(stamps)
+
+
+class CompilationCache:
+    """
+    Content-addressed on-disk cache of type-checked trees.
+    Entries are keyed by a hash of the source text and the compiler version,
+    stored as pickled arenas, and evicted least-recently-used first once the
+    directory grows beyond `max_bytes`. A directory that isn't `trusted` is
+    neither read nor written.
+    """
+
+    def __init__(self, directory: str | None = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = directory if directory is not None else default_cache_dir()
+        self.max_bytes = max_bytes
+        self.version = compiler_version()
+
+    def _digest(self) -> Any:
+        digest = hashlib.sha256()
+        digest.update(self.version.encode())
+        digest.update(b'\0')
+        return digest
+
+    def key(self, source_code: str) -> str:
+        digest = self._digest()
+        digest.update(source_code.encode())
+        return digest.hexdigest()
+
+    def file_key(self, f: TextIO) -> str:
+        """The key of the rest of `f`, read and hashed a chunk at a time."""
+        digest = self._digest()
+        while chunk := f.read(READ_CHUNK):
+            digest.update(chunk.encode())
+        return digest.hexdigest()
+
+    def trusted(self) -> bool:
+        """
+        Whether entries may be loaded. Unpickling can run arbitrary code, so
+        the directory must belong to the current user and be writable by no
+        one else.
+        """
+        try:
+            st = os.stat(self.directory)
+        except OSError:
+            return False
+        if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+            return False
+        return not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.ast')
+
+    def load(self, source_code: str) -> ast.Expression | None:
+        return self.load_key(self.key(source_code))
+
+    def load_key(self, key: str) -> ast.Expression | None:
+        if not self.trusted():
+            return None
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                arena = pickle.load(f)
+            if not isinstance(arena, Arena):
+                raise ValueError(f"unexpected cache entry in {path}")
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # A corrupt or incompatible entry is just a miss.
+            self._remove(path)
+            return None
+        # Mark as recently used.
+        os.utime(path)
+        return from_arena(arena)
+
+    def store(self, source_code: str, tree: ast.Expression) -> None:
+        self.store_key(self.key(source_code), tree)
+
+    def store_key(self, key: str, tree: ast.Expression) -> None:
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            if not self.trusted():
+                return
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        except OSError:
+            # An unwritable cache directory only costs us the speedup.
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(to_arena(tree), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.ast'):
+                    st = entry.stat()
+                    entries.append((st.st_mtime_ns, st.st_size, entry.path))
+                    total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
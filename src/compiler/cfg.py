@@ -0,0 +1,405 @@
+import copy
+from dataclasses import dataclass, field
+from typing import Callable
+
+from compiler import ir
+from compiler.ir import IRVar, UNIT
+
+ENTRY = '.L_entry'
+
+
+@dataclass
+class BasicBlock:
+    """
+    A straight-line run of instructions, starting with any phis.
+    Every block except the exit ends in a Jump or CondJump.
+    """
+    label: str
+    instructions: list[ir.Instruction] = field(default_factory=list)
+
+    def terminator(self) -> ir.Instruction | None:
+        if self.instructions and isinstance(self.instructions[-1], (ir.Jump, ir.CondJump)):
+            return self.instructions[-1]
+        return None
+
+    def successors(self) -> list[str]:
+        match self.terminator():
+            case ir.Jump(label=label):
+                return [label.name]
+            case ir.CondJump(then_label=then_label, else_label=else_label):
+                if then_label.name == else_label.name:
+                    return [then_label.name]
+                return [then_label.name, else_label.name]
+        return []
+
+    def phis(self) -> list[ir.Phi]:
+        phis = []
+        for ins in self.instructions:
+            if not isinstance(ins, ir.Phi):
+                break
+            phis.append(ins)
+        return phis
+
+    def insert_before_terminator(self, instructions: list[ir.Instruction]) -> None:
+        end = len(self.instructions) - (self.terminator() is not None)
+        self.instructions[end:end] = instructions
+
+    def retarget(self, old: str, new: str) -> None:
+        """Points the terminator's jumps to `old` at `new` instead."""
+        match self.terminator():
+            case ir.Jump() as jump if jump.label.name == old:
+                jump.label = ir.Label(new)
+            case ir.CondJump() as cond_jump:
+                if cond_jump.then_label.name == old:
+                    cond_jump.then_label = ir.Label(new)
+                if cond_jump.else_label.name == old:
+                    cond_jump.else_label = ir.Label(new)
+
+
+@dataclass
+class ControlFlowGraph:
+    """
+    Basic blocks in layout order. The first block is the entry; the program
+    ends by falling off the end of the exit block, which is laid out last.
+    """
+    blocks: dict[str, BasicBlock]
+    result: IRVar
+    var_count: int
+    label_count: int = 0
+
+    @property
+    def entry(self) -> str:
+        return next(iter(self.blocks))
+
+    def new_var(self) -> IRVar:
+        var = IRVar(self.var_count)
+        self.var_count += 1
+        return var
+
+    def new_label(self, name: str) -> str:
+        self.label_count += 1
+        return f'.L_{name}{self.label_count}'
+
+    def predecessors(self) -> dict[str, list[str]]:
+        preds: dict[str, list[str]] = {name: [] for name in self.blocks}
+        for name, block in self.blocks.items():
+            for succ in block.successors():
+                preds[succ].append(name)
+        return preds
+
+    def instructions(self) -> list[ir.Instruction]:
+        return [ins for block in self.blocks.values() for ins in block.instructions]
+
+    def instruction_count(self) -> int:
+        return sum(len(block.instructions) for block in self.blocks.values())
+
+    def insert_block(self, block: BasicBlock, after: str) -> None:
+        blocks = list(self.blocks.values())
+        index = next(i for i, b in enumerate(blocks) if b.label == after)
+        blocks.insert(index + 1, block)
+        self.blocks = {b.label: b for b in blocks}
+
+    def replace_uses(self, mapping: dict[IRVar, IRVar]) -> None:
+        if not mapping:
+            return
+        for block in self.blocks.values():
+            for ins in block.instructions:
+                ins.replace_uses(mapping)
+        self.result = mapping.get(self.result, self.result)
+
+    def remove_unreachable(self) -> None:
+        reachable = set(reverse_postorder(self))
+        for block in self.blocks.values():
+            for phi in block.phis():
+                phi.sources = {p: v for p, v in phi.sources.items() if p in reachable}
+        self.blocks = {name: b for name, b in self.blocks.items() if name in reachable}
+
+    def to_program(self) -> ir.IRProgram:
+        """Lays the blocks out as a flat instruction list, eliding jumps to the next block."""
+        order = list(self.blocks.values())
+        bodies: list[list[ir.Instruction]] = []
+        for i, block in enumerate(order):
+            body = block.instructions
+            assert not block.phis(), f"phi left in block {block.label}"
+            term = block.terminator()
+            if isinstance(term, ir.Jump) and i + 1 < len(order) and term.label.name == order[i + 1].label:
+                body = body[:-1]
+            bodies.append(body)
+        referenced = {
+            label.name
+            for body in bodies for ins in body
+            for label in ([ins.label] if isinstance(ins, ir.Jump)
+                          else [ins.then_label, ins.else_label] if isinstance(ins, ir.CondJump)
+                          else [])
+        }
+        instructions: list[ir.Instruction] = []
+        for block, body in zip(order, bodies):
+            if block.label in referenced:
+                instructions.append(ir.Label(block.label))
+            instructions.extend(body)
+        return ir.IRProgram(instructions, self.result, self.var_count)
+
+
+def build_cfg(program: ir.IRProgram) -> ControlFlowGraph:
+    """Splits a program into basic blocks. The program itself is not modified."""
+    entry = BasicBlock(ENTRY)
+    cfg = ControlFlowGraph({ENTRY: entry}, program.result, program.var_count)
+    current = entry
+    for ins in program.instructions:
+        if isinstance(ins, ir.Label):
+            if current.terminator() is None:
+                current.instructions.append(ir.Jump(ins))
+            current = cfg.blocks[ins.name] = BasicBlock(ins.name)
+            continue
+        if current.terminator() is not None:
+            # Code after a jump that no label leads to.
+            label = cfg.new_label('dead')
+            current = cfg.blocks[label] = BasicBlock(label)
+        current.instructions.append(copy.copy(ins))
+    cfg.remove_unreachable()
+    return cfg
+
+
+def reverse_postorder(cfg: ControlFlowGraph) -> list[str]:
+    order: list[str] = []
+    visited = {cfg.entry}
+    stack = [(cfg.entry, iter(cfg.blocks[cfg.entry].successors()))]
+    while stack:
+        name, successors = stack[-1]
+        for succ in successors:
+            if succ not in visited:
+                visited.add(succ)
+                stack.append((succ, iter(cfg.blocks[succ].successors())))
+                break
+        else:
+            stack.pop()
+            order.append(name)
+    order.reverse()
+    return order
+
+
+def dominators(cfg: ControlFlowGraph) -> dict[str, str]:
+    """
+    Immediate dominators of the reachable blocks, with the entry dominating
+    itself (Cooper, Harvey and Kennedy's iterative algorithm).
+    """
+    order = reverse_postorder(cfg)
+    index = {name: i for i, name in enumerate(order)}
+    preds = cfg.predecessors()
+    idom = {cfg.entry: cfg.entry}
+
+    def intersect(a: str, b: str) -> str:
+        while a != b:
+            while index[a] > index[b]:
+                a = idom[a]
+            while index[b] > index[a]:
+                b = idom[b]
+        return a
+
+    changed = True
+    while changed:
+        changed = False
+        for name in order[1:]:
+            processed = [p for p in preds[name] if p in idom]
+            new_idom = processed[0]
+            for p in processed[1:]:
+                new_idom = intersect(p, new_idom)
+            if idom.get(name) != new_idom:
+                idom[name] = new_idom
+                changed = True
+    return idom
+
+
+def dominates(idom: dict[str, str], a: str, b: str) -> bool:
+    while b != a:
+        parent = idom[b]
+        if parent == b:
+            return False
+        b = parent
+    return True
+
+
+def dominator_tree(idom: dict[str, str]) -> dict[str, list[str]]:
+    children: dict[str, list[str]] = {name: [] for name in idom}
+    for name, parent in idom.items():
+        if parent != name:
+            children[parent].append(name)
+    return children
+
+
+def dominance_frontiers(cfg: ControlFlowGraph, idom: dict[str, str]) -> dict[str, set[str]]:
+    frontiers: dict[str, set[str]] = {name: set() for name in idom}
+    for name, preds in cfg.predecessors().items():
+        if len(preds) < 2:
+            continue
+        for p in preds:
+            runner = p
+            while runner != idom[name]:
+                frontiers[runner].add(name)
+                runner = idom[runner]
+    return frontiers
+
+
+def liveness(cfg: ControlFlowGraph) -> tuple[dict[str, set[IRVar]], dict[str, set[IRVar]]]:
+    """
+    Registers live on entry to and exit from each block. A phi reads its
+    source at the end of the matching predecessor, not in its own block.
+    The program result is live at the end of the exit block.
+    """
+    uses: dict[str, set[IRVar]] = {}
+    defs: dict[str, set[IRVar]] = {}
+    phi_defs: dict[str, set[IRVar]] = {}
+    phi_uses: dict[str, set[IRVar]] = {name: set() for name in cfg.blocks}
+    for name, block in cfg.blocks.items():
+        used: set[IRVar] = set()
+        defined: set[IRVar] = set()
+        for ins in block.instructions:
+            if isinstance(ins, ir.Phi):
+                for pred, var in ins.sources.items():
+                    if var != UNIT:
+                        phi_uses[pred].add(var)
+            else:
+                used.update(v for v in ins.uses() if v not in defined and v != UNIT)
+            dest = ins.defines()
+            if dest is not None:
+                defined.add(dest)
+        uses[name] = used
+        defs[name] = defined
+        phi_defs[name] = {phi.dest for phi in block.phis()}
+
+    live_in: dict[str, set[IRVar]] = {name: set() for name in cfg.blocks}
+    live_out: dict[str, set[IRVar]] = {name: set() for name in cfg.blocks}
+    order = list(reversed(reverse_postorder(cfg)))
+    changed = True
+    while changed:
+        changed = False
+        for name in order:
+            block = cfg.blocks[name]
+            out = set(phi_uses[name])
+            for succ in block.successors():
+                out |= live_in[succ] - phi_defs[succ]
+            if block.terminator() is None and cfg.result != UNIT:
+                out.add(cfg.result)
+            new_in = uses[name] | (out - defs[name]) | phi_defs[name]
+            if out != live_out[name] or new_in != live_in[name]:
+                live_out[name] = out
+                live_in[name] = new_in
+                changed = True
+    return live_in, live_out
+
+
+def to_ssa(cfg: ControlFlowGraph) -> None:
+    """
+    Converts the graph to pruned SSA form in place: phis are placed on the
+    iterated dominance frontier of each register's definitions where the
+    register is live, and every definition gets a fresh register.
+    """
+    idom = dominators(cfg)
+    frontiers = dominance_frontiers(cfg, idom)
+    live_in, _ = liveness(cfg)
+    preds = cfg.predecessors()
+
+    def_sites: dict[IRVar, set[str]] = {}
+    for name, block in cfg.blocks.items():
+        for ins in block.instructions:
+            dest = ins.defines()
+            if dest is not None:
+                def_sites.setdefault(dest, set()).add(name)
+
+    phi_vars: dict[int, IRVar] = {}
+    for var, sites in def_sites.items():
+        has_phi: set[str] = set()
+        work = list(sites)
+        while work:
+            for join in frontiers[work.pop()]:
+                if join in has_phi or var not in live_in[join]:
+                    continue
+                has_phi.add(join)
+                phi = ir.Phi({p: var for p in preds[join]}, var)
+                phi_vars[id(phi)] = var
+                cfg.blocks[join].instructions.insert(0, phi)
+                if join not in sites:
+                    work.append(join)
+
+    names: dict[IRVar, list[IRVar]] = {}
+
+    def current(var: IRVar) -> IRVar | None:
+        stack = names.get(var)
+        return stack[-1] if stack else None
+
+    children = dominator_tree(idom)
+    # Entries are (block, None) on the way down and (block, defined registers) on the way up.
+    work_stack: list[tuple[str, list[IRVar] | None]] = [(cfg.entry, None)]
+    while work_stack:
+        name, defined = work_stack.pop()
+        if defined is not None:
+            for var in defined:
+                names[var].pop()
+            continue
+        block = cfg.blocks[name]
+        defined = []
+        for ins in block.instructions:
+            if not isinstance(ins, ir.Phi):
+                ins.replace_uses({v: n for v in ins.uses() if (n := current(v)) is not None})
+            dest = ins.defines()
+            if dest is not None:
+                new = cfg.new_var()
+                names.setdefault(dest, []).append(new)
+                defined.append(dest)
+                ins.dest = new  # type: ignore[attr-defined]
+        if block.terminator() is None:
+            cfg.result = current(cfg.result) or cfg.result
+        for succ in block.successors():
+            for phi in cfg.blocks[succ].phis():
+                phi.sources[name] = current(phi_vars[id(phi)]) or UNIT
+        work_stack.append((name, defined))
+        for child in reversed(children[name]):
+            work_stack.append((child, None))
+
+
+def from_ssa(cfg: ControlFlowGraph) -> None:
+    """
+    Replaces phis with copies at the end of each predecessor, splitting
+    critical edges so the copies only run on the edge they belong to.
+    """
+    preds = cfg.predecessors()
+    for name in list(cfg.blocks):
+        block = cfg.blocks[name]
+        phis = block.phis()
+        if not phis:
+            continue
+        for pred_name in preds[name]:
+            pred = cfg.blocks[pred_name]
+            if len(pred.successors()) > 1:
+                split = BasicBlock(cfg.new_label('split'), [ir.Jump(ir.Label(name))])
+                pred.retarget(name, split.label)
+                cfg.insert_block(split, after=pred_name)
+                for phi in phis:
+                    phi.sources[split.label] = phi.sources.pop(pred_name)
+                pred = split
+            moves = [(phi.dest, phi.sources[pred.label]) for phi in phis]
+            pred.insert_before_terminator(sequentialize_copies(moves, cfg.new_var))
+        del block.instructions[:len(phis)]
+
+
+def sequentialize_copies(moves: list[tuple[IRVar, IRVar]],
+                         new_var: Callable[[], IRVar]) -> list[ir.Instruction]:
+    """
+    Orders a set of simultaneous (dest, source) copies, breaking cycles
+    such as a swap with a temporary register.
+    """
+    pending = {dest: source for dest, source in moves if dest != source}
+    copies: list[ir.Instruction] = []
+    while pending:
+        sources = set(pending.values())
+        ready = [dest for dest in pending if dest not in sources]
+        if ready:
+            for dest in ready:
+                copies.append(ir.Copy(pending.pop(dest), dest))
+            continue
+        # Only cycles are left: save one register and read the copy instead.
+        dest = next(iter(pending))
+        temp = new_var()
+        copies.append(ir.Copy(dest, temp))
+        pending = {d: temp if s == dest else s for d, s in pending.items()}
+    return copies
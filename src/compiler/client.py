@@ -0,0 +1,68 @@
+"""
+Thin client for `compiler serve`. It only imports the standard library
+modules it needs, so starting it costs little more than starting Python.
+
+    python -m compiler.client [--socket=PATH] <command> [arguments...] [file]
+"""
+import json
+import os
+import socket
+import sys
+
+PROTOCOL_VERSION = 1
+
+
+def default_socket_path() -> str:
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'compiler.sock')
+    return f'/tmp/compiler-{os.getuid()}.sock'
+
+
+def send_request(socket_path: str, request: dict) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        with sock.makefile('rwb') as stream:
+            stream.write(json.dumps(request).encode() + b'\n')
+            stream.flush()
+            response: dict = json.loads(stream.readline())
+    return response
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = sys.argv[1:] if argv is None else argv
+    socket_path = default_socket_path()
+    forwarded = []
+    for arg in args:
+        if arg.startswith('--socket='):
+            socket_path = arg.split('=', 1)[1]
+        else:
+            forwarded.append(arg)
+
+    # A single source file is read here and sent as text, so the server
+    # needn't be able to open it. Standard input then becomes program input.
+    positional = [i for i, arg in enumerate(forwarded) if not arg.startswith('-')]
+    request: dict = {'version': PROTOCOL_VERSION, 'cwd': os.getcwd(), 'stdin': ''}
+    if len(positional) == 2 and os.path.isfile(forwarded[positional[1]]):
+        with open(forwarded[positional[1]]) as f:
+            request['source'] = f.read()
+        del forwarded[positional[1]]
+        if not sys.stdin.isatty():
+            request['stdin'] = sys.stdin.read()
+    elif len(positional) == 1 and forwarded[positional[0]] != 'bench':
+        request['source'] = sys.stdin.read()
+    request['args'] = forwarded
+
+    try:
+        response = send_request(socket_path, request)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"Error: no compiler server listening on {socket_path}; "
+              "start one with `compiler serve`", file=sys.stderr)
+        return 1
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    return int(response['status'])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,274 @@
+from typing import TYPE_CHECKING, Callable, Generator
+
+import compiler.ast as ast
+from compiler.builtins import (INT_MAX, INT_MIN, builtin_values, int_div,
+                               int_mod, wrap_int)
+from compiler.interpreter import Resolution, Value, resolve
+from compiler.vectorizer import analyze_loop, load_numpy, run_counted
+
+if TYPE_CHECKING:
+    from compiler.sandbox import Budget
+
+Thunk = Callable[[], Value]
+
+# A node's compiler yields the children it needs and is sent back their
+# thunks. `ClosureCompiler.compile_expression` drives these generators from
+# an explicit stack, so compiling never recurses once per node.
+NodeCompiler = Generator[ast.Expression, Thunk, Thunk]
+
+# Operators in one run of nested closures of a left-associative chain.
+# Longer chains are cut into runs of this length that execute one after
+# another, since calling a closure nested once per operator would recurse
+# as deep as the chain is long.
+CHAIN_SEGMENT = 64
+
+
+def _int_op(op: str, left: Thunk, right: Thunk) -> Thunk:
+    if op == '+':
+        def add() -> Value:
+            r = left() + right()
+            return r if INT_MIN <= r <= INT_MAX else wrap_int(r)
+        return add
+    elif op == '-':
+        def sub() -> Value:
+            r = left() - right()
+            return r if INT_MIN <= r <= INT_MAX else wrap_int(r)
+        return sub
+    elif op == '*':
+        def mul() -> Value:
+            r = left() * right()
+            return r if INT_MIN <= r <= INT_MAX else wrap_int(r)
+        return mul
+    elif op == '/':
+        return lambda: int_div(left(), right())
+    elif op == '%':
+        return lambda: int_mod(left(), right())
+    elif op == '<':
+        return lambda: left() < right()
+    elif op == '<=':
+        return lambda: left() <= right()
+    elif op == '>':
+        return lambda: left() > right()
+    elif op == '>=':
+        return lambda: left() >= right()
+    elif op == '==':
+        return lambda: left() == right()
+    elif op == '!=':
+        return lambda: left() != right()
+    elif op == 'and':
+        return lambda: left() and right()
+    elif op == 'or':
+        return lambda: left() or right()
+    raise KeyError(op)
+
+
+def _governed_loop(cond: Thunk, body: Thunk, budget: 'Budget',
+                   location: tuple[int, int]) -> Thunk:
+    def governed_loop() -> Value:
+        while cond():
+            body()
+            budget.countdown -= 1
+            if not budget.countdown:
+                budget.checkpoint(location)
+        return None
+    return governed_loop
+
+
+def _governed_call(frame: list[Value], slot: int, args: list[Thunk],
+                   budget: 'Budget', location: tuple[int, int]) -> Thunk:
+    def governed_call() -> Value:
+        budget.countdown -= 1
+        if not budget.countdown:
+            budget.checkpoint(location)
+        return frame[slot](*[arg() for arg in args])
+    return governed_call
+
+
+class ClosureCompiler:
+    """
+    Compiles an AST into nested Python closures.
+    Every node is translated exactly once; operators are picked at compile
+    time and variable frames are bound into the closures, so running the
+    program does no `match` dispatch and no name lookups.
+    """
+
+    def __init__(self, root: ast.Expression, vectorize: bool = True,
+                 budget: 'Budget | None' = None) -> None:
+        self.root = root
+        # Run counted loops as NumPy array operations, where it's installed.
+        self.vectorize = vectorize
+        # Charged for every loop iteration and call, if given.
+        self.budget = budget
+        self.resolution: Resolution = resolve(root)
+        # Blocks never re-enter themselves (there are no user functions),
+        # so each Block gets one statically allocated frame.
+        self.frames: list[list[Value]] = [
+            [builtin_values.get(name) for name in self.resolution.globals]
+        ]
+        # id() of each compiled Block -> the closures of its statements.
+        self.block_statements: dict[int, list[Thunk]] = {}
+
+    def compile(self) -> Thunk:
+        return self.compile_expression(self.root)
+
+    def variable(self, node: ast.Identifier) -> tuple[list[Value], int]:
+        depth, slot = self.resolution.slots[id(node)]
+        return self.frames[depth], slot
+
+    def compile_expression(self, node: ast.Expression) -> Thunk:
+        stack: list[NodeCompiler] = [self.compile_node(node)]
+        thunk: Thunk | None = None
+        while stack:
+            try:
+                child = stack[-1].send(thunk)  # type: ignore[arg-type]
+            except StopIteration as done:
+                stack.pop()
+                thunk = done.value
+                continue
+            stack.append(self.compile_node(child))
+            thunk = None
+        assert thunk is not None
+        return thunk
+
+    def compile_node(self, node: ast.Expression) -> NodeCompiler:
+        match node:
+            case ast.Literal():
+                constant = node.value
+                return lambda: constant
+
+            case ast.Identifier():
+                frame, slot = self.variable(node)
+                return lambda: frame[slot]
+
+            case ast.BinaryOp():
+                # The operators along the left spine, innermost first.
+                chain = [node]
+                while type(chain[-1].left) is ast.BinaryOp:
+                    chain.append(chain[-1].left)
+                chain.reverse()
+                value = yield chain[0].left
+                segments: list[Thunk] = []
+                carried: list[Value] = [None]
+                for count, op_node in enumerate(chain):
+                    right = yield op_node.right
+                    if count and count % CHAIN_SEGMENT == 0:
+                        # Start a new run from the previous run's result.
+                        segments.append(value)
+                        value = lambda: carried[0]
+                    try:
+                        value = _int_op(op_node.op, value, right)
+                    except KeyError:
+                        raise ValueError(f"unknown binary operator '{op_node.op}' at {op_node.location}")
+                if not segments:
+                    return value
+                last = value
+
+                def chain_segments() -> Value:
+                    for segment in segments:
+                        carried[0] = segment()
+                    return last()
+                return chain_segments
+
+            case ast.UnaryOp():
+                operand = yield node.operand
+                if node.operator == '-':
+                    return lambda: wrap_int(-operand())
+                elif node.operator == 'not':
+                    return lambda: not operand()
+                raise ValueError(f"unknown unary operator '{node.operator}' at {node.location}")
+
+            case ast.ControlFlow():
+                cond = yield node.if_exp
+                then = yield node.then_exp
+                if node.else_exp is None:
+                    def if_then() -> Value:
+                        if cond():
+                            then()
+                        return None
+                    return if_then
+                otherwise = yield node.else_exp
+                return lambda: then() if cond() else otherwise()
+
+            case ast.WhileLoop():
+                cond = yield node.while_expr
+                body = yield node.do_expr
+                if self.budget is not None:
+                    return _governed_loop(cond, body, self.budget, node.location)
+
+                counted = analyze_loop(node, self.resolution) if self.vectorize else None
+                if counted is not None and load_numpy():
+                    frames = list(self.frames)
+
+                    def vectorized_loop() -> Value:
+                        run_counted(counted, frames)
+                        while cond():
+                            body()
+                        return None
+                    return vectorized_loop
+
+                def while_loop() -> Value:
+                    while cond():
+                        body()
+                    return None
+                return while_loop
+
+            case ast.Block():
+                self.frames.append([None] * self.resolution.frame_sizes[id(node)])
+                compiled = []
+                for expr in node.expressions:
+                    thunk = yield expr
+                    if type(expr) is ast.Block:
+                        # Entering a block does nothing at run time, so a
+                        # nested block's statements run inline instead of
+                        # nesting one closure call per level.
+                        compiled.extend(self.block_statements.pop(id(expr)))
+                    else:
+                        compiled.append(thunk)
+                self.frames.pop()
+                if not compiled:
+                    compiled.append(lambda: None)
+                self.block_statements[id(node)] = compiled
+                if len(compiled) == 1:
+                    return compiled[0]
+                *init, last = compiled
+
+                def block() -> Value:
+                    for expr in init:
+                        expr()
+                    return last()
+                return block
+
+            case ast.Variable():
+                value = yield node.value
+                frame, slot = self.variable(node.name)
+
+                def declare() -> Value:
+                    frame[slot] = value()
+                    return None
+                return declare
+
+            case ast.Assignment():
+                value = yield node.value
+                frame, slot = self.variable(node.name)
+
+                def assign() -> Value:
+                    frame[slot] = result = value()
+                    return result
+                return assign
+
+            case ast.Function():
+                frame, slot = self.variable(node.identifier)
+                args = []
+                for arg in node.args:
+                    args.append((yield arg))
+                if self.budget is not None:
+                    return _governed_call(frame, slot, args, self.budget,
+                                          node.identifier.location)
+                return lambda: frame[slot](*[arg() for arg in args])
+
+            case _:
+                raise ValueError(f"unknown node {type(node).__name__} at {node.location}")
+
+
+def compile_closures(root: ast.Expression, vectorize: bool = True) -> Thunk:
+    return ClosureCompiler(root, vectorize).compile()
@@ -0,0 +1,11 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Diagnostic:
+    """An error recorded instead of raised, so that compiling goes on and finds the rest."""
+    location: tuple[int, int] | None
+    message: str
+
+    def __str__(self) -> str:
+        return f'{self.location}: {self.message}'
@@ -0,0 +1,242 @@
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import compiler.ast as ast
+from compiler import ir, vm
+from compiler.builtins import builtin_values
+from compiler.interpreter import Evaluator, Interpreter, Value
+
+Location = tuple[int, int]
+
+
+@dataclass
+class LoopStats:
+    """Iterations of one while loop and the time spent in its body."""
+    iterations: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class ExecutionProfile:
+    """
+    What ran while a program executed, keyed by the (line, column) locations
+    the tokenizer attached to the source.
+    `stacks` maps a stack of frames (outermost first) to its own weight:
+    microseconds for the tree interpreter, instructions for the VM.
+    """
+    counts: Counter[Location] = field(default_factory=Counter)
+    loops: dict[Location, LoopStats] = field(default_factory=dict)
+    stacks: Counter[tuple[str, ...]] = field(default_factory=Counter)
+    # Every IR instruction with its execution count, when profiled on the VM.
+    instructions: list[tuple[ir.Instruction, int]] = field(default_factory=list)
+
+    def line_counts(self) -> Counter[int]:
+        lines: Counter[int] = Counter()
+        for (line, _), count in self.counts.items():
+            lines[line] += count
+        return lines
+
+
+def _frame(name: str, location: Location | None) -> str:
+    if location is None:
+        return name
+    return f'{name}@{location[0]}:{location[1]}'
+
+
+def source_locations(root: ast.Expression) -> dict[int, Location]:
+    """
+    Maps id() of every node to the location of its first token. The parser
+    gives compound nodes the location of the token following them, so this
+    is the earliest location of any literal or identifier underneath.
+    """
+    starts: dict[int, Location] = {}
+    for node in reversed(ast.walk(root)):
+        candidates = [starts[id(child)] for child in ast.children(node) if id(child) in starts]
+        if isinstance(node, (ast.Literal, ast.Identifier)) or not candidates:
+            candidates.append(node.location)
+        candidates = [c for c in candidates if c is not None]
+        if candidates:
+            starts[id(node)] = min(candidates)
+    return starts
+
+
+class ProfilingInterpreter(Interpreter):
+    """
+    Tree-walking interpreter that counts how often every node is evaluated
+    and times the body of every while loop. Time is charged to the stack of
+    enclosing loops and function calls that was active when it was spent.
+    """
+
+    def __init__(self, root: ast.Expression) -> None:
+        super().__init__(root)
+        self.profile = ExecutionProfile()
+        self.starts = source_locations(root)
+        self.stack: list[str] = ['program']
+        self.seconds: dict[tuple[str, ...], float] = {}
+        self.mark = 0.0
+
+    def run(self) -> Value:
+        self.mark = time.perf_counter()
+        try:
+            return super().run()
+        finally:
+            self._charge()
+            for stack, seconds in self.seconds.items():
+                self.profile.stacks[stack] += round(seconds * 1_000_000)
+
+    def _charge(self) -> None:
+        now = time.perf_counter()
+        stack = tuple(self.stack)
+        self.seconds[stack] = self.seconds.get(stack, 0.0) + now - self.mark
+        self.mark = now
+
+    def _push(self, frame: str) -> None:
+        self._charge()
+        self.stack.append(frame)
+
+    def _pop(self) -> None:
+        self._charge()
+        self.stack.pop()
+
+    # Literals and variables are counted too, so they go through `step`.
+    inline_leaves = False
+
+    def step(self, node: ast.Expression) -> Evaluator:
+        location = self.starts.get(id(node))
+        if location is not None:
+            self.profile.counts[location] += 1
+        match node:
+            case ast.WhileLoop() if location is not None:
+                stats = self.profile.loops.setdefault(location, LoopStats())
+                self._push(_frame('while', location))
+                try:
+                    while (yield node.while_expr):
+                        start = time.perf_counter()
+                        yield node.do_expr
+                        stats.seconds += time.perf_counter() - start
+                        stats.iterations += 1
+                finally:
+                    self._pop()
+                return None
+
+            case ast.Function():
+                args = []
+                for arg in node.args:
+                    args.append((yield arg))
+                depth, slot = self.resolution.slots[id(node.identifier)]
+                self._push(_frame(node.identifier.name, location))
+                try:
+                    return self.frames[depth][slot](*args)
+                finally:
+                    self._pop()
+
+            case _:
+                return (yield from super().step(node))
+
+
+def profile_tree(root: ast.Expression) -> tuple[Value, ExecutionProfile]:
+    """Runs a program on the tree-walking interpreter with profiling on."""
+    interpreter = ProfilingInterpreter(root)
+    result = interpreter.run()
+    return result, interpreter.profile
+
+
+def _basic_blocks(instructions: list[ir.Instruction]) -> list[tuple[int, int]]:
+    starts = {0}
+    for i, ins in enumerate(instructions):
+        if isinstance(ins, ir.Label):
+            starts.add(i)
+        elif isinstance(ins, (ir.Jump, ir.CondJump)):
+            starts.add(i + 1)
+    ordered = sorted(s for s in starts if s < len(instructions))
+    return list(zip(ordered, ordered[1:] + [len(instructions)]))
+
+
+def profile_ir(program: ir.IRProgram) -> tuple[Value, ExecutionProfile]:
+    """
+    Runs IR on the bytecode VM with profiling on. Every instruction in a
+    basic block runs as often as the block is entered, so only block
+    entries are counted: each block starts with a call to a counter.
+    Instructions are counted at the location of the node they came from.
+    """
+    blocks = _basic_blocks(program.instructions)
+    entries = [0] * len(blocks)
+    functions: dict[str, Callable[..., Any]] = dict(builtin_values)
+    instrumented: list[ir.Instruction] = []
+    for b, (start, end) in enumerate(blocks):
+        counter = f'__count_{b}'
+
+        def count(b: int = b) -> None:
+            entries[b] += 1
+
+        functions[counter] = count
+        body = program.instructions[start:end]
+        labels = 1 if body and isinstance(body[0], ir.Label) else 0
+        instrumented.extend(body[:labels])
+        instrumented.append(ir.Call(counter, [], ir.UNIT))
+        instrumented.extend(body[labels:])
+
+    result = vm.run(vm.assemble(ir.IRProgram(instrumented, program.result, program.var_count),
+                                functions))
+
+    profile = ExecutionProfile()
+    block_name = 'entry'
+    for b, (start, end) in enumerate(blocks):
+        body = program.instructions[start:end]
+        if isinstance(body[0], ir.Label):
+            block_name = body[0].name
+        executed = 0
+        for ins in body:
+            profile.instructions.append((ins, entries[b]))
+            if isinstance(ins, ir.Label):
+                continue
+            executed += entries[b]
+            if ins.location is not None:
+                profile.counts[ins.location] += entries[b]
+        if executed:
+            profile.stacks[('program', block_name)] += executed
+    return result, profile
+
+
+def annotate_source(source_code: str, profile: ExecutionProfile) -> str:
+    """
+    The source with each line prefixed by how many times the nodes or
+    instructions on it ran and, for lines starting a while loop, its
+    iteration count and total body time.
+    """
+    line_counts = profile.line_counts()
+    line_loops: dict[int, LoopStats] = {}
+    for (line, _), stats in profile.loops.items():
+        total = line_loops.setdefault(line, LoopStats())
+        total.iterations += stats.iterations
+        total.seconds += stats.seconds
+    lines = [f"{'count':>10} {'iterations':>10} {'loop ms':>10} | source"]
+    for number, text in enumerate(source_code.splitlines(), start=1):
+        count = str(line_counts[number]) if number in line_counts else ''
+        line_stats = line_loops.get(number)
+        iterations = '' if line_stats is None else str(line_stats.iterations)
+        seconds = '' if line_stats is None else f'{line_stats.seconds * 1000:.3f}'
+        lines.append(f'{count:>10} {iterations:>10} {seconds:>10} | {text}')
+    return '\n'.join(lines) + '\n'
+
+
+def annotate_ir(profile: ExecutionProfile) -> str:
+    """The profiled IR with each instruction prefixed by its execution count."""
+    lines = []
+    for ins, count in profile.instructions:
+        if isinstance(ins, ir.Label):
+            lines.append(f"{'':>10}  {ins.name}:")
+        else:
+            lines.append(f'{count:>10}      {ins}')
+    return '\n'.join(lines) + '\n'
+
+
+def folded_stacks(profile: ExecutionProfile) -> str:
+    """The stacks in the folded format read by flamegraph.pl and speedscope."""
+    return ''.join(
+        f"{';'.join(stack)} {weight}\n"
+        for stack, weight in sorted(profile.stacks.items())
+        if weight > 0
+    )
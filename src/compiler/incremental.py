@@ -0,0 +1,200 @@
+import dataclasses
+import itertools
+from dataclasses import dataclass, field
+from typing import Callable
+
+import compiler.ast as ast
+from compiler.builtins import root_symbol_table
+from compiler.parser import parse
+from compiler.tokenizer import SourceMap, Token, Tokenizer
+from compiler.type_checker import typecheck
+from compiler.types import SymTab, Type, Unit
+
+_node_ids = itertools.count(1)
+
+# (node, start, end, previous record if unchanged, node id to keep)
+PendingStatement = tuple[ast.Expression, int, int, 'Statement | None', int | None]
+
+
+@dataclass
+class Statement:
+    """
+    A top-level statement of the program block.
+    `node_id` survives edits elsewhere in the program, and edits inside the
+    statement that keep the number of statements. `reads` records the
+    type of every top-level variable the statement may refer to, as seen
+    when it was checked, and `defines` is the binding it adds.
+    """
+    node: ast.Expression
+    node_id: int
+    start: int
+    end: int
+    type: Type
+    reads: dict[str, Type | None]
+    defines: tuple[str, Type] | None
+
+
+@dataclass
+class CheckedProgram:
+    source_code: str
+    tree: ast.Expression
+    type: Type
+    statements: list[Statement] = field(default_factory=list)
+    # Source offsets just inside the braces of the program block.
+    body_start: int = 0
+    body_end: int = 0
+    # Statements that were parsed or type-checked again by the last run.
+    changed: list[ast.Expression] = field(default_factory=list)
+
+
+def check(source_code: str) -> CheckedProgram:
+    """Tokenizes, parses and type-checks a whole program from scratch."""
+    spans: list[tuple[int, int]] = []
+    body_spans: list[tuple[int, int]] = []
+    tree = parse(Tokenizer.tokenize(source_code), statement_spans=spans, body_spans=body_spans)
+    if not isinstance(tree, ast.Block) or len(spans) == 0:
+        return CheckedProgram(source_code, tree, typecheck(tree), changed=[tree])
+    body_start, body_end = body_spans[0]
+    statements: list[PendingStatement] = [
+        (node, start, end, None, None) for node, (start, end) in zip(tree.expressions, spans)
+    ]
+    return _check_statements(source_code, tree, statements, body_start, body_end)
+
+
+def recheck(previous: CheckedProgram, source_code: str) -> CheckedProgram:
+    """
+    Re-checks an edited version of `previous.source_code`.
+    Only the top-level statements touching the edited region are re-lexed
+    and re-parsed. A statement is type-checked again only if it was re-parsed
+    or the top-level variables it can see changed type; all others keep
+    their node, node id and type. Reused nodes are shared with `previous`
+    and have their locations moved in place.
+    Falls back to a full `check` when the edit is not inside the program
+    block or the damaged region does not parse on its own.
+    """
+    old_source = previous.source_code
+    if source_code == old_source:
+        return dataclasses.replace(previous, changed=[])
+    if not previous.statements:
+        return check(source_code)
+
+    # The edit replaces old_source[edit_start:old_end] with source_code[edit_start:new_end].
+    limit = min(len(old_source), len(source_code))
+    edit_start = _common_length(lambda n: old_source[:n] == source_code[:n], limit)
+    suffix = _common_length(
+        lambda n: old_source[len(old_source) - n:] == source_code[len(source_code) - n:],
+        limit - edit_start)
+    old_end = len(old_source) - suffix
+    new_end = len(source_code) - suffix
+    delta = new_end - old_end
+
+    if edit_start < previous.body_start or old_end > previous.body_end:
+        return check(source_code)
+
+    # Re-lex everything between the last statement before the edit and the
+    # first statement after it, so comments in the gaps are handled too.
+    old_statements = previous.statements
+    first = 0
+    while first < len(old_statements) and old_statements[first].end < edit_start:
+        first += 1
+    last = first
+    while last < len(old_statements) and old_statements[last].start <= old_end:
+        last += 1
+    region_start = old_statements[first - 1].end if first > 0 else previous.body_start
+    region_end = old_statements[last].start if last < len(old_statements) else previous.body_end
+
+    source_map = SourceMap(source_code)
+    region_tokens = list(Tokenizer.scan(source_code[region_start:region_end + delta],
+                                         region_start, source_map))
+    spans: list[tuple[int, int]] = []
+    try:
+        region_tree = parse([Token('Punctuation', '{', offset=region_start, source_map=source_map),
+                             *region_tokens,
+                             Token('Punctuation', '}', offset=region_end + delta, source_map=source_map)],
+                            statement_spans=spans)
+    except Exception:
+        return check(source_code)
+    assert isinstance(region_tree, ast.Block)
+
+    old_end_pos = SourceMap(old_source).location(old_end)
+    new_end_pos = source_map.location(new_end)
+
+    def shift(loc: tuple) -> tuple:
+        if loc is None or loc < old_end_pos:
+            return loc
+        elif loc[0] == old_end_pos[0]:
+            return (new_end_pos[0], loc[1] - old_end_pos[1] + new_end_pos[1])
+        else:
+            return (loc[0] + new_end_pos[0] - old_end_pos[0], loc[1])
+
+    def relocate(node: ast.Expression) -> None:
+        for n in ast.walk(node):
+            n.location = shift(n.location)
+
+    statements: list[PendingStatement] = []
+    for s in old_statements[:first]:
+        statements.append((s.node, s.start, s.end, s, s.node_id))
+    # Re-parsed statements inherit ids when they replace as many statements.
+    replaced_ids: list[int | None] = [s.node_id for s in old_statements[first:last]]
+    if len(replaced_ids) != len(spans):
+        replaced_ids = [None] * len(spans)
+    for node, (start, end), node_id in zip(region_tree.expressions, spans, replaced_ids):
+        statements.append((node, start, end, None, node_id))
+    for s in old_statements[last:]:
+        if new_end_pos != old_end_pos:
+            relocate(s.node)
+        statements.append((s.node, s.start + delta, s.end + delta, s, s.node_id))
+
+    tree = previous.tree
+    assert isinstance(tree, ast.Block)
+    trailing = tree.expressions[len(old_statements):]
+    root = ast.Block(shift(tree.location), [s[0] for s in statements] + trailing)
+    return _check_statements(source_code, root, statements,
+                             previous.body_start, previous.body_end + delta)
+
+
+def _check_statements(source_code: str, root: ast.Block,
+                      statements: list[PendingStatement],
+                      body_start: int, body_end: int) -> CheckedProgram:
+    block_symbol_table = SymTab(parent=root_symbol_table())
+    env = block_symbol_table.locals
+    checked: list[Statement] = []
+    changed: list[ast.Expression] = []
+    result_type: Type = Unit()
+
+    for node, start, end, old, node_id in statements:
+        if old is not None and all(env.get(name) is t for name, t in old.reads.items()):
+            result_type = old.type
+            if old.defines is not None:
+                block_symbol_table.define(*old.defines)
+            checked.append(Statement(old.node, old.node_id, start, end,
+                                     old.type, old.reads, old.defines))
+            continue
+        reads = {
+            n.name: env.get(n.name) for n in ast.walk(node) if isinstance(n, ast.Identifier)
+        }
+        result_type = typecheck(node, block_symbol_table)
+        defines = None
+        if isinstance(node, ast.Variable):
+            defines = (node.name.name, env[node.name.name])
+        if node_id is None:
+            node_id = next(_node_ids)
+        checked.append(Statement(node, node_id, start, end, result_type, reads, defines))
+        changed.append(node)
+
+    for expr in root.expressions[len(statements):]:
+        result_type = typecheck(expr, block_symbol_table)
+    return CheckedProgram(source_code, root, result_type, checked,
+                          body_start=body_start, body_end=body_end, changed=changed)
+
+
+def _common_length(matches: Callable[[int], bool], limit: int) -> int:
+    """Largest n <= limit with matches(n), by binary search over string slices."""
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if matches(mid):
+            low = mid
+        else:
+            high = mid - 1
+    return low
@@ -0,0 +1,268 @@
+from dataclasses import dataclass, field
+from typing import Any, Generator
+
+import compiler.ast as ast
+from compiler.builtins import (INT_MAX, INT_MIN, builtin_values, int_div,
+                               int_mod, wrap_int)
+
+# An int, a bool, None for Unit or a builtin function. Typed as Any: the
+# type checker has already made sure every operation gets the values it needs.
+Value = Any
+
+# A compound node's evaluator yields its children and is sent back their
+# values. `Interpreter.evaluate` drives these generators from an explicit
+# stack instead of recursing once per node.
+Evaluator = Generator[ast.Expression, Value, Value]
+
+
+@dataclass
+class Resolution:
+    """
+    Result of resolving names up front.
+    `slots` maps id() of every Identifier to its (depth, slot) pair and
+    `frame_sizes` maps id() of every Block to the number of slots it needs.
+    """
+    slots: dict[int, tuple[int, int]] = field(default_factory=dict)
+    frame_sizes: dict[int, int] = field(default_factory=dict)
+    globals: list[str] = field(default_factory=list)
+
+
+def resolve(root: ast.Expression) -> Resolution:
+    """
+    Assigns every variable a fixed slot in the frame of its enclosing Block.
+    Depth 0 is the global frame holding the builtins, each nested Block
+    adds one level.
+    """
+    resolution = Resolution(globals=list(builtin_values))
+    scopes: list[dict[str, int]] = [
+        {name: i for i, name in enumerate(resolution.globals)}
+    ]
+    sizes: list[int] = [len(resolution.globals)]
+
+    def lookup(node: ast.Identifier) -> None:
+        for depth in range(len(scopes) - 1, -1, -1):
+            slot = scopes[depth].get(node.name)
+            if slot is not None:
+                resolution.slots[id(node)] = (depth, slot)
+                return
+        raise NameError(f"Name '{node.name}' not defined")
+
+    def declare(node: ast.Identifier) -> None:
+        depth = len(scopes) - 1
+        slot = sizes[depth]
+        sizes[depth] += 1
+        scopes[depth][node.name] = slot
+        resolution.slots[id(node)] = (depth, slot)
+        if depth == 0:
+            resolution.globals.append(node.name)
+
+    # Each compound node's visitor yields its children in evaluation order;
+    # the loop below drives them from an explicit stack, so deep trees such
+    # as long operator chains never touch Python's recursion limit.
+    def visit(node: ast.Expression) -> Generator[ast.Expression, None, None]:
+        match node:
+            case ast.Literal():
+                pass
+            case ast.Identifier():
+                lookup(node)
+            case ast.BinaryOp():
+                yield node.left
+                yield node.right
+            case ast.UnaryOp():
+                yield node.operand
+            case ast.ControlFlow():
+                yield node.if_exp
+                yield node.then_exp
+                if node.else_exp is not None:
+                    yield node.else_exp
+            case ast.WhileLoop():
+                yield node.while_expr
+                yield node.do_expr
+            case ast.Variable():
+                yield node.value
+                declare(node.name)
+            case ast.Assignment():
+                if not isinstance(node.name, ast.Identifier):
+                    raise ValueError(f"invalid assignment target at {node.location}")
+                yield node.value
+                yield node.name
+            case ast.Function():
+                yield node.identifier
+                yield from node.args
+            case ast.Block():
+                scopes.append({})
+                sizes.append(0)
+                yield from node.expressions
+                scopes.pop()
+                resolution.frame_sizes[id(node)] = sizes.pop()
+            case _:
+                raise ValueError(f"unknown node {type(node).__name__} at {node.location}")
+
+    stack = [visit(root)]
+    while stack:
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+        elif type(child) is ast.Identifier:
+            lookup(child)
+        elif type(child) is not ast.Literal:
+            stack.append(visit(child))
+    return resolution
+
+
+class Interpreter:
+    """
+    Tree-walking interpreter over a resolved AST.
+    Variables live in a stack of list frames indexed by the pre-resolved
+    (depth, slot) pairs, so reading one never searches a scope chain.
+    """
+
+    def __init__(self, root: ast.Expression) -> None:
+        self.root = root
+        self.resolution = resolve(root)
+        self.frames: list[list[Value]] = [
+            [builtin_values.get(name) for name in self.resolution.globals]
+        ]
+
+    def run(self) -> Value:
+        return self.evaluate(self.root)
+
+    # Whether `evaluate` reads literals and variables itself instead of
+    # going through `step`. Subclasses that need to see every node clear it.
+    inline_leaves = True
+
+    def evaluate(self, node: ast.Expression) -> Value:
+        slots = self.resolution.slots
+        frames = self.frames
+        inline_leaves = self.inline_leaves
+        stack: list[Evaluator] = [self.step(node)]
+        value: Value = None
+        try:
+            while stack:
+                try:
+                    child = stack[-1].send(value)
+                except StopIteration as done:
+                    stack.pop()
+                    value = done.value
+                    continue
+                if inline_leaves:
+                    cls = type(child)
+                    if cls is ast.Literal:
+                        value = child.value  # type: ignore[attr-defined]
+                        continue
+                    if cls is ast.Identifier:
+                        depth, slot = slots[id(child)]
+                        value = frames[depth][slot]
+                        continue
+                stack.append(self.step(child))
+                value = None
+        except BaseException:
+            # Let the evaluators still on the stack run their cleanup (such
+            # as popping the frames of the blocks being left), innermost first.
+            while stack:
+                stack.pop().close()
+            raise
+        return value
+
+    def step(self, node: ast.Expression) -> Evaluator:
+        """Evaluates one node, yielding each child whose value it needs."""
+        match node:
+            case ast.BinaryOp():
+                op = node.op
+                a = yield node.left
+                if op == 'and':
+                    return (yield node.right) if a else a
+                if op == 'or':
+                    return a if a else (yield node.right)
+                b = yield node.right
+                if op == '+':
+                    result = a + b
+                elif op == '-':
+                    result = a - b
+                elif op == '*':
+                    result = a * b
+                elif op == '/':
+                    return int_div(a, b)
+                elif op == '%':
+                    return int_mod(a, b)
+                elif op == '<':
+                    return a < b
+                elif op == '<=':
+                    return a <= b
+                elif op == '>':
+                    return a > b
+                elif op == '>=':
+                    return a >= b
+                elif op == '==':
+                    return a == b
+                elif op == '!=':
+                    return a != b
+                else:
+                    raise ValueError(f"unknown binary operator '{op}' at {node.location}")
+                if result < INT_MIN or result > INT_MAX:
+                    result = wrap_int(result)
+                return result
+
+            case ast.UnaryOp():
+                operand = yield node.operand
+                if node.operator == '-':
+                    return wrap_int(-operand)
+                elif node.operator == 'not':
+                    return not operand
+                else:
+                    raise ValueError(f"unknown unary operator '{node.operator}' at {node.location}")
+
+            case ast.ControlFlow():
+                if (yield node.if_exp):
+                    return (yield node.then_exp)
+                elif node.else_exp is not None:
+                    return (yield node.else_exp)
+                return None
+
+            case ast.WhileLoop():
+                while (yield node.while_expr):
+                    yield node.do_expr
+                return None
+
+            case ast.Block():
+                self.frames.append([None] * self.resolution.frame_sizes[id(node)])
+                try:
+                    result = None
+                    for expr in node.expressions:
+                        result = yield expr
+                    return result
+                finally:
+                    self.frames.pop()
+
+            case ast.Variable():
+                value = yield node.value
+                depth, slot = self.resolution.slots[id(node.name)]
+                self.frames[depth][slot] = value
+                return None
+
+            case ast.Assignment():
+                value = yield node.value
+                depth, slot = self.resolution.slots[id(node.name)]
+                self.frames[depth][slot] = value
+                return value
+
+            case ast.Function():
+                args = []
+                for arg in node.args:
+                    args.append((yield arg))
+                depth, slot = self.resolution.slots[id(node.identifier)]
+                return self.frames[depth][slot](*args)
+
+            case ast.Literal():
+                return node.value
+
+            case ast.Identifier():
+                depth, slot = self.resolution.slots[id(node)]
+                return self.frames[depth][slot]
+
+            case _:
+                raise ValueError(f"unknown node {type(node).__name__} at {node.location}")
+
+
+def interpret(root: ast.Expression) -> Value:
+    return Interpreter(root).run()
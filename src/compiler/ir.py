@@ -0,0 +1,160 @@
+import dataclasses
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass(frozen=True)
+class IRVar:
+    """A numbered virtual register. Register 0 is the (never written) unit value."""
+    index: int
+
+    def __str__(self) -> str:
+        return f'r{self.index}'
+
+
+UNIT = IRVar(0)
+
+
+@dataclass
+class Instruction:
+    """Base class for IR instructions."""
+    location: Any = field(kw_only=True, default=None, compare=False, repr=False)
+
+    def __str__(self) -> str:
+        def format_value(v: Any) -> str:
+            if isinstance(v, list):
+                return f'[{", ".join(format_value(e) for e in v)}]'
+            else:
+                return str(v)
+        args = ', '.join(
+            format_value(getattr(self, f.name))
+            for f in dataclasses.fields(self)
+            if f.name != 'location'
+        )
+        return f'{type(self).__name__}({args})'
+
+    def uses(self) -> list[IRVar]:
+        """The registers this instruction reads."""
+        return []
+
+    def defines(self) -> IRVar | None:
+        """The register this instruction writes, if any."""
+        return None
+
+    def replace_uses(self, mapping: dict[IRVar, IRVar]) -> None:
+        """Renames the registers this instruction reads."""
+        pass
+
+
+@dataclass
+class Label(Instruction):
+    """Marks the destination of a jump. Emitted in the instruction list."""
+    name: str
+
+    def __str__(self) -> str:
+        return self.name
+
+
+@dataclass
+class LoadIntConst(Instruction):
+    value: int
+    dest: IRVar
+
+    def defines(self) -> IRVar | None:
+        return self.dest
+
+
+@dataclass
+class LoadBoolConst(Instruction):
+    value: bool
+    dest: IRVar
+
+    def defines(self) -> IRVar | None:
+        return self.dest
+
+
+@dataclass
+class Copy(Instruction):
+    source: IRVar
+    dest: IRVar
+
+    def uses(self) -> list[IRVar]:
+        return [self.source]
+
+    def defines(self) -> IRVar | None:
+        return self.dest
+
+    def replace_uses(self, mapping: dict[IRVar, IRVar]) -> None:
+        self.source = mapping.get(self.source, self.source)
+
+
+@dataclass
+class Call(Instruction):
+    """Calls a builtin function or operator such as '+' or 'unary_-'."""
+    fun: str
+    args: list[IRVar]
+    dest: IRVar
+
+    def uses(self) -> list[IRVar]:
+        return self.args
+
+    def defines(self) -> IRVar | None:
+        return self.dest
+
+    def replace_uses(self, mapping: dict[IRVar, IRVar]) -> None:
+        self.args = [mapping.get(a, a) for a in self.args]
+
+
+@dataclass
+class Jump(Instruction):
+    label: Label
+
+
+@dataclass
+class CondJump(Instruction):
+    cond: IRVar
+    then_label: Label
+    else_label: Label
+
+    def uses(self) -> list[IRVar]:
+        return [self.cond]
+
+    def replace_uses(self, mapping: dict[IRVar, IRVar]) -> None:
+        self.cond = mapping.get(self.cond, self.cond)
+
+
+@dataclass
+class Phi(Instruction):
+    """
+    Picks the value from the predecessor block control came from.
+    Only appears in SSA form (see `compiler.cfg`); never in a runnable program.
+    """
+    sources: dict[str, IRVar]
+    dest: IRVar
+
+    def __str__(self) -> str:
+        sources = ', '.join(f'{label}: {var}' for label, var in self.sources.items())
+        return f'Phi([{sources}], {self.dest})'
+
+    def uses(self) -> list[IRVar]:
+        return list(self.sources.values())
+
+    def defines(self) -> IRVar | None:
+        return self.dest
+
+    def replace_uses(self, mapping: dict[IRVar, IRVar]) -> None:
+        self.sources = {label: mapping.get(v, v) for label, v in self.sources.items()}
+
+
+@dataclass
+class IRProgram:
+    """A lowered program: a flat instruction list and the register holding its result."""
+    instructions: list[Instruction]
+    result: IRVar
+    var_count: int
+
+    def __str__(self) -> str:
+        return '\n'.join(
+            str(ins) + ':' if isinstance(ins, Label) else '    ' + str(ins)
+            for ins in self.instructions
+        )
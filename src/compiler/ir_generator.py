@@ -0,0 +1,209 @@
+from typing import Generator
+
+import compiler.ast as ast
+from compiler import ir
+from compiler.builtins import builtin_types
+from compiler.ir import IRVar, UNIT
+from compiler.types import FunType, SymTab
+
+builtin_functions = {
+    name for name, type in builtin_types.items() if isinstance(type, FunType)
+}
+
+binary_operators = {'+', '-', '*', '/', '%', '<', '<=', '>', '>=', '==', '!='}
+
+# A node's lowering yields (child, symbol table) pairs, emitting code around
+# them, and is sent back the register holding each child's value.
+# `generate_ir` drives these generators from an explicit stack, so lowering
+# never recurses once per node.
+Lowering = Generator[tuple[ast.Expression, SymTab], IRVar, IRVar]
+
+
+def _assigning_nodes(root: ast.Expression) -> set[int]:
+    """id() of every node with an Assignment in its subtree."""
+    assigning: set[int] = set()
+    for node in reversed(ast.walk(root)):
+        if isinstance(node, ast.Assignment) or any(id(child) in assigning for child in ast.children(node)):
+            assigning.add(id(node))
+    return assigning
+
+
+def generate_ir(root: ast.Expression) -> ir.IRProgram:
+    """Lowers a type-checked AST into a flat list of IR instructions."""
+    instructions: list[ir.Instruction] = []
+    var_count = 1  # r0 is UNIT
+    label_count = 0
+    # Registers of variables, which assignments write in place.
+    variables: set[IRVar] = set()
+    assigning = _assigning_nodes(root)
+
+    def new_var() -> IRVar:
+        nonlocal var_count
+        var = IRVar(var_count)
+        var_count += 1
+        return var
+
+    def new_label(name: str) -> ir.Label:
+        nonlocal label_count
+        label_count += 1
+        return ir.Label(f'.L{label_count}_{name}')
+
+    def emit(instruction: ir.Instruction) -> None:
+        instructions.append(instruction)
+
+    def snapshot(var: IRVar, later: list[ast.Expression], loc: tuple[int, int]) -> IRVar:
+        """
+        `var`, copied to a fresh register if it is a variable that one of
+        the operands evaluated after it may assign to.
+        """
+        if var not in variables or not any(id(node) in assigning for node in later):
+            return var
+        copy = new_var()
+        emit(ir.Copy(var, copy, location=loc))
+        return copy
+
+    def visit(node: ast.Expression, symbol_table: SymTab) -> Lowering:
+        loc = node.location
+        match node:
+            case ast.Literal():
+                if node.value is None:
+                    return UNIT
+                dest = new_var()
+                if isinstance(node.value, bool):
+                    emit(ir.LoadBoolConst(node.value, dest, location=loc))
+                else:
+                    emit(ir.LoadIntConst(node.value, dest, location=loc))
+                return dest
+
+            case ast.Identifier():
+                return symbol_table.lookup(node.name)
+
+            case ast.BinaryOp() if node.op in ['and', 'or']:
+                dest = new_var()
+                right_label = new_label(f'{node.op}_right')
+                skip_label = new_label(f'{node.op}_skip')
+                end_label = new_label(f'{node.op}_end')
+                left = yield node.left, symbol_table
+                if node.op == 'and':
+                    emit(ir.CondJump(left, right_label, skip_label, location=loc))
+                else:
+                    emit(ir.CondJump(left, skip_label, right_label, location=loc))
+                emit(right_label)
+                right = yield node.right, symbol_table
+                emit(ir.Copy(right, dest, location=loc))
+                emit(ir.Jump(end_label, location=loc))
+                emit(skip_label)
+                emit(ir.LoadBoolConst(node.op == 'or', dest, location=loc))
+                emit(end_label)
+                return dest
+
+            case ast.BinaryOp():
+                if node.op not in binary_operators:
+                    raise ValueError(f"unknown binary operator '{node.op}' at {loc}")
+                left = snapshot((yield node.left, symbol_table), [node.right], loc)
+                right = yield node.right, symbol_table
+                dest = new_var()
+                emit(ir.Call(node.op, [left, right], dest, location=loc))
+                return dest
+
+            case ast.UnaryOp():
+                if node.operator not in ['-', 'not']:
+                    raise ValueError(f"unknown unary operator '{node.operator}' at {loc}")
+                operand = yield node.operand, symbol_table
+                dest = new_var()
+                emit(ir.Call(f'unary_{node.operator}', [operand], dest, location=loc))
+                return dest
+
+            case ast.ControlFlow():
+                then_label = new_label('then')
+                end_label = new_label('if_end')
+                cond = yield node.if_exp, symbol_table
+                if node.else_exp is None:
+                    emit(ir.CondJump(cond, then_label, end_label, location=loc))
+                    emit(then_label)
+                    yield node.then_exp, symbol_table
+                    emit(end_label)
+                    return UNIT
+                else_label = new_label('else')
+                dest = new_var()
+                emit(ir.CondJump(cond, then_label, else_label, location=loc))
+                emit(then_label)
+                then = yield node.then_exp, symbol_table
+                emit(ir.Copy(then, dest, location=loc))
+                emit(ir.Jump(end_label, location=loc))
+                emit(else_label)
+                otherwise = yield node.else_exp, symbol_table
+                emit(ir.Copy(otherwise, dest, location=loc))
+                emit(end_label)
+                return dest
+
+            case ast.WhileLoop():
+                start_label = new_label('while_start')
+                body_label = new_label('while_body')
+                end_label = new_label('while_end')
+                emit(start_label)
+                cond = yield node.while_expr, symbol_table
+                emit(ir.CondJump(cond, body_label, end_label, location=loc))
+                emit(body_label)
+                yield node.do_expr, symbol_table
+                emit(ir.Jump(start_label, location=loc))
+                emit(end_label)
+                return UNIT
+
+            case ast.Block():
+                block_symbol_table = SymTab(parent=symbol_table)
+                result = UNIT
+                for expr in node.expressions:
+                    result = yield expr, block_symbol_table
+                return result
+
+            case ast.Variable():
+                value = yield node.value, symbol_table
+                dest = new_var()
+                emit(ir.Copy(value, dest, location=loc))
+                symbol_table.define(node.name.name, dest)
+                variables.add(dest)
+                return UNIT
+
+            case ast.Assignment():
+                if not isinstance(node.name, ast.Identifier):
+                    raise ValueError(f"invalid assignment target at {loc}")
+                value = yield node.value, symbol_table
+                target = symbol_table.lookup(node.name.name)
+                emit(ir.Copy(value, target, location=loc))
+                return target
+
+            case ast.Function():
+                name = node.identifier.name
+                if name not in builtin_functions:
+                    raise ValueError(f"unknown function '{name}' at {loc}")
+                args = []
+                for i, arg in enumerate(node.args):
+                    args.append(snapshot((yield arg, symbol_table), node.args[i + 1:], loc))
+                dest = new_var()
+                emit(ir.Call(name, args, dest, location=loc))
+                return dest
+
+            case _:
+                raise ValueError(f"unknown node {type(node).__name__} at {loc}")
+
+    root_symbol_table = SymTab()
+    for name in ['true', 'false']:
+        var = new_var()
+        emit(ir.LoadBoolConst(name == 'true', var))
+        root_symbol_table.define(name, var)
+        variables.add(var)
+
+    stack: list[Lowering] = [visit(root, root_symbol_table)]
+    result: IRVar | None = None
+    while stack:
+        try:
+            child, child_symbol_table = stack[-1].send(result)  # type: ignore[arg-type]
+        except StopIteration as done:
+            stack.pop()
+            result = done.value
+            continue
+        stack.append(visit(child, child_symbol_table))
+        result = None
+    assert result is not None
+    return ir.IRProgram(instructions, result, var_count)
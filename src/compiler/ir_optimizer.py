@@ -0,0 +1,263 @@
+from typing import Callable, Hashable
+
+from compiler import ir
+from compiler.cfg import (BasicBlock, ControlFlowGraph, build_cfg, dominates,
+                          dominator_tree, dominators, from_ssa, to_ssa)
+from compiler.ir import IRVar
+
+# Operators without side effects that cannot fail: their instructions may be
+# deleted when unused and computed speculatively ahead of a loop.
+pure_operators = {
+    '+', '-', '*', '<', '<=', '>', '>=', '==', '!=', 'unary_-', 'unary_not',
+}
+# Division may fail, so it is never removed or moved, but equal divisions
+# still compute equal values and the later one can reuse the earlier.
+value_operators = pure_operators | {'/', '%'}
+commutative_operators = {'+', '*', '==', '!='}
+
+# A pass transforms an SSA-form graph and returns how many instructions it
+# removed (for loop-invariant code motion: moved out of a loop body).
+Pass = Callable[[ControlFlowGraph], int]
+
+
+def is_pure(ins: ir.Instruction) -> bool:
+    if isinstance(ins, (ir.LoadIntConst, ir.LoadBoolConst, ir.Copy, ir.Phi)):
+        return True
+    return isinstance(ins, ir.Call) and ins.fun in pure_operators
+
+
+def dead_code_elimination(cfg: ControlFlowGraph) -> int:
+    """Removes pure instructions whose results are never used."""
+    definitions: dict[IRVar, ir.Instruction] = {}
+    work: list[ir.Instruction] = []
+    for ins in cfg.instructions():
+        dest = ins.defines()
+        if dest is not None:
+            definitions[dest] = ins
+        if not is_pure(ins) or dest is None:
+            work.append(ins)
+    live: set[int] = {id(ins) for ins in work}
+    if cfg.result in definitions:
+        work.append(definitions[cfg.result])
+        live.add(id(definitions[cfg.result]))
+    while work:
+        for var in work.pop().uses():
+            definition = definitions.get(var)
+            if definition is not None and id(definition) not in live:
+                live.add(id(definition))
+                work.append(definition)
+
+    removed = 0
+    for block in cfg.blocks.values():
+        kept = [ins for ins in block.instructions if id(ins) in live]
+        removed += len(block.instructions) - len(kept)
+        block.instructions = kept
+    return removed
+
+
+def copy_propagation(cfg: ControlFlowGraph) -> int:
+    """
+    Replaces uses of copied registers with the original, and phis whose
+    sources are all the same register with that register.
+    """
+    removed = 0
+    while True:
+        mapping: dict[IRVar, IRVar] = {}
+        for ins in cfg.instructions():
+            if isinstance(ins, ir.Copy) and ins.source != ins.dest:
+                mapping[ins.dest] = ins.source
+            elif isinstance(ins, ir.Phi):
+                sources = {v for v in ins.sources.values() if v != ins.dest}
+                if len(sources) == 1:
+                    mapping[ins.dest] = sources.pop()
+        resolved: dict[IRVar, IRVar] = {}
+        for var in mapping:
+            seen = {var}
+            target = mapping[var]
+            while target in mapping and target not in seen:
+                seen.add(target)
+                target = mapping[target]
+            if target not in mapping:
+                resolved[var] = target
+        if not resolved:
+            return removed
+        for block in cfg.blocks.values():
+            kept = [ins for ins in block.instructions
+                    if not (isinstance(ins, (ir.Copy, ir.Phi)) and ins.dest in resolved)]
+            removed += len(block.instructions) - len(kept)
+            block.instructions = kept
+        cfg.replace_uses(resolved)
+
+
+def _value_key(ins: ir.Instruction) -> Hashable | None:
+    match ins:
+        case ir.LoadIntConst(value=value):
+            return ('int', value)
+        case ir.LoadBoolConst(value=value):
+            return ('bool', value)
+        case ir.Call(fun=fun, args=args) if fun in value_operators:
+            if fun in commutative_operators:
+                args = sorted(args, key=lambda a: a.index)
+            return (fun, *args)
+    return None
+
+
+def global_value_numbering(cfg: ControlFlowGraph) -> int:
+    """
+    Removes constants and operations that recompute a value already
+    available in a dominating block.
+    """
+    children = dominator_tree(dominators(cfg))
+    available: dict[Hashable, IRVar] = {}
+    replaced: dict[IRVar, IRVar] = {}
+    removed = 0
+    # Entries are (block, None) on the way down and (block, keys to forget) on the way up.
+    stack: list[tuple[str, list[Hashable] | None]] = [(cfg.entry, None)]
+    while stack:
+        name, added = stack.pop()
+        if added is not None:
+            for key in added:
+                del available[key]
+            continue
+        block = cfg.blocks[name]
+        added = []
+        kept = []
+        for ins in block.instructions:
+            ins.replace_uses(replaced)
+            key = _value_key(ins)
+            dest = ins.defines()
+            if key is not None and dest is not None:
+                if key in available:
+                    replaced[dest] = available[key]
+                    removed += 1
+                    continue
+                available[key] = dest
+                added.append(key)
+            kept.append(ins)
+        block.instructions = kept
+        stack.append((name, added))
+        for child in reversed(children[name]):
+            stack.append((child, None))
+    # Phis reached along back edges were visited before their sources.
+    cfg.replace_uses(replaced)
+    return removed
+
+
+def loop_invariant_code_motion(cfg: ControlFlowGraph) -> int:
+    """
+    Moves pure instructions whose operands are all defined outside a loop
+    into a preheader block that runs once before the loop.
+    """
+    idom = dominators(cfg)
+    preds = cfg.predecessors()
+    loops: dict[str, set[str]] = {}
+    for name in idom:
+        for header in cfg.blocks[name].successors():
+            if dominates(idom, header, name):
+                body = loops.setdefault(header, {header})
+                work = [name]
+                while work:
+                    b = work.pop()
+                    if b not in body:
+                        body.add(b)
+                        work.extend(preds[b])
+
+    layout = {name: i for i, name in enumerate(cfg.blocks)}
+    moved = 0
+    # Inner loops first, so their hoisted code can move out of outer loops later.
+    for header, body in sorted(loops.items(), key=lambda item: len(item[1])):
+        outside = [p for p in preds[header] if p not in body]
+        if len(outside) != 1:
+            continue
+        preheader = cfg.blocks[outside[0]]
+        if preheader.successors() != [header]:
+            preheader = _insert_preheader(cfg, header, outside[0])
+            for other in loops.values():
+                if header in other and other is not body:
+                    other.add(preheader.label)
+
+        defined_in_loop = {
+            dest for b in body for ins in cfg.blocks[b].instructions
+            if (dest := ins.defines()) is not None
+        }
+        hoisted: list[ir.Instruction] = []
+        changed = True
+        while changed:
+            changed = False
+            for b in sorted(body, key=lambda name: layout.get(name, -1)):
+                block = cfg.blocks[b]
+                kept = []
+                for ins in block.instructions:
+                    dest = ins.defines()
+                    if (dest is not None and is_pure(ins) and not isinstance(ins, ir.Phi)
+                            and not any(v in defined_in_loop for v in ins.uses())):
+                        hoisted.append(ins)
+                        defined_in_loop.discard(dest)
+                        changed = True
+                    else:
+                        kept.append(ins)
+                block.instructions = kept
+        preheader.insert_before_terminator(hoisted)
+        moved += len(hoisted)
+    return moved
+
+
+def _insert_preheader(cfg: ControlFlowGraph, header: str, pred: str) -> BasicBlock:
+    preheader = BasicBlock(cfg.new_label('preheader'), [ir.Jump(ir.Label(header))])
+    cfg.blocks[pred].retarget(header, preheader.label)
+    cfg.insert_block(preheader, after=pred)
+    for phi in cfg.blocks[header].phis():
+        phi.sources[preheader.label] = phi.sources.pop(pred)
+    return preheader
+
+
+default_passes: list[tuple[str, Pass]] = [
+    ('copy-propagation', copy_propagation),
+    ('gvn', global_value_numbering),
+    ('licm', loop_invariant_code_motion),
+    ('dce', dead_code_elimination),
+]
+
+
+class PassManager:
+    """
+    Runs optimization passes over the SSA form of an IR program until none
+    of them changes anything, and counts what each pass removed.
+    """
+
+    def __init__(self, passes: list[tuple[str, Pass]] | None = None, max_rounds: int = 10) -> None:
+        self.passes = passes if passes is not None else default_passes
+        self.max_rounds = max_rounds
+        self.removed: dict[str, int] = {name: 0 for name, _ in self.passes}
+        self.instructions_before = 0
+        self.instructions_after = 0
+
+    def run(self, program: ir.IRProgram) -> ir.IRProgram:
+        self.instructions_before = _count(program)
+        cfg = build_cfg(program)
+        to_ssa(cfg)
+        for _ in range(self.max_rounds):
+            changed = 0
+            for name, run_pass in self.passes:
+                count = run_pass(cfg)
+                self.removed[name] += count
+                changed += count
+            if not changed:
+                break
+        from_ssa(cfg)
+        optimized = cfg.to_program()
+        self.instructions_after = _count(optimized)
+        return optimized
+
+    def report(self) -> str:
+        lines = [f'{name}: removed {count} instructions' for name, count in self.removed.items()]
+        lines.append(f'total: {self.instructions_before} -> {self.instructions_after} instructions')
+        return '\n'.join(lines)
+
+
+def _count(program: ir.IRProgram) -> int:
+    return sum(not isinstance(ins, ir.Label) for ins in program.instructions)
+
+
+def optimize_ir(program: ir.IRProgram) -> ir.IRProgram:
+    return PassManager().run(program)
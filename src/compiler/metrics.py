@@ -0,0 +1,111 @@
+import contextlib
+import time
+import tracemalloc
+from dataclasses import dataclass
+from importlib import metadata
+from typing import Callable, Iterator
+
+# Entry point group for telemetry hooks. Each entry point names a callable
+# taking a StageMetrics, called after every stage of a compiler run:
+#
+#     [tool.poetry.plugins."compiler.metrics_hooks"]
+#     statsd = "my_telemetry:send_stage_metrics"
+HOOK_ENTRY_POINT_GROUP = 'compiler.metrics_hooks'
+
+
+@dataclass
+class StageMetrics:
+    """What one stage of the pipeline cost."""
+    stage: str
+    seconds: float = 0.0
+    # Tokens, nodes or instructions the stage produced, if counted.
+    items: int | None = None
+    unit: str = ''
+    # Only measured when memory tracking is on.
+    allocated_bytes: int | None = None
+    peak_bytes: int | None = None
+    allocations: int | None = None
+
+
+MetricsHook = Callable[[StageMetrics], None]
+
+
+class Stage:
+    """
+    Handle for a running stage. Set `count` to a function returning the
+    number of items produced; it is called after the clock stops, and only
+    when metrics are being collected.
+    """
+
+    def __init__(self) -> None:
+        self.count: Callable[[], int] | None = None
+
+
+def load_hooks() -> list[MetricsHook]:
+    return [entry_point.load() for entry_point in metadata.entry_points(group=HOOK_ENTRY_POINT_GROUP)]
+
+
+class Instrumentation:
+    """
+    Records the cost of each pipeline stage and forwards it to hooks.
+    When neither memory tracking nor any hook is wanted, `enabled` is False
+    and callers can skip counting tokens and nodes.
+    """
+
+    def __init__(self, hooks: list[MetricsHook] | None = None, track_memory: bool = False,
+                 collect: bool = False) -> None:
+        self.hooks = hooks if hooks is not None else []
+        self.track_memory = track_memory
+        self.enabled = collect or track_memory or bool(self.hooks)
+        self.stages: list[StageMetrics] = []
+
+    def start(self) -> None:
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self) -> None:
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, unit: str = '') -> Iterator[Stage]:
+        stage = Stage()
+        if not self.enabled:
+            yield stage
+            return
+        metrics = StageMetrics(name, unit=unit)
+        before = None
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+            current_before, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        yield stage
+        metrics.seconds = time.perf_counter() - start
+        if before is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            metrics.allocated_bytes = current - current_before
+            metrics.peak_bytes = peak - current_before
+            metrics.allocations = sum(
+                max(stat.count_diff, 0) for stat in after.compare_to(before, 'filename')
+            )
+        if stage.count is not None:
+            metrics.items = stage.count()
+        self.stages.append(metrics)
+        for hook in self.hooks:
+            hook(metrics)
+
+    def format_table(self) -> str:
+        lines = [f"{'stage':<12} {'time (ms)':>10} {'items':>16} {'alloc (KiB)':>12} "
+                 f"{'peak (KiB)':>11} {'blocks':>9}"]
+        for m in self.stages:
+            items = '' if m.items is None else f'{m.items} {m.unit}'
+            allocated = '' if m.allocated_bytes is None else f'{m.allocated_bytes / 1024:.1f}'
+            peak = '' if m.peak_bytes is None else f'{m.peak_bytes / 1024:.1f}'
+            blocks = '' if m.allocations is None else str(m.allocations)
+            lines.append(f'{m.stage:<12} {m.seconds * 1000:>10.3f} {items:>16} {allocated:>12} '
+                         f'{peak:>11} {blocks:>9}')
+        total = sum(m.seconds for m in self.stages)
+        lines.append(f"{'total':<12} {total * 1000:>10.3f}")
+        return '\n'.join(lines)
@@ -0,0 +1,257 @@
+import operator
+from typing import Any, Callable, Generator
+
+import compiler.ast as ast
+from compiler.builtins import int_div, int_mod, wrap_int
+
+# Like the type checker, a node's folder yields (child, shadowed names) pairs
+# and is sent back the optimized child, so deep trees need no recursion.
+# `shadowed` holds the builtin constants redeclared by an enclosing block.
+Folder = Generator[tuple[ast.Expression, frozenset[str]], ast.Expression, ast.Expression]
+
+constant_names = {'true': True, 'false': False}
+
+int_operators: dict[str, Callable[[int, int], Any]] = {
+    '+': lambda a, b: wrap_int(a + b),
+    '-': lambda a, b: wrap_int(a - b),
+    '*': lambda a, b: wrap_int(a * b),
+    '/': int_div,
+    '%': int_mod,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+bool_operators: dict[str, Callable[[bool, bool], bool]] = {
+    'and': operator.and_,
+    'or': operator.or_,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+
+def optimize(node: ast.Expression) -> ast.Expression:
+    """
+    Simplifies a type-checked tree: folds operators on literals, applies
+    algebraic identities, removes branches and loops with constant
+    conditions and drops side-effect free statements from blocks.
+    Nodes are rewritten in place; the optimized root is returned.
+    """
+    stack: list[Folder] = []
+    result = _fold_leaf(node, frozenset())
+    if result is not None:
+        return result
+    stack.append(_fold(node, frozenset()))
+    result = None
+    while stack:
+        try:
+            child, shadowed = stack[-1].send(result)  # type: ignore[arg-type]
+        except StopIteration as done:
+            stack.pop()
+            result = done.value
+            continue
+        result = _fold_leaf(child, shadowed)
+        if result is None:
+            stack.append(_fold(child, shadowed))
+    assert result is not None
+    return result
+
+
+def _fold_leaf(node: ast.Expression, shadowed: frozenset[str]) -> ast.Expression | None:
+    match node:
+        case ast.Literal():
+            return node
+        case ast.Identifier():
+            if node.name in constant_names and node.name not in shadowed:
+                return ast.Literal(node.location, constant_names[node.name])
+            return node
+    return None
+
+
+def _fold(node: ast.Expression, shadowed: frozenset[str]) -> Folder:
+    match node:
+        case ast.BinaryOp():
+            node.left = yield node.left, shadowed
+            node.right = yield node.right, shadowed
+            return _fold_binary(node)
+
+        case ast.UnaryOp():
+            node.operand = yield node.operand, shadowed
+            return _fold_unary(node)
+
+        case ast.Variable():
+            node.value = yield node.value, shadowed
+            return node
+
+        case ast.Assignment():
+            node.value = yield node.value, shadowed
+            return node
+
+        case ast.Function():
+            args = []
+            for arg in node.args:
+                args.append((yield arg, shadowed))
+            node.args = args
+            return node
+
+        case ast.Block():
+            expressions = []
+            for expr in node.expressions:
+                expressions.append((yield expr, shadowed))
+                if isinstance(expr, ast.Variable) and expr.name.name in constant_names:
+                    shadowed = shadowed | {expr.name.name}
+            node.expressions = expressions
+            return _fold_block(node)
+
+        case ast.ControlFlow():
+            condition = yield node.if_exp, shadowed
+            if _bool_value(condition) is True:
+                then_exp = yield node.then_exp, shadowed
+                if node.else_exp is None:
+                    # `if` without `else` is Unit-typed whatever the branch gives.
+                    return _fold_block(ast.Block(node.location, [then_exp, ast.Literal(node.location, None)]))
+                return then_exp
+            elif _bool_value(condition) is False:
+                if node.else_exp is None:
+                    return ast.Literal(node.location, None)
+                return (yield node.else_exp, shadowed)
+            node.if_exp = condition
+            node.then_exp = yield node.then_exp, shadowed
+            if node.else_exp is not None:
+                node.else_exp = yield node.else_exp, shadowed
+            return node
+
+        case ast.WhileLoop():
+            condition = yield node.while_expr, shadowed
+            if _bool_value(condition) is False:
+                return ast.Literal(node.location, None)
+            node.while_expr = condition
+            node.do_expr = yield node.do_expr, shadowed
+            return node
+
+    raise ValueError(f"unknown node {type(node).__name__} at {node.location}")
+
+
+def _fold_block(node: ast.Block) -> ast.Expression:
+    # Only the last expression gives the block its value.
+    node.expressions = [e for e in node.expressions[:-1] if not _is_pure(e)] + node.expressions[-1:]
+    if len(node.expressions) == 1 and not isinstance(node.expressions[0], ast.Variable):
+        return node.expressions[0]
+    return node
+
+
+def _fold_binary(node: ast.BinaryOp) -> ast.Expression:
+    loc = node.location
+    left, right = node.left, node.right
+    a, b = _int_value(left), _int_value(right)
+    if a is not None and b is not None and node.op in int_operators:
+        if node.op in ['/', '%'] and b == 0:
+            # Leave the division to fail at run time.
+            return node
+        return ast.Literal(loc, int_operators[node.op](a, b))
+    p, q = _bool_value(left), _bool_value(right)
+    if p is not None and q is not None and node.op in bool_operators:
+        return ast.Literal(loc, bool_operators[node.op](p, q))
+
+    if node.op in ['+', '*'] and b is not None and isinstance(left, ast.BinaryOp) \
+            and left.op == node.op and (c := _int_value(left.right)) is not None:
+        # Wrapping + and * are associative: (x + 1) + 2 becomes x + 3.
+        left.right = ast.Literal(left.right.location, int_operators[node.op](c, b))
+        return _fold_binary(left)
+
+    match node.op:
+        case '+':
+            if a == 0:
+                return right
+            if b == 0:
+                return left
+        case '-':
+            if b == 0:
+                return left
+        case '*':
+            if a == 1:
+                return right
+            if b == 1:
+                return left
+            if (a == 0 and _is_pure(right)) or (b == 0 and _is_pure(left)):
+                return ast.Literal(loc, 0)
+        case '/':
+            if b == 1:
+                return left
+        case '%':
+            if b == 1 and _is_pure(left):
+                return ast.Literal(loc, 0)
+        case 'and':
+            if p is True:
+                return right
+            if p is False:
+                return left
+            if q is True:
+                return left
+            if q is False and _is_pure(left):
+                return right
+        case 'or':
+            if p is True:
+                return left
+            if p is False:
+                return right
+            if q is False:
+                return left
+            if q is True and _is_pure(left):
+                return right
+    return node
+
+
+def _fold_unary(node: ast.UnaryOp) -> ast.Expression:
+    operand = node.operand
+    if node.operator == '-':
+        a = _int_value(operand)
+        if a is not None:
+            return ast.Literal(node.location, wrap_int(-a))
+    elif node.operator == 'not':
+        p = _bool_value(operand)
+        if p is not None:
+            return ast.Literal(node.location, not p)
+    if isinstance(operand, ast.UnaryOp) and operand.operator == node.operator:
+        return operand.operand
+    return node
+
+
+def _int_value(node: ast.Expression) -> int | None:
+    if isinstance(node, ast.Literal) and type(node.value) is int:
+        return node.value
+    return None
+
+
+def _bool_value(node: ast.Expression) -> bool | None:
+    if isinstance(node, ast.Literal) and isinstance(node.value, bool):
+        return node.value
+    return None
+
+
+def _is_pure(node: ast.Expression) -> bool:
+    """True if evaluating `node` can neither fail nor have side effects."""
+    stack = [node]
+    while stack:
+        match stack.pop():
+            case ast.Literal() | ast.Identifier():
+                pass
+            case ast.BinaryOp(op=op, left=left, right=right) if op not in ['/', '%']:
+                stack.append(left)
+                stack.append(right)
+            case ast.UnaryOp(operand=operand):
+                stack.append(operand)
+            case ast.ControlFlow(if_exp=if_exp, then_exp=then_exp, else_exp=else_exp):
+                stack.append(if_exp)
+                stack.append(then_exp)
+                if else_exp is not None:
+                    stack.append(else_exp)
+            case ast.Block(expressions=expressions):
+                # Declarations are invisible outside the block.
+                stack.extend(e.value if isinstance(e, ast.Variable) else e for e in expressions)
+            case _:
+                return False
+    return True
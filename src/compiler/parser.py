@@ -1,171 +1,205 @@
+from collections import deque
+from typing import Any, Generator, Iterable, TypeVar
+
+from compiler.diagnostics import Diagnostic
 from compiler.tokenizer import Token
 import compiler.ast as ast
-from compiler.types import Bool, Int, Unit
+from compiler.types import Bool, ErrorType, Int, Type, Unit
 
+# Binding power of each binary operator, all left-associative.
+# Higher numbers bind tighter.
+binary_precedence = {
+    'or': 1,
+    'and': 2,
+    '==': 3, '!=': 3, '<': 3, '<=': 3, '>': 3, '>=': 3,
+    '+': 4, '-': 4,
+    '*': 5, '/': 5, '%': 5,
+}
 
-def parse(tokens: list[Token]) -> ast.Expression:
-    pos = 0
-    
-    def peek() -> Token:
-        if len(tokens) == 0:
+
+class ParseError(ValueError):
+    """A syntax error at `location`."""
+
+    def __init__(self, location: tuple[int, int], message: str) -> None:
+        super().__init__(f'{location}: {message}')
+        self.location = location
+        self.message = message
+
+
+T = TypeVar('T')
+
+# A parsing function that meets a nested construct yields the generator
+# parsing it and is sent back its result, or has its syntax error thrown in.
+# `run` drives them from an explicit stack, so how deeply blocks, parentheses
+# and the like nest isn't limited by Python's recursion limit.
+Parsing = Generator[Any, Any, T]
+
+
+def run(parsing: Parsing[T]) -> T:
+    stack: list[Parsing[Any]] = [parsing]
+    value: Any = None
+    error: Exception | None = None
+    while stack:
+        try:
+            if error is not None:
+                request = stack[-1].throw(error)
+            else:
+                request = stack[-1].send(value)
+        except StopIteration as done:
+            stack.pop()
+            value, error = done.value, None
+            continue
+        except Exception as e:
+            stack.pop()
+            if not stack:
+                raise
+            value, error = None, e
+            continue
+        stack.append(request)
+        value, error = None, None
+    return value
+
+
+def parse(tokens: Iterable[Token],
+          statement_spans: list[tuple[int, int]] | None = None,
+          diagnostics: list[Diagnostic] | None = None,
+          body_spans: list[tuple[int, int]] | None = None) -> ast.Expression:
+    """
+    Parses a list or a lazy stream of tokens (see `Tokenizer.iter_tokens`).
+    Tokens are pulled into a small lookahead buffer only as they are needed.
+    If `statement_spans` is given, the source offsets [start, end) of every
+    statement in the outermost block are appended to it. Likewise with
+    `body_spans` for the offsets just inside the braces of the outermost block.
+    If `diagnostics` is given, syntax errors are appended to it instead of
+    raised: a statement with an error is left out of its block and parsing
+    goes on after the next `;` or at the `}` closing the block.
+    """
+    token_stream = iter(tokens)
+    lookahead: deque[Token] = deque()
+    last_token: Token | None = None
+    block_depth = 0
+
+    def peek(offset: int = 0) -> Token:
+        while len(lookahead) <= offset:
+            token = next(token_stream, None)
+            if token is None:
+                break
+            lookahead.append(token)
+        if offset < len(lookahead):
+            return lookahead[offset]
+        previous = lookahead[-1] if lookahead else last_token
+        if previous is None:
             raise ValueError("Empty Token")
-        if pos < len(tokens):
-            return tokens[pos]
-        else:
-            return Token(
-                location=tokens[-1].location,
-                type="end",
-                text="",
-            )
+        return Token(
+            location=previous.location,
+            type="end",
+            text="",
+        )
 
     def consume(expected: str | list[str] | None = None) -> Token:
-        nonlocal pos
+        nonlocal last_token
         token = peek()
         if isinstance(expected, str) and token.text != expected:
-            raise Exception(f'{token.location}: expected "{expected}"')
+            raise ParseError(token.location, f'expected "{expected}"')
         if isinstance(expected, list) and token.text not in expected:
             comma_separated = ", ".join([f'"{e}"' for e in expected])
-            raise Exception(f'{token.location}: expected one of: {comma_separated}')
-        pos += 1
+            raise ParseError(token.location, f'expected one of: {comma_separated}')
+        if lookahead:
+            last_token = lookahead.popleft()
         return token
 
     def parse_int_literal() -> ast.Literal:
         if peek().type != 'int_literal':
-            raise Exception(f'{peek().location}: expected an integer literal')
+            raise ParseError(peek().location, 'expected an integer literal')
         token = consume()
         return ast.Literal(value=int(token.text), location=token.location)
     
     def parse_identifier() -> ast.Identifier:
         if peek().type != 'identifier':
-            raise Exception(f'{peek().location}: expected an identifier')
+            raise ParseError(peek().location, 'expected an identifier')
         token = consume()
         return ast.Identifier(name=token.text, location=token.location)
     
-    def parse_arg_list() -> ast.Function:
+    def parse_arg_list() -> Parsing[list[ast.Expression]]:
         args = []
         consume('(')
         if peek().text != ')':
-            args.append(parse_expression())
+            args.append((yield parse_expression()))
             while peek().text == ',':
                 consume(',')
-                args.append(parse_expression())
+                args.append((yield parse_expression()))
         consume(')')
         return args
 
-    def parse_controlflow() -> ast.ControlFlow:
+    def parse_controlflow() -> Parsing[ast.ControlFlow]:
         if peek().type not in ["if", "else", "while", "then", "do"]:
-            raise Exception(f'{peek().location}: expected an conditional expression')
+            raise ParseError(peek().location, 'expected an conditional expression')
         consume('if')
-        if_expr = parse_expression()
+        if_expr = yield parse_expression()
         consume('then')
-        then_expr = parse_expression()
+        then_expr = yield parse_expression()
         if peek().type == "else":
             consume('else')
-            else_expr = parse_expression()
+            else_expr = yield parse_expression()
             return ast.ControlFlow(peek().location, if_expr, then_expr, else_expr)
         else:
             return ast.ControlFlow(peek().location, if_expr, then_expr, None)
 
-        
-    def parse_term() -> ast.Expression:
-        left = parse_factor()
-        while peek().text in ['*', '/', '%']:
-            operator_token = consume()
-            operator = operator_token.text
-            right = parse_factor()
-            left = ast.BinaryOp(
-                peek().location,
-                left,
-                operator,
-                right,
-            )
-        return left
-    
-    def parse_factor() -> ast.Expression:
+    def parse_leaf() -> ast.Expression | None:
+        """Parses an integer literal or a variable, the most common operands, without a generator."""
+        token = peek()
+        if token.type == 'int_literal':
+            return parse_int_literal()
+        if token.type == 'identifier' and token.text not in ['unit', 'not'] and peek(1).text != '(':
+            return parse_identifier()
+        return None
+
+    def parse_factor() -> Parsing[ast.Expression]:
         if peek().text == '(':
-            return parse_parenthesized()
+            return (yield parse_parenthesized())
         elif peek().type == 'int_literal':
             return parse_int_literal()
         elif peek().text in ['-', 'not']:
             operator_token = consume()
             operator = operator_token.text
-            operand = parse_factor()
+            operand = yield parse_factor()
             return ast.UnaryOp(peek().location, operator, operand)
+        elif peek().text == 'unit':
+            token = consume('unit')
+            return ast.Literal(token.location, None)
         elif peek().type == 'identifier':
             identifier = parse_identifier()
             if peek().text == '(':
-                args = parse_arg_list()
+                args = yield parse_arg_list()
                 return ast.Function(peek().location, identifier, args)
             return identifier
         elif peek().type in ["if", "else", "then"]:
-            return parse_controlflow()
+            return (yield parse_controlflow())
         else:
-            raise Exception(f'{peek().location}: expected "(", an integer literal or an identifier')
+            raise ParseError(peek().location, 'expected "(", an integer literal or an identifier')
 
-    def parse_parenthesized() -> ast.Expression:
+    def parse_parenthesized() -> Parsing[ast.Expression]:
         consume('(')
-        expr = parse_expression()
+        expr = yield parse_expression()
         consume(')')
         return expr
-    
-    def parse_while_loops() -> ast.WhileLoop:
+
+    def parse_while_loops() -> Parsing[ast.WhileLoop]:
         consume('while')
-        condition = parse_expression()
+        condition = yield parse_expression()
         consume('do')
-        block = parse_blocks()
+        block = yield parse_blocks()
         return ast.WhileLoop(peek().location, condition, block)
-    
-    def parse_arith_expression() -> ast.Expression:
-        left = parse_term()
 
-        while peek().text in ['+', '-']:
-            operator_token = consume()
-            operator = operator_token.text
-            right = parse_term()
-            left = ast.BinaryOp(peek().location, left, operator, right)
-
-        return left
-
-    def parse_comparison_expression() -> ast.Expression:
-        left = parse_arith_expression()
-
-        while peek().text in ['==', '!=', '<', '<=', '>', '>=']:
-            operator_token = consume()
-            operator = operator_token.text
-            right = parse_arith_expression()
-            left = ast.BinaryOp(peek().location, left, operator, right)
-
-        return left
-
-    def parse_logical_and_expression() -> ast.Expression:
-        left = parse_comparison_expression()
-
-        while peek().text == 'and':
-            consume('and')
-            right = parse_comparison_expression()
-            left = ast.BinaryOp(peek().location, left, 'and', right)
-
-        return left
-
-    def parse_logical_or_expression() -> ast.Expression:
-        left = parse_logical_and_expression()
-
-        while peek().text == 'or':
-            consume('or')
-            right = parse_logical_and_expression()
-            left = ast.BinaryOp(peek().location, left, 'or', right)
-
-        return left
-    
-    def parse_statement() -> ast.Variable | ast.Expression:
+    def parse_statement() -> Parsing[ast.Variable | ast.Expression]:
         if peek().text == 'var':
             return parse_variable_declaration()
         elif peek().text == "while":
             return parse_while_loops()
         else:
             return parse_expression()
-        
-    def parse_type():
+
+    def parse_type() -> Type:
         token = consume()
         if token.text == 'Int':
             return Int()
@@ -174,50 +208,134 @@ def parse(tokens: list[Token]) -> ast.Expression:
         elif token.text == 'Unit':
             return Unit()
         else:
-            raise SyntaxError(f"Unexpected token {token.text} at position {token.location}")
+            raise ParseError(token.location, f'expected a type, got "{token.text}"')
 
-    def parse_variable_declaration() -> ast.Variable:
+    def parse_variable_declaration() -> Parsing[ast.Variable]:
         consume('var')
         identifier = parse_identifier()
         if peek().text == ":":
             consume(":")
             type = parse_type()
             consume('=')
-            value = parse_expression()
-            return ast.Variable(location=peek().location, name=identifier, value=value, type=type)
+            value = yield parse_expression()
+            return ast.Variable(location=peek().location, name=identifier, value=value, declared_type=type)
         else:
             consume("=")
-            value = parse_expression()
+            value = yield parse_expression()
             return ast.Variable(location=peek().location, name=identifier, value=value)
-        
-    def parse_expression() -> ast.Expression:
+
+    def parse_expression() -> Parsing[ast.Expression]:
         if peek().text == '{':
-            return parse_blocks()
-        else:
-            left = parse_logical_or_expression()
-            if peek().text == '=':
-                operator_token = consume('=')
-                right = parse_expression()
-                left = ast.Assignment(peek().location, left, operator_token, right)
+            return (yield parse_blocks())
+
+        # Precedence climbing with explicit operand and operator stacks: an
+        # operator is combined with its operands once an operator binding no
+        # tighter follows, so long chains never recurse.
+        operands = [parse_leaf() or (yield parse_factor())]
+        operators: list[tuple[str, int]] = []
+        while True:
+            precedence = binary_precedence.get(peek().text)
+            while operators and (precedence is None or operators[-1][1] >= precedence):
+                operator, _ = operators.pop()
+                right = operands.pop()
+                operands.append(ast.BinaryOp(peek().location, operands.pop(), operator, right))
+            if precedence is None:
+                break
+            operators.append((consume().text, precedence))
+            operands.append(parse_leaf() or (yield parse_factor()))
+        left = operands[0]
 
+        if peek().text == '=':
+            operator_token = consume('=')
+            right = yield parse_expression()
+            # Any target parses; the type checker reports those that aren't names.
+            left = ast.Assignment(peek().location, left, operator_token, right)  # type: ignore[arg-type]
         return left
 
-    def parse_blocks() -> ast.Block:
-        expressions = []
-        consume('{')
+    def report(error: ParseError) -> None:
+        assert diagnostics is not None
+        diagnostic = Diagnostic(error.location, error.message)
+        # Every block left open at the end of input reports the same "}".
+        if not diagnostics or diagnostics[-1] != diagnostic:
+            diagnostics.append(diagnostic)
+
+    def synchronize() -> None:
+        """Skips to just after the next `;`, or to the `}` closing the current block."""
+        depth = 0
+        while peek().type != 'end':
+            text = peek().text
+            if text == '}' and depth == 0:
+                return
+            consume()
+            if text == ';' and depth == 0:
+                return
+            if text == '{':
+                depth += 1
+            elif text == '}':
+                depth -= 1
+
+    def parse_blocks() -> Parsing[ast.Block]:
+        nonlocal block_depth
+        expressions: list[ast.Expression] = []
+        body_start = consume('{').offset + 1
+        block_depth += 1
+        record_spans = statement_spans is not None and block_depth == 1
 
         while peek().text != '}':
-            statement = parse_statement()
+            if diagnostics is not None and peek().type == 'end':
+                report(ParseError(peek().location, 'expected "}"'))
+                block_depth -= 1
+                return ast.Block(peek().location, expressions)
+            start = peek().offset
+            declared = peek(1) if peek().text == 'var' else None
+            try:
+                statement = yield parse_statement()
+            except ParseError as e:
+                if diagnostics is None:
+                    raise
+                report(e)
+                synchronize()
+                if declared is not None and declared.type == 'identifier':
+                    # Still declare the name, so its uses aren't reported as undefined.
+                    location = declared.location
+                    expressions.append(ast.Variable(location, ast.Identifier(location, declared.text),
+                                                    ast.Literal(location, None), declared_type=ErrorType()))
+                continue
             expressions.append(statement)
 
             if peek().text == ';':
                 consume(';')
+            if record_spans:
+                assert statement_spans is not None and last_token is not None
+                statement_spans.append((start, last_token.offset + len(last_token.text)))
 
 
-        consume('}')
+        block_depth -= 1
+        body_end = consume('}').offset
+        if body_spans is not None and block_depth == 0:
+            body_spans.append((body_start, body_end))
         if peek().text == ';':
             expressions.append(ast.Literal(peek().location, value=None))
 
         return ast.Block(peek().location, expressions)
     
-    return parse_expression()
\ No newline at end of file
+    def leftover_error() -> ParseError | None:
+        if peek().type == 'end':
+            return None
+        return ParseError(peek().location, f'Couldn\'t parse the whole expression: unexpected "{peek().text}"')
+
+    if diagnostics is None:
+        expression = run(parse_expression())
+        error = leftover_error()
+        if error is not None:
+            raise error
+        return expression
+    try:
+        expression = run(parse_expression())
+    except ParseError as e:
+        report(e)
+        return ast.Literal(e.location, None)
+    error = leftover_error()
+    if error is not None:
+        report(error)
+    return expression
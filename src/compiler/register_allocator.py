@@ -0,0 +1,158 @@
+from dataclasses import dataclass
+
+from compiler import ir
+from compiler.ir import IRVar, UNIT
+
+# General-purpose registers handed out to IR registers, in order of
+# preference. %rax and %rdx are kept free as scratch registers (`idivq` needs
+# both) and %rsp/%rbp hold the stack frame. Argument registers come last so
+# calls rarely have to save anything.
+allocatable_registers = [
+    '%rbx', '%r12', '%r13', '%r14', '%r15', '%r10', '%r11',
+    '%r9', '%r8', '%rcx', '%rsi', '%rdi',
+]
+
+# How much more a use inside one more level of loop nesting is worth.
+LOOP_WEIGHT = 10
+
+
+@dataclass
+class Interval:
+    """The range of instruction positions where an IR register is live."""
+    var: IRVar
+    start: int
+    end: int
+    # Uses and definitions, weighted by loop depth: the cost of spilling.
+    weight: float = 0.0
+
+
+def _jump_targets(ins: ir.Instruction) -> list[str]:
+    match ins:
+        case ir.Jump(label=label):
+            return [label.name]
+        case ir.CondJump(then_label=then_label, else_label=else_label):
+            return [then_label.name, else_label.name]
+    return []
+
+
+def live_intervals(program: ir.IRProgram) -> dict[IRVar, Interval]:
+    """
+    Computes a single live interval per register from block-level liveness
+    over the flat instruction list, so a register live around a loop's back
+    edge stays live for the whole loop.
+    """
+    instructions = program.instructions
+    n = len(instructions)
+    if n == 0:
+        return {}
+    labels = {ins.name: i for i, ins in enumerate(instructions) if isinstance(ins, ir.Label)}
+    block_starts = sorted(
+        {0} | set(labels.values())
+        | {i + 1 for i, ins in enumerate(instructions) if _jump_targets(ins) and i + 1 < n}
+    )
+    blocks = list(zip(block_starts, block_starts[1:] + [n]))
+    block_at = {start: b for b, (start, _) in enumerate(blocks)}
+
+    successors: list[list[int]] = []
+    uses: list[set[IRVar]] = []
+    defs: list[set[IRVar]] = []
+    for b, (start, end) in enumerate(blocks):
+        last = instructions[end - 1]
+        targets = _jump_targets(last)
+        if targets:
+            successors.append([block_at[labels[t]] for t in targets])
+        else:
+            successors.append([b + 1] if b + 1 < len(blocks) else [])
+        used: set[IRVar] = set()
+        defined: set[IRVar] = set()
+        for ins in instructions[start:end]:
+            used.update(v for v in ins.uses() if v not in defined and v != UNIT)
+            dest = ins.defines()
+            if dest is not None:
+                defined.add(dest)
+        uses.append(used)
+        defs.append(defined)
+
+    live_in: list[set[IRVar]] = [set() for _ in blocks]
+    live_out: list[set[IRVar]] = [set() for _ in blocks]
+    if not _jump_targets(instructions[-1]) and program.result != UNIT:
+        live_out[-1].add(program.result)
+    changed = True
+    while changed:
+        changed = False
+        for b in reversed(range(len(blocks))):
+            out = live_out[b].union(*(live_in[s] for s in successors[b]))
+            new_in = uses[b] | (out - defs[b])
+            if out != live_out[b] or new_in != live_in[b]:
+                live_out[b] = out
+                live_in[b] = new_in
+                changed = True
+
+    # Loop nesting depth of each position, from the ranges backward jumps cover.
+    depth_change = [0] * (n + 1)
+    for i, ins in enumerate(instructions):
+        for target in _jump_targets(ins):
+            if labels[target] <= i:
+                depth_change[labels[target]] += 1
+                depth_change[i + 1] -= 1
+    depth = 0
+
+    intervals: dict[IRVar, Interval] = {}
+
+    def extend(var: IRVar, position: int, weight: float = 0.0) -> None:
+        interval = intervals.get(var)
+        if interval is None:
+            intervals[var] = Interval(var, position, position, weight)
+        else:
+            interval.start = min(interval.start, position)
+            interval.end = max(interval.end, position)
+            interval.weight += weight
+
+    for b, (start, end) in enumerate(blocks):
+        for var in live_in[b]:
+            extend(var, start)
+        for i in range(start, end):
+            depth += depth_change[i]
+            weight = LOOP_WEIGHT ** min(depth, 6)
+            ins = instructions[i]
+            for var in ins.uses():
+                if var != UNIT:
+                    extend(var, i, weight)
+            dest = ins.defines()
+            if dest is not None:
+                extend(dest, i, weight)
+        for var in live_out[b]:
+            extend(var, end - 1)
+    return intervals
+
+
+def allocate_registers(program: ir.IRProgram,
+                       registers: list[str] = allocatable_registers) -> dict[IRVar, str]:
+    """
+    Linear-scan register allocation (Poletto and Sarkar). When every
+    register is taken, the interval with the lowest loop-weighted use count
+    is spilled to the stack for its whole lifetime. IR registers missing from
+    the result live on the stack.
+    """
+    intervals = sorted(live_intervals(program).values(), key=lambda i: (i.start, i.var.index))
+    assignment: dict[IRVar, str] = {}
+    free = list(reversed(registers))
+    active: list[Interval] = []
+    for current in intervals:
+        still_active = []
+        for interval in active:
+            if interval.end < current.start:
+                free.append(assignment[interval.var])
+            else:
+                still_active.append(interval)
+        active = still_active
+        if free:
+            assignment[current.var] = free.pop()
+            active.append(current)
+            continue
+        victim = min(active, key=lambda i: (i.weight, -i.end))
+        if (victim.weight, -victim.end) < (current.weight, -current.end):
+            assignment[current.var] = assignment.pop(victim.var)
+            active.remove(victim)
+            active.append(current)
+    return assignment
@@ -0,0 +1,142 @@
+import time
+from dataclasses import dataclass
+
+import compiler.ast as ast
+from compiler.builtins import builtin_values
+from compiler.closure_compiler import ClosureCompiler
+from compiler.interpreter import Evaluator, Interpreter, Resolution, Value
+
+# Steps between two looks at the clock. Engines only decrement a counter
+# per loop iteration or call; the deadline is checked when it runs out.
+CHECK_INTERVAL = 4096
+
+
+@dataclass
+class Limits:
+    """Resources a program may use. None means unlimited."""
+    max_steps: int | None = None
+    max_scope_depth: int | None = None
+    max_variables: int | None = None
+    timeout: float | None = None
+
+
+class ResourceLimitExceeded(Exception):
+    """A program went over one of its `Limits` at `location`."""
+
+    def __init__(self, limit: str, maximum: int | float, location: tuple[int, int] | None) -> None:
+        super().__init__(f"{limit} limit of {maximum} exceeded at {location}")
+        self.limit = limit
+        self.maximum = maximum
+        self.location = location
+
+
+class Budget:
+    """
+    Counts steps (loop iterations and calls) against `Limits`. Engines
+    decrement `countdown` once per step and call `checkpoint` when it
+    reaches zero, which accounts for the steps and checks the deadline.
+    """
+    __slots__ = ('limits', 'steps', 'interval', 'countdown', 'deadline')
+
+    def __init__(self, limits: Limits) -> None:
+        self.limits = limits
+        self.steps = 0
+        self.interval = 0
+        self.countdown = 0
+        self.deadline: float | None = None
+        self.reset_countdown()
+
+    def start(self) -> None:
+        """Starts the clock."""
+        if self.limits.timeout is not None:
+            self.deadline = time.monotonic() + self.limits.timeout
+
+    def reset_countdown(self) -> None:
+        max_steps = self.limits.max_steps
+        self.interval = CHECK_INTERVAL
+        if max_steps is not None:
+            # Run out exactly at the first step over the limit.
+            self.interval = max(1, min(CHECK_INTERVAL, max_steps + 1 - self.steps))
+        self.countdown = self.interval
+
+    def checkpoint(self, location: tuple[int, int] | None) -> None:
+        self.steps += self.interval
+        max_steps = self.limits.max_steps
+        if max_steps is not None and self.steps > max_steps:
+            raise ResourceLimitExceeded('step', max_steps, location)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            assert self.limits.timeout is not None
+            raise ResourceLimitExceeded('time', self.limits.timeout, location)
+        self.reset_countdown()
+
+    def step(self, location: tuple[int, int] | None) -> None:
+        self.countdown -= 1
+        if not self.countdown:
+            self.checkpoint(location)
+
+
+def check_static_limits(root: ast.Expression, resolution: Resolution, limits: Limits) -> None:
+    """
+    Checks the scope depth and variable limits. Without user functions both
+    are fixed by the program text, so they are checked before it runs.
+    Variables count when declared in a block enclosing the declaration;
+    builtins don't count.
+    """
+    if limits.max_scope_depth is None and limits.max_variables is None:
+        return
+    builtin_count = len(builtin_values)
+    # (node, blocks around it, variables in the frames outside the innermost one)
+    stack: list[tuple[ast.Expression, int, int]] = [(root, 0, 0)]
+    frame_sizes = [len(resolution.globals) - builtin_count]
+    while stack:
+        node, depth, outer = stack.pop()
+        del frame_sizes[depth + 1:]
+        if isinstance(node, ast.Block):
+            if limits.max_scope_depth is not None and depth + 1 > limits.max_scope_depth:
+                raise ResourceLimitExceeded('scope depth', limits.max_scope_depth, node.location)
+            outer += frame_sizes[depth]
+            depth += 1
+            frame_sizes.append(resolution.frame_sizes[id(node)])
+        elif isinstance(node, ast.Variable) and limits.max_variables is not None:
+            declared_depth, slot = resolution.slots[id(node.name)]
+            live = outer + slot + 1 - (builtin_count if declared_depth == 0 else 0)
+            if live > limits.max_variables:
+                raise ResourceLimitExceeded('variable', limits.max_variables, node.name.location)
+        stack.extend((child, depth, outer) for child in reversed(ast.children(node)))
+
+
+class GovernedInterpreter(Interpreter):
+    """Tree-walking interpreter that charges every loop iteration and call to a `Budget`."""
+
+    def __init__(self, root: ast.Expression, budget: Budget) -> None:
+        super().__init__(root)
+        self.budget = budget
+
+    def step(self, node: ast.Expression) -> Evaluator:
+        match node:
+            case ast.WhileLoop():
+                while (yield node.while_expr):
+                    yield node.do_expr
+                    self.budget.step(node.location)
+                return None
+            case ast.Function():
+                self.budget.step(node.identifier.location)
+        return (yield from super().step(node))
+
+
+def run_governed(root: ast.Expression, limits: Limits, engine: str = 'closures') -> Value:
+    """Runs a program with the 'closures' or 'tree' engine, raising ResourceLimitExceeded at the first limit it exceeds."""
+    budget = Budget(limits)
+    if engine == 'closures':
+        # Vectorized loops would run many iterations without counting them.
+        compiler = ClosureCompiler(root, vectorize=False, budget=budget)
+        check_static_limits(root, compiler.resolution, limits)
+        program = compiler.compile()
+        budget.start()
+        return program()
+    elif engine == 'tree':
+        interpreter = GovernedInterpreter(root, budget)
+        check_static_limits(root, interpreter.resolution, limits)
+        budget.start()
+        return interpreter.run()
+    raise ValueError(f"resource limits are not supported by engine '{engine}'")
@@ -0,0 +1,102 @@
+import contextlib
+import importlib
+import io
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import traceback
+from typing import Any
+
+from compiler.client import PROTOCOL_VERSION, default_socket_path
+
+# Loaded once when the server starts, so no request pays for importing them.
+preloaded_modules = [
+    'compiler.__main__', 'compiler.assembler', 'compiler.assembly_generator',
+    'compiler.ast_binary', 'compiler.batch', 'compiler.cache', 'compiler.closure_compiler',
+    'compiler.execution_profiler', 'compiler.interpreter', 'compiler.ir_generator',
+    'compiler.ir_optimizer', 'compiler.metrics', 'compiler.optimizer',
+    'compiler.parser', 'compiler.sandbox', 'compiler.tokenizer', 'compiler.transpiler',
+    'compiler.type_checker', 'compiler.vm',
+]
+
+
+def run_request(request: dict[str, Any]) -> dict[str, Any]:
+    """
+    Runs one client request through the command line driver, capturing
+    what it prints. Must run in a process of its own: it changes the working
+    directory and standard input.
+    """
+    from compiler.__main__ import main
+
+    if request.get('version') != PROTOCOL_VERSION:
+        return {'status': 1, 'stdout': '',
+                'stderr': f"Error: client speaks protocol {request.get('version')}, "
+                          f"server speaks {PROTOCOL_VERSION}\n"}
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    os.chdir(request['cwd'])
+    sys.stdin = io.StringIO(request.get('stdin', ''))
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            status = main(request['args'], request.get('source'))
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            traceback.print_exc()
+            status = 1
+    return {'status': status, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        request = json.loads(self.rfile.readline())
+        response = run_request(request)
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+
+
+class CompileServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves every request in a forked child of an already warmed-up process,
+    so requests can't see each other's state and a crash only loses one.
+    """
+
+
+def _remove_stale_socket(path: str) -> None:
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ValueError(f"{path} exists and is not a socket")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except ConnectionRefusedError:
+            os.remove(path)
+            return
+    raise ValueError(f"a compiler server is already listening on {path}")
+
+
+def serve(socket_path: str | None = None) -> None:
+    """Listens on a Unix socket until interrupted."""
+    path = socket_path if socket_path is not None else default_socket_path()
+    for module in preloaded_modules:
+        importlib.import_module(module)
+    _remove_stale_socket(path)
+    # Only the owner may connect: requests run code with our privileges.
+    old_umask = os.umask(0o177)
+    try:
+        server = CompileServer(path, RequestHandler)
+    finally:
+        os.umask(old_umask)
+    print(f"Listening on {path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
@@ -1,59 +1,125 @@
 import re
+from bisect import bisect_right
+from typing import Iterator, TextIO, cast
+
+keywords = frozenset({'if', 'else', 'while', 'print', 'then'})
+token_specification = [
+    ('identifier',       r'\b[a-zA-Z_][a-zA-Z0-9_]*\b'),
+    ('int_literal', r'\b\d+\b'),
+    ('NEWLINE',  r'\\n'),
+    ('SKIP',     r'\s+'),
+    ('Comment', r'#\s?.*|//.*'),
+    ('Operator', r'==|!=|<=|>=|\+|-|\*|/|=|<|>|%'),
+    ('Punctuation', r'[(),:,{};]'),
+    ('MISMATCH', r'.'),
+]
+# Compiled once at import time and shared by every call to `tokenize`.
+token_regex = re.compile('|'.join('(?P<%s>%s)' % pair for pair in token_specification))
+skipped_kinds = frozenset({'NEWLINE', 'SKIP', 'Comment'})
+
+
+class SourceMap:
+    """
+    Maps character offsets to (line, column), building the line table on first use.
+    Without `source_code` the table is filled in by `add_line` as a stream is read.
+    """
+    __slots__ = ('source_code', '_line_starts')
+
+    def __init__(self, source_code: str | None = None) -> None:
+        self.source_code = source_code
+        self._line_starts: list[int] | None = None if source_code is not None else [0]
+
+    def add_line(self, offset: int) -> None:
+        assert self._line_starts is not None
+        self._line_starts.append(offset)
+
+    def location(self, offset: int) -> tuple[int, int]:
+        if self._line_starts is None:
+            assert self.source_code is not None
+            self._line_starts = [0] + [m.end() for m in re.finditer('\n', self.source_code)]
+        line = bisect_right(self._line_starts, offset)
+        return (line, offset - self._line_starts[line - 1])
 
-from dataclasses import dataclass
 
-@dataclass
 class Token():
-    type: str
-    text: str
-    location: tuple[str]
+    """
+    A lexeme and its integer offset into the source.
+    The (line, column) `location` is only computed when somebody asks for it.
+    """
+    __slots__ = ('type', 'text', 'offset', '_location', '_source_map')
+
+    def __init__(self, type: str, text: str, location: tuple[int, int] | None = None,
+                 offset: int = 0, source_map: SourceMap | None = None) -> None:
+        self.type = type
+        self.text = text
+        self.offset = offset
+        self._location = location
+        self._source_map = source_map
 
+    @property
+    def location(self) -> tuple[int, int]:
+        if self._location is None:
+            if self._source_map is None:
+                self._location = (1, self.offset)
+            else:
+                self._location = self._source_map.location(self.offset)
+        return self._location
 
     def __eq__(self, location: object) -> bool:
         return self.location == location
 
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f'Token(type={self.type!r}, text={self.text!r}, location={self.location!r})'
+
+
 class Tokenizer():
     """
     Class implementing the tokenizer functionalities
-    Includes main logic and hepler functions 
+    Includes main logic and hepler functions
     """
 
     @staticmethod
     def tokenize(source_code: str) -> list[Token]:
-        tokens: list[str] = []
-
-        keywords = {'if', 'else', 'while', 'print', 'then'}
-        token_specification = [
-            ('identifier',       r'\b[a-zA-Z_][a-zA-Z0-9_]*\b'),
-            ('int_literal', r'\b\d+\b'),
-            ('NEWLINE',  r'\\n'),           
-            ('SKIP',     r'[ \t]+'),
-            ('Comment', r'#\s?.*|//.*'),
-            ('Operator', r'==|!=|<=|>=|\+|-|\*|/|=|<|>|%'),
-            ('Punctuation', r'[(),:,{};]'),
-            ('MISMATCH', r'.'),            
-        ]
-        token_regex = '|'.join('(?P<%s>%s)' % pair for pair in token_specification)
-        line_num = 1
-        line_start = 0
-        for match_obj in re.finditer(token_regex, source_code):
-            kind = match_obj.lastgroup
-            value = match_obj.group()
-            column = match_obj.start() - line_start
-            if kind == 'identifier' and value in keywords:
-                kind = value
-            elif kind == 'NEWLINE':
-                line_start = match_obj.end()
-                line_num += 1
-                continue
-            elif kind == 'SKIP' or kind == 'Comment':
+        return list(Tokenizer.iter_tokens(source_code))
+
+    @staticmethod
+    def iter_tokens(source: str | TextIO) -> Iterator[Token]:
+        """
+        Yields tokens lazily from a string or a text file object.
+        Files are read a line at a time (no token spans a newline), so the
+        whole source never has to be in memory.
+        """
+        if isinstance(source, str):
+            source_map = SourceMap(source)
+            yield from Tokenizer.scan(source, 0, source_map)
+        else:
+            source_map = SourceMap()
+            offset = 0
+            for line in source:
+                if offset > 0:
+                    source_map.add_line(offset)
+                yield from Tokenizer.scan(line, offset, source_map)
+                offset += len(line)
+
+    @staticmethod
+    def scan(text: str, base: int, source_map: SourceMap) -> Iterator[Token]:
+        """Tokenizes a piece of source that starts at offset `base`."""
+        for match_obj in token_regex.finditer(text):
+            # Every alternative of token_regex is a named group.
+            kind = cast(str, match_obj.lastgroup)
+            if kind in skipped_kinds:
                 continue
+            value = match_obj.group()
+            if kind == 'identifier':
+                if value in keywords:
+                    kind = value
             elif kind == 'MISMATCH':
-                raise RuntimeError(f'{value!r} unexpected on line {line_num}')
-            tokens.append(Token(type=kind, text=value, location=(line_num, column)))
-        
-        return tokens
+                line, _ = source_map.location(base + match_obj.start())
+                raise RuntimeError(f'{value!r} unexpected on line {line}')
+            yield Token(kind, value, None, base + match_obj.start(), source_map)
 
 
 if __name__ == "__main__":
-    Tokenizer.tokenize("if 3 < while\n# aaaa\n// asd")
\ No newline at end of file
+    Tokenizer.tokenize("if 3 < while\n# aaaa\n// asd")
@@ -0,0 +1,326 @@
+import ast as pyast
+import gc
+from typing import Any, Callable, Generator
+
+import compiler.ast as ast
+from compiler.builtins import (INT_MAX, INT_MIN, builtin_values, int_div,
+                               int_mod, wrap_int)
+from compiler.interpreter import Resolution, Value, resolve
+
+FUNCTION_NAME = '_program'
+
+# Names the generated function reads from its globals.
+runtime_names: dict[str, Any] = {
+    '_builtins': builtin_values,
+    '_wrap': wrap_int,
+    '_div': int_div,
+    '_mod': int_mod,
+}
+
+comparison_operators: dict[str, type[pyast.cmpop]] = {
+    '<': pyast.Lt, '<=': pyast.LtE, '>': pyast.Gt, '>=': pyast.GtE,
+    '==': pyast.Eq, '!=': pyast.NotEq,
+}
+
+arithmetic_operators: dict[str, type[pyast.operator]] = {
+    '+': pyast.Add, '-': pyast.Sub, '*': pyast.Mult,
+}
+
+# Deeper expressions are split into statements: CPython's compiler is
+# recursive and rejects very deeply nested expressions.
+MAX_EXPRESSION_DEPTH = 200
+
+# Scratch local of the overflow check. Nested checks may share it: an inner
+# check is finished before the outer one assigns it.
+WRAP_TEMP = '_w'
+
+# lineno, col_offset, end_lineno and end_col_offset of a generated node.
+# Every node gets the position of the source node it came from, so
+# tracebacks point at the program's source lines.
+Position = dict[str, int]
+
+# A node's translation yields (child, statement list, position) triples,
+# adding statements around them, and is sent back each child's expression.
+# `Transpiler.expression` drives these generators from an explicit stack, so
+# translating never recurses once per node.
+Request = tuple[ast.Expression, list[pyast.stmt], Position]
+Translation = Generator[Request, pyast.expr, pyast.expr]
+
+
+def _position(node: ast.Expression, default: Position) -> Position:
+    if node.location is None:
+        return default
+    line, column = node.location
+    return {'lineno': line, 'col_offset': column, 'end_lineno': line, 'end_col_offset': column}
+
+
+def _name(name: str, at: Position, store: bool = False) -> pyast.Name:
+    return pyast.Name(name, pyast.Store() if store else pyast.Load(), **at)
+
+
+def _assign(name: str, value: pyast.expr, at: Position) -> pyast.Assign:
+    return pyast.Assign([_name(name, at, store=True)], value, **at)
+
+
+def _call(function: str, args: list[pyast.expr], at: Position) -> pyast.Call:
+    return pyast.Call(_name(function, at), args, [], **at)
+
+
+def _wrapped(value: pyast.expr, at: Position) -> pyast.expr:
+    """`value`, wrapped to 64 bits only when it is out of range."""
+    # _w if INT_MIN <= (_w := value) <= INT_MAX else _wrap(_w)
+    check = pyast.Compare(
+        pyast.Constant(INT_MIN, **at),
+        [pyast.LtE(), pyast.LtE()],
+        [pyast.NamedExpr(_name(WRAP_TEMP, at, store=True), value, **at), pyast.Constant(INT_MAX, **at)],
+        **at,
+    )
+    return pyast.IfExp(check, _name(WRAP_TEMP, at), _call('_wrap', [_name(WRAP_TEMP, at)], at), **at)
+
+
+def _is_simple(expr: pyast.expr) -> bool:
+    """True if evaluating `expr` has no effects and can't be changed by later statements."""
+    return isinstance(expr, pyast.Constant)
+
+
+class Transpiler:
+    """
+    Translates a resolved AST into the body of one Python function.
+    Each node becomes a list of statements and an expression for its value.
+    Variables become locals of the function, named after their resolved
+    (depth, slot) pair: declarations sharing a pair are never alive at the
+    same time.
+    """
+
+    def __init__(self, root: ast.Expression) -> None:
+        self.root = root
+        self.resolution: Resolution = resolve(root)
+        self.temp_count = 0
+        # id() of a generated expression -> how deeply it nests, if above 1.
+        self.depths: dict[int, int] = {}
+        self.start: Position = {'lineno': 1, 'col_offset': 0, 'end_lineno': 1, 'end_col_offset': 0}
+
+    def variable(self, node: ast.Identifier) -> str:
+        depth, slot = self.resolution.slots[id(node)]
+        return f'v{depth}_{slot}_{node.name}'
+
+    def temp(self) -> str:
+        self.temp_count += 1
+        return f'_t{self.temp_count}'
+
+    def materialize(self, expr: pyast.expr, out: list[pyast.stmt], at: Position) -> pyast.expr:
+        """Saves `expr` in a temporary, unless later statements can't change its value."""
+        if _is_simple(expr):
+            return expr
+        temp = self.temp()
+        out.append(_assign(temp, expr, at))
+        return _name(temp, at)
+
+    def bounded(self, expr: pyast.expr, operands: list[pyast.expr], levels: int,
+                out: list[pyast.stmt], at: Position) -> pyast.expr:
+        """
+        `expr`, built `levels` deep on top of `operands`, or a temporary
+        holding it if that nests too deeply.
+        """
+        depth = levels + max((self.depths.get(id(o), 1) for o in operands), default=1)
+        if depth <= MAX_EXPRESSION_DEPTH:
+            self.depths[id(expr)] = depth
+            return expr
+        temp = self.temp()
+        out.append(_assign(temp, expr, at))
+        return _name(temp, at)
+
+    def module(self) -> pyast.Module:
+        at = self.start
+        body: list[pyast.stmt] = [
+            _assign(f'v0_{slot}_{name}',
+                    pyast.Subscript(_name('_builtins', at), pyast.Constant(name, **at), pyast.Load(), **at),
+                    at)
+            for slot, name in enumerate(self.resolution.globals)
+            if name in builtin_values
+        ]
+        result = self.expression(self.root, body, at)
+        body.append(pyast.Return(result, **at))
+        function = pyast.FunctionDef(
+            name=FUNCTION_NAME,
+            args=pyast.arguments(posonlyargs=[], args=[], kwonlyargs=[], kw_defaults=[], defaults=[]),
+            body=body,
+            decorator_list=[],
+            **at,
+        )
+        return pyast.Module([function], type_ignores=[])
+
+    def sequence(self, nodes: list[ast.Expression], out: list[pyast.stmt],
+                 at: Position) -> Generator[Request, pyast.expr, list[pyast.expr]]:
+        """
+        Translates operands evaluated left to right. An operand whose value
+        later statements could change is saved in a temporary first.
+        """
+        exprs: list[pyast.expr] = []
+        for node in nodes:
+            stmts: list[pyast.stmt] = []
+            expr = yield node, stmts, at
+            if stmts:
+                exprs = [self.materialize(previous, out, at) for previous in exprs]
+                out.extend(stmts)
+            exprs.append(expr)
+        return exprs
+
+    def statement(self, node: ast.Expression, out: list[pyast.stmt],
+                  at: Position) -> Generator[Request, pyast.expr, None]:
+        """Translates a node whose value is not needed."""
+        expr = yield node, out, at
+        if not isinstance(expr, (pyast.Constant, pyast.Name)):
+            out.append(pyast.Expr(expr, **_position(node, at)))
+
+    def expression(self, node: ast.Expression, out: list[pyast.stmt], parent: Position) -> pyast.expr:
+        stack: list[Translation] = [self.translate(node, out, parent)]
+        expr: pyast.expr | None = None
+        while stack:
+            try:
+                child, child_out, child_parent = stack[-1].send(expr)  # type: ignore[arg-type]
+            except StopIteration as done:
+                stack.pop()
+                expr = done.value
+                continue
+            stack.append(self.translate(child, child_out, child_parent))
+            expr = None
+        assert expr is not None
+        return expr
+
+    def translate(self, node: ast.Expression, out: list[pyast.stmt], parent: Position) -> Translation:
+        at = _position(node, parent)
+        match node:
+            case ast.Literal():
+                return pyast.Constant(node.value, **at)
+
+            case ast.Identifier():
+                return _name(self.variable(node), at)
+
+            case ast.BinaryOp() if node.op in ['and', 'or']:
+                left = yield node.left, out, at
+                right_stmts: list[pyast.stmt] = []
+                right = yield node.right, right_stmts, at
+                op = pyast.And() if node.op == 'and' else pyast.Or()
+                if not right_stmts:
+                    return self.bounded(pyast.BoolOp(op, [left, right], **at), [left, right], 1, out, at)
+                # The right operand's statements run only when it is evaluated.
+                temp = self.temp()
+                out.append(_assign(temp, left, at))
+                test: pyast.expr = _name(temp, at)
+                if node.op == 'or':
+                    test = pyast.UnaryOp(pyast.Not(), test, **at)
+                out.append(pyast.If(test, right_stmts + [_assign(temp, right, at)], [], **at))
+                return _name(temp, at)
+
+            case ast.BinaryOp():
+                operands = yield from self.sequence([node.left, node.right], out, at)
+                left, right = operands
+                if node.op in arithmetic_operators:
+                    binop = pyast.BinOp(left, arithmetic_operators[node.op](), right, **at)
+                    return self.bounded(_wrapped(binop, at), operands, 4, out, at)
+                elif node.op == '/':
+                    return self.bounded(_call('_div', operands, at), operands, 1, out, at)
+                elif node.op == '%':
+                    return self.bounded(_call('_mod', operands, at), operands, 1, out, at)
+                elif node.op in comparison_operators:
+                    compare = pyast.Compare(left, [comparison_operators[node.op]()], [right], **at)
+                    return self.bounded(compare, operands, 1, out, at)
+                raise ValueError(f"unknown binary operator '{node.op}' at {node.location}")
+
+            case ast.UnaryOp():
+                operand = yield node.operand, out, at
+                if node.operator == '-':
+                    negated = pyast.UnaryOp(pyast.USub(), operand, **at)
+                    return self.bounded(_wrapped(negated, at), [operand], 4, out, at)
+                elif node.operator == 'not':
+                    return self.bounded(pyast.UnaryOp(pyast.Not(), operand, **at), [operand], 1, out, at)
+                raise ValueError(f"unknown unary operator '{node.operator}' at {node.location}")
+
+            case ast.ControlFlow():
+                cond = yield node.if_exp, out, at
+                then_stmts: list[pyast.stmt] = []
+                if node.else_exp is None:
+                    yield from self.statement(node.then_exp, then_stmts, at)
+                    out.append(pyast.If(cond, then_stmts or [pyast.Pass(**at)], [], **at))
+                    return pyast.Constant(None, **at)
+                then = yield node.then_exp, then_stmts, at
+                else_stmts: list[pyast.stmt] = []
+                otherwise = yield node.else_exp, else_stmts, at
+                if not then_stmts and not else_stmts:
+                    if_expr = pyast.IfExp(cond, then, otherwise, **at)
+                    return self.bounded(if_expr, [cond, then, otherwise], 1, out, at)
+                temp = self.temp()
+                out.append(pyast.If(
+                    cond,
+                    then_stmts + [_assign(temp, then, at)],
+                    else_stmts + [_assign(temp, otherwise, at)],
+                    **at,
+                ))
+                return _name(temp, at)
+
+            case ast.WhileLoop():
+                cond_stmts: list[pyast.stmt] = []
+                cond = yield node.while_expr, cond_stmts, at
+                body: list[pyast.stmt] = []
+                yield from self.statement(node.do_expr, body, at)
+                if cond_stmts:
+                    # while True: <condition statements>; if not cond: break; <body>
+                    exit_check = pyast.If(pyast.UnaryOp(pyast.Not(), cond, **at), [pyast.Break(**at)], [], **at)
+                    loop = pyast.While(pyast.Constant(True, **at), cond_stmts + [exit_check] + body, [], **at)
+                else:
+                    loop = pyast.While(cond, body or [pyast.Pass(**at)], [], **at)
+                out.append(loop)
+                return pyast.Constant(None, **at)
+
+            case ast.Block():
+                if not node.expressions:
+                    return pyast.Constant(None, **at)
+                *init, last = node.expressions
+                for expr in init:
+                    yield from self.statement(expr, out, at)
+                return (yield last, out, at)
+
+            case ast.Variable():
+                value = yield node.value, out, at
+                out.append(_assign(self.variable(node.name), value, at))
+                return pyast.Constant(None, **at)
+
+            case ast.Assignment():
+                value = yield node.value, out, at
+                name = self.variable(node.name)
+                out.append(_assign(name, value, at))
+                return _name(name, at)
+
+            case ast.Function():
+                function = self.variable(node.identifier)
+                args = yield from self.sequence(node.args, out, at)
+                return self.bounded(_call(function, args, at), args, 1, out, at)
+
+            case _:
+                raise ValueError(f"unknown node {type(node).__name__} at {node.location}")
+
+
+def transpile(root: ast.Expression) -> pyast.Module:
+    """
+    A Python module defining a function `_program` that runs the program
+    and returns its value. It expects `runtime_names` in its globals.
+    """
+    # The module is many small objects without reference cycles. Collecting
+    # while it is built would only traverse the whole program over and over.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return Transpiler(root).module()
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def compile_python(root: ast.Expression) -> Callable[[], Value]:
+    """Compiles a program to Python bytecode and returns it as a function."""
+    code = compile(transpile(root), '<program>', 'exec')
+    namespace = dict(runtime_names)
+    exec(code, namespace)
+    program: Callable[[], Value] = namespace[FUNCTION_NAME]
+    return program
@@ -1,123 +1,206 @@
+from typing import Generator
+
 import compiler.ast as ast
-from compiler.types import Bool, Int, SymTab, Type, Unit
+from compiler.builtins import root_symbol_table
+from compiler.diagnostics import Diagnostic
+from compiler.types import Bool, ErrorType, FunType, Int, SymTab, Type, Unit
+
+# A node's checker yields (child, symbol table) pairs and is sent back the
+# child's type. `typecheck` drives these generators from an explicit stack,
+# so arbitrarily deep trees never touch Python's recursion limit.
+Checker = Generator[tuple[ast.Expression, SymTab], Type, Type]
+
+
+def typecheck(node: ast.Expression, symbol_table: SymTab | None = None,
+              diagnostics: list[Diagnostic] | None = None) -> Type:
+    """
+    Returns the type of `node` and records the type of every node of the
+    tree in its `type`. If `diagnostics` is given, type errors are
+    appended to it instead of raised, and checking goes on with the
+    erroneous expressions typed as `ErrorType`.
+    """
+    if symbol_table is None:
+        symbol_table = root_symbol_table()
+    stack: list[tuple[ast.Expression, Checker]] = []
+    result = _check_leaf(node, symbol_table, diagnostics)
+    if result is not None:
+        return result
+    stack.append((node, _check(node, symbol_table, diagnostics)))
+    result = None
+    while stack:
+        checked, checker = stack[-1]
+        try:
+            child, child_symbol_table = checker.send(result)  # type: ignore[arg-type]
+        except StopIteration as done:
+            stack.pop()
+            result = checked.type = done.value
+            continue
+        result = _check_leaf(child, child_symbol_table, diagnostics)
+        if result is None:
+            stack.append((child, _check(child, child_symbol_table, diagnostics)))
+    assert result is not None
+    return result
+
+
+def _error(node: ast.Expression, message: str, diagnostics: list[Diagnostic] | None,
+           *types: Type) -> Type:
+    """
+    Raises a type error, or records it and returns ErrorType if collecting
+    diagnostics. A mismatch involving ErrorType among `types` was already
+    reported where that type came from and isn't recorded again.
+    """
+    if diagnostics is None:
+        raise ValueError(f"{message} at {node.location}")
+    if ErrorType() not in types:
+        diagnostics.append(Diagnostic(node.location, message))
+    return ErrorType()
+
+
+def _lookup(node: ast.Identifier, symbol_table: SymTab, diagnostics: list[Diagnostic] | None) -> Type:
+    if diagnostics is None:
+        return symbol_table.lookup(node.name)
+    try:
+        return symbol_table.lookup(node.name)
+    except NameError as e:
+        return _error(node, str(e), diagnostics)
 
-def typecheck(node: ast.Expression, symbol_table = SymTab()) -> Type:
+
+def _check_leaf(node: ast.Expression, symbol_table: SymTab,
+                diagnostics: list[Diagnostic] | None = None) -> Type | None:
+    """Types literals and identifiers directly, returns None for anything else."""
     match node:
         case ast.Literal():
-            if isinstance(node.value, int):
-                return Int()
-            elif isinstance(node.value, bool):
-                return Bool()
+            if isinstance(node.value, bool):
+                node.type = Bool()
+            elif isinstance(node.value, int):
+                node.type = Int()
             elif node.value is None:
-                return Unit()
+                node.type = Unit()
             else:
                 raise ValueError(f"unknown literal type at {node.location}")
+            return node.type
         case ast.Identifier():
-            return symbol_table.lookup(node.name)
-        
+            if diagnostics is None:
+                node.type = symbol_table.lookup(node.name)
+            else:
+                node.type = _lookup(node, symbol_table, diagnostics)
+            return node.type
+        case Type():
+            return node
+    return None
+
+
+def _check(node: ast.Expression, symbol_table: SymTab, diagnostics: list[Diagnostic] | None = None) -> Checker:
+    match node:
         case ast.BinaryOp():
             if node.op in ['+', '-', '*', '/', '%']:
-                t1 = typecheck(node.left, symbol_table)
-                t2 = typecheck(node.right, symbol_table)
-                if t1 != Int() or t2 != Int():
-                    raise ValueError(f"operands of binary operator '{node.op}' must be of type Int at {node.location}")
+                t1 = yield node.left, symbol_table
+                t2 = yield node.right, symbol_table
+                if t1 is not Int() or t2 is not Int():
+                    return _error(node, f"operands of binary operator '{node.op}' must be of type Int", diagnostics, t1, t2)
                 return Int()
-            elif node.op in ['==', '!=']:
-                t1 = typecheck(node.left, symbol_table)
-                t2 = typecheck(node.right, symbol_table)
-                if t1 != t2:
-                    raise ValueError(f"type mismatch in comparison for operator '{node.op}' at {node.location}")
+            elif node.op in ['and', 'or']:
+                t1 = yield node.left, symbol_table
+                t2 = yield node.right, symbol_table
+                if t1 is not Bool() or t2 is not Bool():
+                    return _error(node, f"operands of binary operator '{node.op}' must be of type Bool", diagnostics, t1, t2)
                 return Bool()
             elif node.op in ['==', '!=', '<', '<=', '>', '>=']:
-                t1 = typecheck(node.left, symbol_table)
-                t2 = typecheck(node.right, symbol_table)
-                if t1 != t2:
-                    raise ValueError(f"type mismatch in comparison for operator '{node.op}' at {node.location}")
+                t1 = yield node.left, symbol_table
+                t2 = yield node.right, symbol_table
+                if t1 is not t2:
+                    return _error(node, f"type mismatch in comparison for operator '{node.op}'", diagnostics, t1, t2)
                 return Bool()
             else:
                 raise ValueError(f"unknown binary operator '{node.op}' at {node.location}")
 
-        case Type():
-            if node == Int():
-                return Int()
-            elif node == Bool():
-                return Bool()
-            elif node == Unit():
-                return Unit()
-
         case ast.Variable():
-            if node.type is not None:
-                # Check the type if present
-                initializer_type = typecheck(node.type, symbol_table)
-                if initializer_type != node.type:
-                    raise ValueError(f"type mismatch in types {initializer_type} and {node.type}")
-                node.type = initializer_type
-                symbol_table.define(node.name.name, node.type)
-            value_type = typecheck(node.value, symbol_table)
-            symbol_table.define(node.name.name, value_type)
+            value_type = yield node.value, symbol_table
+            declared_type = node.declared_type
+            if declared_type is None:
+                node.name.type = value_type
+                symbol_table.define(node.name.name, value_type)
+                return value_type
+            # Later uses see the declared type even if the initializer is wrong.
+            node.name.type = declared_type
+            symbol_table.define(node.name.name, declared_type)
+            if value_type is not declared_type:
+                return _error(node, f"type mismatch in declaration of variable '{node.name.name}'", diagnostics,
+                              value_type, declared_type)
             return value_type
-        
+
         case ast.Assignment():
-            variable_type = symbol_table.lookup(node.name.name)
-            value_type = typecheck(node.value, symbol_table)
-            if variable_type != value_type:
-                raise ValueError(f"type mismatch in assignment for variable '{node.name.name}' at {node.location}")
+            if not isinstance(node.name, ast.Identifier):
+                # The parser accepts any expression on the left of `=`.
+                yield node.value, symbol_table
+                return _error(node, "invalid assignment target", diagnostics)
+            variable_type = node.name.type = _lookup(node.name, symbol_table, diagnostics)
+            value_type = yield node.value, symbol_table
+            if variable_type is not value_type:
+                return _error(node, f"type mismatch in assignment for variable '{node.name.name}'", diagnostics,
+                              variable_type, value_type)
             return variable_type
-        
-        case ast.ControlFlow():
-            t1 = typecheck(node.if_exp)
-            if t1 is not Bool:
-                raise ...
-            t2 = typecheck(node.then_exp)
-            t3 = typecheck(node.else_exp)
-            if t2 != t3:
-                raise ValueError("mismatch in types at {node.location}")
-            return t2
-        
+
         case ast.UnaryOp():
-            if node.op == '-':
-                operand_type = typecheck(node.operand, symbol_table)
-                if operand_type != Int():
-                    raise ValueError(f"operand of unary '-' must be of type Int at {node.location}")
+            if node.operator == '-':
+                operand_type = yield node.operand, symbol_table
+                if operand_type is not Int():
+                    return _error(node, "operand of unary '-' must be of type Int", diagnostics, operand_type)
                 return Int()
+            elif node.operator == 'not':
+                operand_type = yield node.operand, symbol_table
+                if operand_type is not Bool():
+                    return _error(node, "operand of unary 'not' must be of type Bool", diagnostics, operand_type)
+                return Bool()
             else:
-                raise ValueError(f"unknown unary operator '{node.op}' at {node.location}")
+                raise ValueError(f"unknown unary operator '{node.operator}' at {node.location}")
 
         case ast.Function():
-            func_signature = symbol_table.lookup(node.identifier.name)
+            func_signature = node.identifier.type = _lookup(node.identifier, symbol_table, diagnostics)
+            if not isinstance(func_signature, FunType):
+                # Still check the arguments for errors of their own.
+                for arg in node.args:
+                    yield arg, symbol_table
+                if func_signature is ErrorType():
+                    return func_signature
+                return _error(node, f"'{node.identifier.name}' is not a function", diagnostics)
 
             if len(node.args) != len(func_signature.param_types):
-                raise ValueError(f"incorrect number of arguments for function '{node.identifier}' at {node.location}")
+                _error(node, f"incorrect number of arguments for function '{node.identifier.name}'", diagnostics)
 
             for arg, param_type in zip(node.args, func_signature.param_types):
-                arg_type = typecheck(arg, symbol_table)
-                if arg_type != param_type:
-                    raise ValueError(f"type mismatch in argument for function '{node.identifier}' at {node.location}")
+                arg_type = yield arg, symbol_table
+                if arg_type is not param_type:
+                    _error(node, f"type mismatch in argument for function '{node.identifier.name}'", diagnostics, arg_type)
+            for arg in node.args[len(func_signature.param_types):]:
+                yield arg, symbol_table
             return func_signature.return_type
 
         case ast.Block():
             block_symbol_table = SymTab(parent=symbol_table)
 
+            result_type: Type = Unit()
             for expr in node.expressions:
-                typecheck(expr)
-            if node.expressions:
-                return typecheck(node.expressions[-1], block_symbol_table)
-            else:
-                return Unit()
+                result_type = yield expr, block_symbol_table
+            return result_type
 
         case ast.ControlFlow():
-            t1 = typecheck(node.if_exp, symbol_table)
-            if t1 != Bool():
-                raise ValueError(f"condition expression must be of type Bool at {node.location}")
-            t2 = typecheck(node.then_exp, symbol_table)
-            t3 = typecheck(node.else_exp, symbol_table)
-            if t2 != t3:
-                raise ValueError(f"mismatch in types of 'then' and 'else' expressions at {node.location}")
+            t1 = yield node.if_exp, symbol_table
+            if t1 is not Bool():
+                _error(node, "condition expression must be of type Bool", diagnostics, t1)
+            t2 = yield node.then_exp, symbol_table
+            if node.else_exp is None:
+                return Unit()
+            t3 = yield node.else_exp, symbol_table
+            if t2 is not t3:
+                return _error(node, "mismatch in types of 'then' and 'else' expressions", diagnostics, t2, t3)
             return t2
 
         case ast.WhileLoop():
-            t1 = typecheck(node.while_expr, symbol_table)
-            if t1 != Bool():
-                raise ValueError(f"condition expression must be of type Bool at {node.location}")
-            typecheck(node.do_expr, symbol_table)
-            return Unit()     
\ No newline at end of file
+            t1 = yield node.while_expr, symbol_table
+            if t1 is not Bool():
+                _error(node, "condition expression must be of type Bool", diagnostics, t1)
+            yield node.do_expr, symbol_table
+            return Unit()
+
+    raise ValueError(f"unknown node {type(node).__name__} at {node.location}")
@@ -1,49 +1,106 @@
 from dataclasses import dataclass
+from typing import Any, Iterable
 
 
-@dataclass
 class Type:
-    ...
+    """
+    Base class for types.
+    Types are interned: constructing the same type twice returns the same
+    object, so equality is identity and types can be used as dict keys.
+    """
+    __slots__ = ()
 
-@dataclass
-class Int(Type):
-    def __str__(self):
+
+class PrimitiveType(Type):
+    """A type without parameters. Each subclass has exactly one instance."""
+    __slots__ = ()
+
+    def __new__(cls) -> Any:
+        instance = cls.__dict__.get('_instance')
+        if instance is None:
+            instance = super().__new__(cls)
+            setattr(cls, '_instance', instance)
+        return instance
+
+    def __reduce__(self) -> tuple:
+        return (type(self), ())
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}()'
+
+
+class Int(PrimitiveType):
+    __slots__ = ()
+
+    def __str__(self) -> str:
         return "Int"
 
-@dataclass
-class Bool(Type):
-    def __str__(self):
+class Bool(PrimitiveType):
+    __slots__ = ()
+
+    def __str__(self) -> str:
         return "Bool"
-    
-@dataclass
-class Unit(Type):
-    def __str__(self):
+
+class Unit(PrimitiveType):
+    __slots__ = ()
+
+    def __str__(self) -> str:
         return "None"
-    
-@dataclass
+
+class ErrorType(PrimitiveType):
+    """
+    The type of an expression that failed to type check. It matches no
+    other type, but a mismatch involving it isn't reported again (see
+    `type_checker._error`), so one error gives one diagnostic.
+    """
+    __slots__ = ()
+
+    def __str__(self) -> str:
+        return "<error>"
+
 class FunType(Type):
-    def __init__(self, param_types, return_type):
-        self.param_types = param_types
-        self.return_type = return_type
+    """Function types are hash-consed on (param_types, return_type)."""
+    __slots__ = ('param_types', 'return_type')
+    _instances: dict[tuple[tuple[Type, ...], Type], 'FunType'] = {}
+
+    param_types: tuple[Type, ...]
+    return_type: Type
+
+    def __new__(cls, param_types: Iterable[Type], return_type: Type) -> 'FunType':
+        key = (tuple(param_types), return_type)
+        instance = cls._instances.get(key)
+        if instance is None:
+            instance = super().__new__(cls)
+            instance.param_types, instance.return_type = key
+            cls._instances[key] = instance
+        return instance
+
+    def __reduce__(self) -> tuple:
+        return (FunType, (self.param_types, self.return_type))
+
+    def __repr__(self) -> str:
+        return f'FunType({list(self.param_types)!r}, {self.return_type!r})'
 
-    def __str__(self):
+    def __str__(self) -> str:
         param_types_str = ", ".join(str(param) for param in self.param_types)
         return f"({param_types_str}) -> {self.return_type}"
 
 @dataclass
 class SymTab:
-    def __init__(self, parent=None):
-        self.locals = {}
+    def __init__(self, parent: 'SymTab | None' = None) -> None:
+        self.locals: dict[str, Any] = {}
         # Pass the parent when going to a further scope from top-level
         self.parent = parent
 
-    def define(self, name, value):
+    def define(self, name: str, value: Any) -> None:
         self.locals[name] = value
 
-    def lookup(self, name):
-        if name in self.locals:
-            return self.locals[name]
-        elif self.parent:
-            return self.parent.lookup(name)
-        else:
-            raise NameError(f"Name '{name}' not defined")
\ No newline at end of file
+    def lookup(self, name: str) -> Any:
+        # Walk out through the enclosing scopes in a loop: blocks may nest
+        # deeper than Python's recursion limit.
+        table: SymTab | None = self
+        while table is not None:
+            if name in table.locals:
+                return table.locals[name]
+            table = table.parent
+        raise NameError(f"Name '{name}' not defined")
@@ -0,0 +1,357 @@
+import functools
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import compiler.ast as ast
+from compiler.builtins import INT_MAX, INT_MIN, wrap_int
+from compiler.interpreter import Resolution, Value
+
+# NumPy, once `load_numpy` has imported it. Importing it takes longer than
+# running most small programs, so only programs with counted loops do.
+np: Any = None
+
+# (depth, slot) of a resolved variable.
+Slot = tuple[int, int]
+
+# Shorter loops run one iteration at a time: setting up arrays costs more.
+MIN_TRIP_COUNT = 256
+
+# Iterations evaluated per batch, bounding the memory the arrays take.
+BATCH_SIZE = 1 << 16
+
+arithmetic_operators = ['+', '-', '*', '/', '%']
+comparison_operators = ['<', '<=', '>', '>=', '==', '!=']
+mirrored = {'<': '>', '<=': '>=', '>': '<', '>=': '<=', '!=': '!='}
+
+
+@dataclass
+class Term:
+    """`sign * expression`, added to an accumulator every iteration."""
+    sign: int
+    expression: ast.Expression
+
+
+@dataclass
+class Accumulation:
+    """
+    `acc = acc + e` or `acc = acc - e`, possibly under
+    `if condition then ... else ...`. A missing term adds nothing.
+    """
+    slot: Slot
+    condition: ast.Expression | None
+    then: Term | None
+    otherwise: Term | None
+
+
+@dataclass
+class CountedLoop:
+    """
+    `while counter < bound do { ...; counter = counter + step }` where the
+    bound doesn't change in the loop and every other statement either
+    accumulates a pure expression of the counter or assigns one.
+    `comparison` has the counter on its left side.
+    """
+    counter: Slot
+    step: int
+    comparison: str
+    bound: ast.Expression
+    accumulations: list[Accumulation]
+    assignments: list[tuple[Slot, ast.Expression]]
+    # Every variable the loop reads, and id() of every Identifier -> its slot.
+    inputs: set[Slot]
+    slots: dict[int, Slot]
+
+
+class _Fallback(Exception):
+    """A batch can't be evaluated with arrays and must run one step at a time."""
+
+
+class _Analysis:
+    def __init__(self, resolution: Resolution) -> None:
+        self.resolution = resolution
+        self.slots: dict[int, Slot] = {}
+        self.reads: set[Slot] = set()
+
+    def slot(self, node: ast.Identifier) -> Slot:
+        slot = self.resolution.slots[id(node)]
+        self.slots[id(node)] = slot
+        return slot
+
+    def is_pure(self, node: ast.Expression, readable: Callable[[Slot], bool]) -> bool:
+        """True for expressions without calls or assignments reading only `readable` variables."""
+        match node:
+            case ast.Literal():
+                return type(node.value) in (int, bool)
+            case ast.Identifier():
+                slot = self.slot(node)
+                self.reads.add(slot)
+                return readable(slot)
+            case ast.BinaryOp():
+                return (node.op in arithmetic_operators + comparison_operators + ['and', 'or']
+                        and self.is_pure(node.left, readable) and self.is_pure(node.right, readable))
+            case ast.UnaryOp():
+                return node.operator in ['-', 'not'] and self.is_pure(node.operand, readable)
+            case ast.ControlFlow():
+                return (node.else_exp is not None and self.is_pure(node.if_exp, readable)
+                        and self.is_pure(node.then_exp, readable) and self.is_pure(node.else_exp, readable))
+            case _:
+                return False
+
+    def term(self, node: ast.Expression, target: Slot, readable: Callable[[Slot], bool]) -> Term | None:
+        """The term of `target = target + e`, `target = e + target` or `target = target - e`."""
+        while isinstance(node, ast.Block) and len(node.expressions) == 1:
+            node = node.expressions[0]
+        if not isinstance(node, ast.Assignment) or self.slot(node.name) != target:
+            return None
+        value = node.value
+        if not isinstance(value, ast.BinaryOp) or value.op not in ['+', '-']:
+            return None
+
+        def is_target(n: ast.Expression) -> bool:
+            return isinstance(n, ast.Identifier) and self.slot(n) == target
+
+        if is_target(value.left) and self.is_pure(value.right, readable):
+            return Term(1 if value.op == '+' else -1, value.right)
+        if value.op == '+' and is_target(value.right) and self.is_pure(value.left, readable):
+            return Term(1, value.left)
+        return None
+
+    def target(self, node: ast.Expression) -> Slot | None:
+        """The variable a statement of a counted loop's body updates."""
+        while isinstance(node, ast.Block) and len(node.expressions) == 1:
+            node = node.expressions[0]
+        match node:
+            case ast.Assignment():
+                return self.slot(node.name)
+            case ast.ControlFlow():
+                return self.target(node.then_exp)
+            case _:
+                return None
+
+
+def analyze_loop(node: ast.WhileLoop, resolution: Resolution) -> CountedLoop | None:
+    """Recognizes a counted loop, or returns None if `node` isn't one."""
+    body = node.do_expr
+    if not isinstance(body, ast.Block) or not body.expressions:
+        return None
+    analysis = _Analysis(resolution)
+    *statements, increment = body.expressions
+    targets = [analysis.target(s) for s in body.expressions]
+    if None in targets or len(set(targets)) != len(targets):
+        return None
+    updated = set(targets)
+
+    # counter = counter + step, or counter = counter - step
+    if not isinstance(increment, ast.Assignment):
+        return None
+    counter = analysis.slot(increment.name)
+    value = increment.value
+    if (not isinstance(value, ast.BinaryOp) or value.op not in ['+', '-']
+            or not isinstance(value.left, ast.Identifier) or analysis.slot(value.left) != counter
+            or not isinstance(value.right, ast.Literal) or type(value.right.value) is not int
+            or value.right.value == 0):
+        return None
+    step = value.right.value if value.op == '+' else -value.right.value
+
+    # counter < bound, or bound > counter, and the like
+    cond = node.while_expr
+    invariant = lambda slot: slot not in updated
+    if not isinstance(cond, ast.BinaryOp) or cond.op not in mirrored:
+        return None
+    if isinstance(cond.left, ast.Identifier) and analysis.slot(cond.left) == counter:
+        comparison, bound = cond.op, cond.right
+    elif isinstance(cond.right, ast.Identifier) and analysis.slot(cond.right) == counter:
+        comparison, bound = mirrored[cond.op], cond.left
+    else:
+        return None
+    if comparison not in (['<', '<=', '!='] if step > 0 else ['>', '>=', '!=']):
+        return None
+    if not analysis.is_pure(bound, invariant):
+        return None
+
+    # Statements before the increment see the counter's value at the start
+    # of the iteration, and nothing else the loop changes.
+    readable = lambda slot: slot == counter or slot not in updated
+    accumulations: list[Accumulation] = []
+    assignments: list[tuple[Slot, ast.Expression]] = []
+    for statement, target in zip(statements, targets):
+        assert target is not None
+        if target == counter:
+            return None
+        if isinstance(statement, ast.ControlFlow):
+            if not analysis.is_pure(statement.if_exp, readable):
+                return None
+            then = analysis.term(statement.then_exp, target, readable)
+            otherwise = None
+            if statement.else_exp is not None:
+                otherwise = analysis.term(statement.else_exp, target, readable)
+                if otherwise is None:
+                    return None
+            if then is None:
+                return None
+            accumulations.append(Accumulation(target, statement.if_exp, then, otherwise))
+            continue
+        term = analysis.term(statement, target, readable)
+        if term is not None:
+            accumulations.append(Accumulation(target, None, term, None))
+            continue
+        while isinstance(statement, ast.Block):
+            statement = statement.expressions[0]
+        assert isinstance(statement, ast.Assignment)
+        if not analysis.is_pure(statement.value, readable):
+            return None
+        assignments.append((target, statement.value))
+
+    inputs = analysis.reads | {counter} | {a.slot for a in accumulations}
+    return CountedLoop(counter, step, comparison, bound, accumulations, assignments, inputs, analysis.slots)
+
+
+@functools.cache
+def load_numpy() -> bool:
+    """Imports NumPy. False if it isn't installed: loops then run one iteration at a time."""
+    global np
+    try:
+        import numpy
+    except ImportError:
+        return False
+    np = numpy
+    return True
+
+
+def trip_count(start: int, bound: int, step: int, comparison: str) -> int | None:
+    """How often a counted loop runs, or None if it wouldn't end without the counter wrapping around."""
+    distance = bound - start
+    if comparison == '!=':
+        if distance % step != 0 or distance // step < 0:
+            return None
+        count = distance // step
+    elif comparison in ['<', '>']:
+        count = max(0, -(-distance // step))
+    else:
+        count = max(0, distance // step + 1)
+    if not INT_MIN <= start + count * step <= INT_MAX:
+        return None
+    return count
+
+
+def _evaluate(node: ast.Expression, env: dict[Slot, Any], slots: dict[int, Slot]) -> Any:
+    """Evaluates a pure expression over int64 arrays or scalars, which wrap like the language's ints."""
+    match node:
+        case ast.Literal():
+            return np.bool_(node.value) if isinstance(node.value, bool) else np.int64(node.value)
+        case ast.Identifier():
+            return env[slots[id(node)]]
+        case ast.UnaryOp():
+            operand = _evaluate(node.operand, env, slots)
+            return np.logical_not(operand) if node.operator == 'not' else np.negative(operand)
+        case ast.ControlFlow():
+            assert node.else_exp is not None
+            return np.where(_evaluate(node.if_exp, env, slots),
+                            _evaluate(node.then_exp, env, slots),
+                            _evaluate(node.else_exp, env, slots))
+        case ast.BinaryOp():
+            a = _evaluate(node.left, env, slots)
+            b = _evaluate(node.right, env, slots)
+            op = node.op
+            if op == '+':
+                return np.add(a, b)
+            elif op == '-':
+                return np.subtract(a, b)
+            elif op == '*':
+                return np.multiply(a, b)
+            elif op in ['/', '%']:
+                # Zero divisors must raise where the program divides by them,
+                # and INT_MIN has no int64 absolute value.
+                if np.any(b == 0) or np.any(a == INT_MIN) or np.any(b == INT_MIN):
+                    raise _Fallback()
+                quotient_or_remainder = (np.floor_divide if op == '/' else np.remainder)(np.abs(a), np.abs(b))
+                negative = (a < 0) != (b < 0) if op == '/' else a < 0
+                return np.where(negative, -quotient_or_remainder, quotient_or_remainder)
+            elif op == '<':
+                return np.less(a, b)
+            elif op == '<=':
+                return np.less_equal(a, b)
+            elif op == '>':
+                return np.greater(a, b)
+            elif op == '>=':
+                return np.greater_equal(a, b)
+            elif op == '==':
+                return np.equal(a, b)
+            elif op == '!=':
+                return np.not_equal(a, b)
+            elif op == 'and':
+                return np.logical_and(a, b)
+            elif op == 'or':
+                return np.logical_or(a, b)
+            raise ValueError(f"unknown binary operator '{op}' at {node.location}")
+        case _:
+            raise ValueError(f"unknown node {type(node).__name__} at {node.location}")
+
+
+def _delta(accumulation: Accumulation, env: dict[Slot, Any], slots: dict[int, Slot], count: int) -> int:
+    """What one batch of `count` iterations adds to an accumulator, modulo 2**64."""
+    def terms(term: Term | None) -> Any:
+        if term is None:
+            return np.zeros(count, dtype=np.int64)
+        value = np.broadcast_to(_evaluate(term.expression, env, slots), (count,))
+        return value if term.sign > 0 else np.negative(value)
+
+    if accumulation.condition is None:
+        values = terms(accumulation.then)
+    else:
+        condition = np.broadcast_to(_evaluate(accumulation.condition, env, slots), (count,))
+        values = np.where(condition, terms(accumulation.then), terms(accumulation.otherwise))
+    if values.dtype != np.int64:
+        raise _Fallback()
+    return int(np.sum(values, dtype=np.int64))
+
+
+def run_counted(loop: CountedLoop, frames: list[list[Value]]) -> None:
+    """
+    Runs the iterations of `loop` it can in batches of array operations and
+    updates the variables accordingly. The caller then runs the loop as
+    usual, which does the remaining iterations, if any, one at a time.
+    """
+    if not load_numpy():
+        return
+    values = {slot: frames[slot[0]][slot[1]] for slot in loop.inputs}
+    if any(type(v) not in (int, bool) for v in values.values()):
+        return
+    if any(type(values[slot]) is not int for slot in [loop.counter, *(a.slot for a in loop.accumulations)]):
+        return
+    env: dict[Slot, Any] = {slot: np.bool_(v) if isinstance(v, bool) else np.int64(v)
+                            for slot, v in values.items()}
+    with np.errstate(all='ignore'):
+        try:
+            bound = int(_evaluate(loop.bound, env, loop.slots))
+        except _Fallback:
+            return
+        count = trip_count(values[loop.counter], bound, loop.step, loop.comparison)
+        if count is None or count < MIN_TRIP_COUNT:
+            return
+
+        counter = values[loop.counter]
+        totals = {a.slot: values[a.slot] for a in loop.accumulations}
+        last: dict[Slot, int] = {}
+        done = 0
+        try:
+            while done < count:
+                size = min(BATCH_SIZE, count - done)
+                env[loop.counter] = np.arange(size, dtype=np.int64) * np.int64(loop.step) + np.int64(counter)
+                deltas = {a.slot: _delta(a, env, loop.slots, size) for a in loop.accumulations}
+                batch_last = {}
+                for slot, expression in loop.assignments:
+                    value = np.broadcast_to(_evaluate(expression, env, loop.slots), (size,))[-1]
+                    batch_last[slot] = bool(value) if value.dtype == np.bool_ else int(value)
+                # A batch counts only once all of it is evaluated.
+                for slot, delta in deltas.items():
+                    totals[slot] = wrap_int(totals[slot] + delta)
+                last.update(batch_last)
+                counter += size * loop.step
+                done += size
+        except _Fallback:
+            pass
+
+    frames[loop.counter[0]][loop.counter[1]] = counter
+    for (depth, index), value in [*totals.items(), *last.items()]:
+        frames[depth][index] = value
@@ -0,0 +1,138 @@
+from array import array
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from compiler import ir
+from compiler.builtins import (INT_MAX, INT_MIN, builtin_values, int_div,
+                               int_mod, wrap_int)
+
+# Every instruction is encoded as four integers: opcode and three operands.
+WIDTH = 4
+
+(HALT, LOAD_INT, LOAD_BOOL, COPY, JUMP, COND_JUMP, CALL,
+ ADD, SUB, MUL, DIV, MOD, LT, LE, GT, GE, EQ, NE, NEG, NOT) = range(20)
+
+operator_opcodes = {
+    '+': ADD, '-': SUB, '*': MUL, '/': DIV, '%': MOD,
+    '<': LT, '<=': LE, '>': GT, '>=': GE, '==': EQ, '!=': NE,
+    'unary_-': NEG, 'unary_not': NOT,
+}
+
+
+@dataclass
+class Bytecode:
+    """
+    IR encoded into one flat array of 64-bit integers.
+    Jump targets are instruction offsets into `code`, calls to builtin
+    functions index into `call_sites`.
+    """
+    code: array
+    call_sites: list[tuple[Callable[..., Any], tuple[int, ...]]]
+    register_count: int
+    result: int
+
+
+def assemble(program: ir.IRProgram,
+             functions: dict[str, Callable[..., Any]] = builtin_values) -> Bytecode:
+    """Encodes IR. Calls other than operators go to the named entry of `functions`."""
+    label_offsets: dict[str, int] = {}
+    offset = 0
+    for ins in program.instructions:
+        if isinstance(ins, ir.Label):
+            label_offsets[ins.name] = offset
+        else:
+            offset += WIDTH
+
+    code = array('q')
+    call_sites: list[tuple[Callable[..., Any], tuple[int, ...]]] = []
+    for ins in program.instructions:
+        match ins:
+            case ir.Label():
+                continue
+            case ir.LoadIntConst():
+                code.extend((LOAD_INT, ins.dest.index, wrap_int(ins.value), 0))
+            case ir.LoadBoolConst():
+                code.extend((LOAD_BOOL, ins.dest.index, int(ins.value), 0))
+            case ir.Copy():
+                code.extend((COPY, ins.dest.index, ins.source.index, 0))
+            case ir.Jump():
+                code.extend((JUMP, label_offsets[ins.label.name], 0, 0))
+            case ir.CondJump():
+                code.extend((COND_JUMP, ins.cond.index,
+                             label_offsets[ins.then_label.name],
+                             label_offsets[ins.else_label.name]))
+            case ir.Call() if ins.fun in operator_opcodes:
+                args = [arg.index for arg in ins.args] + [0]
+                code.extend((operator_opcodes[ins.fun], ins.dest.index, args[0], args[1]))
+            case ir.Call():
+                call_sites.append((functions[ins.fun], tuple(arg.index for arg in ins.args)))
+                code.extend((CALL, ins.dest.index, len(call_sites) - 1, 0))
+            case _:
+                raise ValueError(f"unknown instruction {ins}")
+    code.extend((HALT, 0, 0, 0))
+    return Bytecode(code, call_sites, program.var_count, program.result.index)
+
+
+def run(bytecode: Bytecode) -> Any:
+    """Executes bytecode and returns the value of the program's result register."""
+    # Indexing a list is cheaper than boxing array elements on every read.
+    code = bytecode.code.tolist()
+    call_sites = bytecode.call_sites
+    regs: list[Any] = [None] * bytecode.register_count
+    pc = 0
+    while True:
+        op = code[pc]
+        a = code[pc + 1]
+        b = code[pc + 2]
+        c = code[pc + 3]
+        pc += WIDTH
+        if op == COPY:
+            regs[a] = regs[b]
+        elif op == COND_JUMP:
+            pc = b if regs[a] else c
+        elif op == JUMP:
+            pc = a
+        elif op == LT:
+            regs[a] = regs[b] < regs[c]
+        elif op == ADD:
+            r = regs[b] + regs[c]
+            regs[a] = r if INT_MIN <= r <= INT_MAX else wrap_int(r)
+        elif op == SUB:
+            r = regs[b] - regs[c]
+            regs[a] = r if INT_MIN <= r <= INT_MAX else wrap_int(r)
+        elif op == LOAD_INT:
+            regs[a] = b
+        elif op == MUL:
+            r = regs[b] * regs[c]
+            regs[a] = r if INT_MIN <= r <= INT_MAX else wrap_int(r)
+        elif op == LE:
+            regs[a] = regs[b] <= regs[c]
+        elif op == GT:
+            regs[a] = regs[b] > regs[c]
+        elif op == GE:
+            regs[a] = regs[b] >= regs[c]
+        elif op == EQ:
+            regs[a] = regs[b] == regs[c]
+        elif op == NE:
+            regs[a] = regs[b] != regs[c]
+        elif op == DIV:
+            regs[a] = int_div(regs[b], regs[c])
+        elif op == MOD:
+            regs[a] = int_mod(regs[b], regs[c])
+        elif op == LOAD_BOOL:
+            regs[a] = bool(b)
+        elif op == NEG:
+            regs[a] = wrap_int(-regs[b])
+        elif op == NOT:
+            regs[a] = not regs[b]
+        elif op == CALL:
+            fun, args = call_sites[b]
+            regs[a] = fun(*[regs[arg] for arg in args])
+        elif op == HALT:
+            return regs[bytecode.result]
+        else:
+            raise ValueError(f"invalid opcode {op} at {pc - WIDTH}")
+
+
+def execute(program: ir.IRProgram) -> Any:
+    return run(assemble(program))
@@ -0,0 +1,80 @@
+import shutil
+import subprocess
+
+import pytest
+
+from compiler.assembler import assemble_and_link
+from compiler.assembly_generator import generate_assembly
+from compiler.ir_generator import generate_ir
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+
+needs_toolchain = pytest.mark.skipif(
+    shutil.which('as') is None or shutil.which('ld') is None,
+    reason="requires the system assembler and linker",
+)
+
+
+def compile_and_run(source_code: str, tmp_path, stdin: str = '', allocate: bool = True) -> str:
+    assembly_code = generate_assembly(generate_ir(parse(Tokenizer.tokenize(source_code))), allocate=allocate)
+    executable = str(tmp_path / 'program')
+    assemble_and_link(assembly_code, executable)
+    return subprocess.run([executable], input=stdin, capture_output=True, text=True, check=True).stdout
+
+
+def test_generates_entry_point_and_runtime() -> None:
+    assembly_code = generate_assembly(generate_ir(parse(Tokenizer.tokenize("print_int(1)"))))
+    assert '_start:' in assembly_code
+    assert 'call print_int' in assembly_code
+    assert 'read_int:' in assembly_code
+
+@needs_toolchain
+def test_loop(tmp_path) -> None:
+    source_code = "{ var i = 0; var acc = 0; while i < 10 do { acc = acc + i * i; i = i + 1; } print_int(acc); }"
+    assert compile_and_run(source_code, tmp_path) == "285\n"
+
+@needs_toolchain
+def test_division_and_booleans(tmp_path) -> None:
+    source_code = "{ print_int(-7 / 2); print_int(-7 % 2); print_bool(1 < 2 and not (2 < 1)); }"
+    assert compile_and_run(source_code, tmp_path) == "-3\n-1\ntrue\n"
+
+@needs_toolchain
+def test_read_int(tmp_path) -> None:
+    assert compile_and_run("print_int(read_int() * 2)", tmp_path, stdin="-21\n") == "-42\n"
+
+def test_keeps_loop_in_registers() -> None:
+    assembly_code = generate_assembly(generate_ir(parse(Tokenizer.tokenize(
+        "{ var i = 0; while i < 10 do { i = i + 1; } print_int(i); }"))))
+    loop = assembly_code[assembly_code.index('_while_body:'):assembly_code.index('call print_int')]
+    assert '(%rbp)' not in loop
+
+@needs_toolchain
+def test_register_pressure(tmp_path) -> None:
+    n = 20
+    declarations = ' '.join(f'var v{i} = {i};' for i in range(n))
+    updates = ' '.join(f'v{i} = v{i} + v{(i + 1) % n} * j;' for i in range(n))
+    prints = ' '.join(f'print_int(v{i});' for i in range(n))
+    source_code = f"{{ {declarations} var j = 0; while j < 3 do {{ {updates} j = j + 1; }} {prints} }}"
+    assert compile_and_run(source_code, tmp_path) == compile_and_run(source_code, tmp_path, allocate=False)
+
+@needs_toolchain
+def test_operands_keep_values_from_before_later_assignments(tmp_path) -> None:
+    source_code = "{ var x = 2; print_int(x * (x = 3) * x); var y = 2; print_int(y + (y = 5) * y); }"
+    assert compile_and_run(source_code, tmp_path) == "18\n27\n"
+
+@needs_toolchain
+def test_division_edge_cases(tmp_path) -> None:
+    source_code = ("{ var m = 0 - 9223372036854775807 - 1; var d = 0 - 1; "
+                   "print_int(m / d); print_int(m % d); print_int(7 / d); print_int(-7 % d); }")
+    expected = "-9223372036854775808\n0\n-7\n0\n"
+    assert compile_and_run(source_code, tmp_path) == expected
+    assert compile_and_run(source_code, tmp_path, allocate=False) == expected
+
+@needs_toolchain
+def test_division_by_zero_exits_with_error(tmp_path) -> None:
+    assembly_code = generate_assembly(generate_ir(parse(Tokenizer.tokenize(
+        "{ var z = 0; print_int(1); print_int(1 % z); }"))))
+    executable = str(tmp_path / 'program')
+    assemble_and_link(assembly_code, executable)
+    completed = subprocess.run([executable], capture_output=True, text=True)
+    assert (completed.returncode, completed.stdout, completed.stderr) == (1, "1\n", "Error: division by zero\n")
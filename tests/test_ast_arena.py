@@ -0,0 +1,33 @@
+from compiler import ast
+from compiler.ast_arena import BINARY_OP, LITERAL, from_arena, to_arena
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+from compiler.types import Bool
+
+
+def test_round_trip() -> None:
+    source_code = "{ var x = 1; while x < 10 do { x = x * 2; } if x == 16 then print_int(x) else -x }"
+    tree = parse(Tokenizer.tokenize(source_code))
+    assert from_arena(to_arena(tree)) == tree
+
+def test_post_order_layout() -> None:
+    arena = to_arena(parse(Tokenizer.tokenize("1 + 2")))
+    assert list(arena.kind) == [LITERAL, LITERAL, BINARY_OP]
+    assert list(arena.children_of(arena.root)) == [0, 1]
+    assert arena.strings[arena.value[arena.root]] == '+'
+
+def test_nodes_are_slotted_and_share_default_type() -> None:
+    a = ast.Literal((1, 0), 1)
+    b = ast.Literal((1, 4), 2)
+    assert not hasattr(a, '__dict__')
+    assert a.type is b.type
+
+def test_round_trip_of_deep_tree() -> None:
+    tree = parse(Tokenizer.tokenize(' - '.join(str(i) for i in range(5000))))
+    back = from_arena(to_arena(tree))
+    assert [(type(n), n.location) for n in ast.walk(back)] == [(type(n), n.location) for n in ast.walk(tree)]
+
+def test_round_trip_keeps_declared_types() -> None:
+    tree = parse(Tokenizer.tokenize("{ var x: Bool = true; var y = 1; x }"))
+    back = from_arena(to_arena(tree))
+    assert [e.declared_type for e in back.expressions[:2]] == [Bool(), None]
@@ -0,0 +1,74 @@
+import pytest
+
+from compiler.__main__ import main
+from compiler.ast_arena import from_arena, to_arena
+from compiler.ast_binary import MappedArena, dump, encode_arena, load
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+from compiler.type_checker import typecheck
+from compiler.types import Bool, FunType, Int, Unit
+
+
+def typechecked(source_code: str):
+    tree = parse(Tokenizer.tokenize(source_code))
+    typecheck(tree)
+    return tree
+
+
+def test_round_trip(tmp_path) -> None:
+    tree = typechecked("{ var x = 1; while x < 10 do { x = x * 2; } "
+                       "if x == 16 then print_int(x) else print_int(-x); not (x > 2) }")
+    path = str(tmp_path / 'tree.bin')
+    dump(tree, path)
+    loaded = load(path)
+    assert loaded == tree
+    assert loaded.type == tree.type
+    print_int = loaded.expressions[2].then_exp.identifier
+    assert print_int.type == tree.expressions[2].then_exp.identifier.type
+
+def test_round_trip_keeps_types(tmp_path) -> None:
+    tree = typechecked("{ var x = 1; print_int(x); x < 2 }")
+    path = str(tmp_path / 'tree.bin')
+    dump(tree, path)
+    loaded = load(path)
+    assert loaded.type == Bool()
+    assert loaded.expressions[0].type == Int()
+    assert loaded.expressions[0].name.type == Int()
+    assert loaded.expressions[1].identifier.type == FunType([Int()], Unit())
+    assert loaded.expressions[2].left.type == Int()
+
+def test_materializes_subtrees_on_demand(tmp_path) -> None:
+    tree = typechecked("{ var abc = 9223372036854775807; abc * 2; print_bool(true) }")
+    arena = to_arena(tree)
+    path = tmp_path / 'tree.bin'
+    path.write_bytes(encode_arena(arena))
+    mapped = MappedArena(str(path))
+    try:
+        index = arena.children_of(arena.root)[1]
+        assert from_arena(mapped, index) == tree.expressions[1]
+        assert mapped.strings.cache == {arena.strings.index('abc'): 'abc', arena.strings.index('*'): '*'}
+        assert from_arena(mapped) == tree
+    finally:
+        mapped.close()
+
+def test_rejects_other_files(tmp_path) -> None:
+    path = tmp_path / 'tree.bin'
+    path.write_bytes(b'not a tree at all, just some bytes')
+    with pytest.raises(ValueError, match="not an AST file"):
+        load(str(path))
+    dump(typechecked("1 + 2"), str(path))
+    data = bytearray(path.read_bytes())
+    data[4] = 99
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="version 99"):
+        load(str(path))
+
+def test_driver_emits_and_loads(tmp_path, capsys) -> None:
+    source = tmp_path / 'program.txt'
+    source.write_text("{ var x = 20; print_int(x + 1); }")
+    tree_file = tmp_path / 'program.bin'
+    assert main(['check', '--no-cache', f'--emit-ast={tree_file}', str(source)]) == 0
+    source.unlink()
+    for engine in ['closures', 'tree', 'ir', 'python']:
+        assert main(['interpret', f'--engine={engine}', f'--load-ast={tree_file}']) == 0
+        assert capsys.readouterr().out == "21\n"
@@ -0,0 +1,44 @@
+import io
+
+from compiler.batch import expand_inputs, report, run_batch
+from compiler.sandbox import Limits
+
+
+def write_programs(tmp_path) -> list[str]:
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.txt").write_text("{ var x = 1; print_int(x + 1); }")
+    (tmp_path / "sub" / "b.txt").write_text("{ var x = 1; x = true; }")
+    (tmp_path / "sub" / "c.txt").write_text("print_bool(1 < 2)")
+    (tmp_path / "notes.md").write_text("not a program")
+    return [str(tmp_path / "a.txt"), str(tmp_path / "sub" / "b.txt"), str(tmp_path / "sub" / "c.txt")]
+
+def test_expand_inputs(tmp_path) -> None:
+    paths = write_programs(tmp_path)
+    assert expand_inputs([str(tmp_path)]) == paths
+    assert expand_inputs([str(tmp_path / "**" / "*.txt")]) == paths
+    assert expand_inputs([paths[2], paths[0], paths[2]]) == [paths[0], paths[2]]
+
+def test_run_batch(tmp_path) -> None:
+    paths = write_programs(tmp_path)
+    for jobs in [1, 2]:
+        results = run_batch(paths, 'interpret', jobs=jobs)
+        assert [r.path for r in results] == paths
+        assert [r.ok for r in results] == [True, False, True]
+        assert [r.output for r in results] == ["2\n", "", "true\n"]
+        assert "type mismatch in assignment" in results[1].diagnostics[0]
+
+def test_limits_apply_to_each_program(tmp_path) -> None:
+    paths = write_programs(tmp_path)
+    (tmp_path / "loop.txt").write_text("{ while true do {} }")
+    paths.append(str(tmp_path / "loop.txt"))
+    for jobs in [1, 2]:
+        results = run_batch(paths, 'interpret', jobs=jobs, limits=Limits(timeout=0.2))
+        assert [r.ok for r in results] == [True, False, True, False]
+        assert results[3].diagnostics[0].startswith("ResourceLimitExceeded: time limit of 0.2 exceeded")
+
+def test_report(tmp_path) -> None:
+    paths = write_programs(tmp_path)
+    out = io.StringIO()
+    assert report(run_batch(paths, 'check', jobs=2), out) == 1
+    assert out.getvalue().splitlines()[-1] == "3 files, 2 ok, 1 failed"
+    assert report(run_batch(paths[:1], 'check'), io.StringIO()) == 0
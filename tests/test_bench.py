@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from compiler.bench import bench_source, phases, run_benchmarks, workloads
+from compiler.closure_compiler import compile_closures
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+from compiler.type_checker import typecheck
+
+
+@pytest.mark.parametrize('name', list(workloads))
+def test_workloads_are_valid_programs(name: str, capsys) -> None:
+    generate, sizes = workloads[name]
+    tree = parse(Tokenizer.tokenize(generate(sizes[0])))
+    typecheck(tree)
+    compile_closures(tree)()
+    assert capsys.readouterr().out != ""
+
+def test_report_is_json(capsys) -> None:
+    report = run_benchmarks(['large_loop', 'many_variables'], warmups=0, repeats=2, scale=0.01)
+    assert [b['name'] for b in report['benchmarks']] == ['large_loop'] * 3 + ['many_variables'] * 3
+    assert json.loads(json.dumps(report)) == report
+    for benchmark in report['benchmarks']:
+        assert list(benchmark['phases']) == phases
+        for stats in benchmark['phases'].values():
+            assert 0 <= stats['min'] <= stats['median']
+    # Program output does not leak into the report stream.
+    assert capsys.readouterr().out == ""
+
+def test_bench_source_counts_tokens() -> None:
+    result = bench_source('one', None, "print_int(1 + 2)", warmups=0, repeats=1)
+    assert result['tokens'] == 6
+    assert result['source_bytes'] == 16
+
+def test_unknown_workload() -> None:
+    with pytest.raises(ValueError, match="unknown benchmark"):
+        run_benchmarks(['nope'])
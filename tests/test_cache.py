@@ -0,0 +1,59 @@
+import os
+
+from compiler.cache import CompilationCache
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+
+source_code = "{ var x = 1; while x < 10 do { x = x + 1; } x }"
+
+
+def test_miss_then_hit(tmp_path) -> None:
+    cache = CompilationCache(str(tmp_path))
+    assert cache.load(source_code) is None
+    tree = parse(Tokenizer.tokenize(source_code))
+    cache.store(source_code, tree)
+    assert cache.load(source_code) == tree
+    assert cache.load(source_code + " ") is None
+
+def test_key_depends_on_version(tmp_path) -> None:
+    cache = CompilationCache(str(tmp_path))
+    key = cache.key(source_code)
+    cache.version += '-changed'
+    assert cache.key(source_code) != key
+
+def test_corrupt_entry_is_a_miss(tmp_path) -> None:
+    cache = CompilationCache(str(tmp_path))
+    with open(cache.path(cache.key(source_code)), 'wb') as f:
+        f.write(b'not a pickle')
+    assert cache.load(source_code) is None
+    assert os.listdir(tmp_path) == []
+
+def test_lru_eviction(tmp_path) -> None:
+    cache = CompilationCache(str(tmp_path))
+    sources = [f"{{ var x = {i}; x }}" for i in range(3)]
+    for i, source in enumerate(sources):
+        cache.store(source, parse(Tokenizer.tokenize(source)))
+        os.utime(cache.path(cache.key(source)), ns=(i * 10**9, i * 10**9))
+    entry_size = os.path.getsize(cache.path(cache.key(sources[0])))
+    cache.max_bytes = 2 * entry_size
+    cache.evict()
+    assert cache.load(sources[0]) is None
+    assert cache.load(sources[1]) is not None
+    assert cache.load(sources[2]) is not None
+
+def test_file_key_hashes_in_chunks(tmp_path, monkeypatch) -> None:
+    import io
+    import compiler.cache
+    monkeypatch.setattr(compiler.cache, 'READ_CHUNK', 5)
+    cache = CompilationCache(str(tmp_path))
+    assert cache.file_key(io.StringIO(source_code + " ä")) == cache.key(source_code + " ä")
+
+def test_untrusted_directory_is_not_used(tmp_path) -> None:
+    cache = CompilationCache(str(tmp_path / 'cache'))
+    cache.store(source_code, parse(Tokenizer.tokenize(source_code)))
+    assert os.stat(cache.directory).st_mode & 0o777 == 0o700
+    os.chmod(cache.directory, 0o777)
+    assert cache.load(source_code) is None
+    os.remove(cache.path(cache.key(source_code)))
+    cache.store(source_code, parse(Tokenizer.tokenize(source_code)))
+    assert os.listdir(cache.directory) == []
@@ -0,0 +1,51 @@
+from compiler.closure_compiler import compile_closures
+from compiler.interpreter import interpret
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+
+
+def run(source_code: str):
+    return compile_closures(parse(Tokenizer.tokenize(source_code)))()
+
+
+def test_arithmetic() -> None:
+    assert run("1 + 2 * 3") == 7
+    assert run("-7 / 2") == -3
+    assert run("9223372036854775807 * 2") == -2
+
+def test_while_loop(capsys) -> None:
+    run("{ var i = 0; var acc = 0; while i < 5 do { acc = acc + i; i = i + 1; } print_int(acc); }")
+    assert capsys.readouterr().out == "10\n"
+
+def test_if_without_else() -> None:
+    assert run("{ var x = 1; if x < 2 then x = 5; x }") == 5
+
+def test_matches_tree_interpreter() -> None:
+    source_code = """
+    {
+        var a = 0;
+        var x = 50;
+        var acc = 0;
+        while a < x do {
+            var asd = 2;
+            if a % 3 == 0 then acc = acc + asd * a else acc = acc - 1;
+            a = a + 1;
+        }
+        acc
+    }
+    """
+    tree = parse(Tokenizer.tokenize(source_code))
+    assert compile_closures(tree)() == interpret(tree)
+
+def test_long_operator_chain() -> None:
+    # Longer than one closure segment, and order-sensitive.
+    terms = ' - '.join(str(i) for i in range(1, 5000))
+    assert run(f"1000000 - {terms}") == 1000000 - sum(range(1, 5000))
+    conditions = ' and '.join(f'x < {i}' for i in range(200))
+    assert run(f"{{ var x = 5; {conditions} }}") is False
+
+def test_deeply_nested_blocks() -> None:
+    depth = 3000
+    source_code = '{ var x = 0; ' * depth + 'x = x + 1; x' + ' }' * depth
+    assert run(source_code) == 1
+    assert run('{ var y = 1; ' + '{ y = y + 1; ' * depth + '}' * depth + ' y }') == depth + 1
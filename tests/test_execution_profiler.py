@@ -0,0 +1,60 @@
+import sys
+
+from compiler.__main__ import main
+from compiler.execution_profiler import annotate_source, folded_stacks, profile_ir, profile_tree
+from compiler.ir_generator import generate_ir
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+
+source_code = """{
+    var i = 0;
+    while i < 3 do {
+        var j = 0;
+        while j < 2 do { j = j + 1; }
+        i = i + 1;
+    }
+    i
+}"""
+
+
+def test_tree_counts_and_loops() -> None:
+    result, profile = profile_tree(parse(Tokenizer.tokenize(source_code)))
+    assert result == 3
+    assert {location: stats.iterations for location, stats in profile.loops.items()} == {
+        (3, 10): 3, (5, 14): 6,
+    }
+    lines = profile.line_counts()
+    # Three loop entries, nine three-node conditions, six five-node bodies.
+    assert lines[5] == 3 + 9 * 3 + 6 * 5
+    assert lines[3] == 1 + 4 * 3
+    assert set(profile.stacks) <= {('program',), ('program', 'while@3:10'),
+                                   ('program', 'while@3:10', 'while@5:14')}
+
+def test_ir_instruction_counts() -> None:
+    result, profile = profile_ir(generate_ir(parse(Tokenizer.tokenize(source_code))))
+    assert result == 3
+    counts = {str(ins): count for ins, count in profile.instructions}
+    assert max(counts.values()) == 9
+    assert sum(weight for stack, weight in profile.stacks.items()) == sum(
+        count for ins, count in profile.instructions if not str(ins).startswith('.L'))
+
+def test_listing_and_folded_output() -> None:
+    _, profile = profile_tree(parse(Tokenizer.tokenize(source_code)))
+    listing = annotate_source(source_code, profile).splitlines()
+    assert len(listing) == source_code.count('\n') + 2
+    assert listing[3].split('|')[0].split()[:2] == ['13', '3']
+    for line in folded_stacks(profile).splitlines():
+        stack, weight = line.rsplit(' ', 1)
+        assert stack.startswith('program') and int(weight) > 0
+
+def test_driver_writes_profile(tmp_path, monkeypatch, capsys) -> None:
+    source = tmp_path / 'program.txt'
+    source.write_text("{ var x = 0; while x < 5 do { x = x + 1; } print_int(x); }")
+    prefix = tmp_path / 'profile'
+    monkeypatch.setattr(sys, 'argv', ['compiler', 'interpret', '--no-cache', '--engine=ir',
+                                      f'--exec-profile={prefix}', str(source)])
+    assert main() == 0
+    assert capsys.readouterr().out == "5\n"
+    assert 'print_int(x)' in (tmp_path / 'profile.listing').read_text()
+    assert 'Call(print_int' in (tmp_path / 'profile.ir.listing').read_text()
+    assert (tmp_path / 'profile.folded').read_text().startswith('program;')
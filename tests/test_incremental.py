@@ -0,0 +1,65 @@
+import pytest
+
+from compiler.incremental import check, recheck
+from compiler.types import Bool, Int, Unit
+
+source_code = """{
+    var a = 1;
+    var b = a + 2;
+    # a comment
+    while a < b do {
+        a = a + 1;
+    }
+    b
+}"""
+
+
+def test_full_check() -> None:
+    program = check(source_code)
+    assert program.type is Int()
+    assert len(program.statements) == 4
+    assert len(program.changed) == 4
+
+def test_edit_rechecks_only_damaged_statement() -> None:
+    program = check(source_code)
+    ids = [s.node_id for s in program.statements]
+    edited = recheck(program, source_code.replace("a = a + 1", "a = a + 10"))
+    assert [type(node).__name__ for node in edited.changed] == ['WhileLoop']
+    assert [s.node_id for s in edited.statements] == ids
+    assert edited.statements[0].node is program.statements[0].node
+    assert edited.type is Int()
+
+def test_inserted_lines_move_later_locations() -> None:
+    program = check(source_code)
+    b_location = program.tree.expressions[3].location
+    edited = recheck(program, source_code.replace("var b = a + 2;", "var b = a + 2;\n    var c = true;\n"))
+    assert [type(node).__name__ for node in edited.changed] == ['Variable']
+    assert edited.statements[3].node is program.statements[2].node
+    assert len(edited.statements) == 5
+    assert edited.tree.expressions[4].location == (b_location[0] + 2, b_location[1])
+
+def test_type_change_propagates_to_later_statements() -> None:
+    program = check(source_code)
+    with pytest.raises(ValueError, match="must be of type Int"):
+        recheck(program, source_code.replace("var a = 1;", "var a = true;"))
+
+def test_edit_in_comment_changes_nothing() -> None:
+    program = check(source_code)
+    edited = recheck(program, source_code.replace("a comment", "an edited comment"))
+    assert edited.changed == []
+    assert edited.type is Int()
+
+def test_edit_outside_block_falls_back_to_full_check() -> None:
+    program = check(source_code)
+    edited = recheck(program, "# header\n" + source_code)
+    assert len(edited.changed) == 4
+    assert edited.tree.expressions[3].location == (9, 4)
+
+def test_matches_full_check() -> None:
+    program = check(source_code)
+    new_source = source_code.replace("    b\n", "    b < a\n")
+    assert recheck(program, new_source).type is check(new_source).type is Bool()
+
+def test_body_is_inside_the_program_block_braces() -> None:
+    program = check(source_code + "\n# { a } comment")
+    assert (program.body_start, program.body_end) == (1, len(source_code) - 1)
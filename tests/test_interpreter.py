@@ -0,0 +1,44 @@
+import pytest
+
+from compiler.interpreter import interpret, resolve
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+
+
+def run(source_code: str):
+    return interpret(parse(Tokenizer.tokenize(source_code)))
+
+
+def test_arithmetic() -> None:
+    assert run("1 + 2 * 3") == 7
+    assert run("-7 / 2") == -3
+    assert run("-7 % 2") == -1
+
+def test_while_loop(capsys) -> None:
+    run("{ var i = 0; var acc = 0; while i < 5 do { acc = acc + i; i = i + 1; } print_int(acc); }")
+    assert capsys.readouterr().out == "10\n"
+
+def test_if_then_else() -> None:
+    assert run("{ var x = 3; if x < 2 then 10 else 20 }") == 20
+    assert run("{ var x = 1; if x < 2 then 10 else 20 }") == 10
+
+def test_shadowing_in_nested_block() -> None:
+    assert run("{ var x = 1; { var x = 2; x = x + 1; } x }") == 1
+
+def test_integer_overflow_wraps() -> None:
+    assert run("9223372036854775807 + 1") == -9223372036854775808
+
+def test_resolve_slots() -> None:
+    tree = parse(Tokenizer.tokenize("{ var a = 1; { var b = a; b } }"))
+    resolution = resolve(tree)
+    inner = tree.expressions[1]
+    assert resolution.slots[id(inner.expressions[0].value)] == (1, 0)
+    assert resolution.slots[id(inner.expressions[1])] == (2, 0)
+
+def test_undefined_name() -> None:
+    with pytest.raises(NameError, match="Name 'y' not defined"):
+        run("{ var x = 1; y }")
+
+def test_long_operator_chain() -> None:
+    terms = ' + '.join(f'x * {i % 5}' for i in range(5000))
+    assert run(f"{{ var x = 2; {terms} }}") == 2 * sum(i % 5 for i in range(5000))
@@ -0,0 +1,60 @@
+from compiler import ir
+from compiler.closure_compiler import compile_closures
+from compiler.interpreter import interpret
+from compiler.ir_generator import generate_ir
+from compiler.ir_optimizer import optimize_ir
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+from compiler.transpiler import compile_python
+from compiler.vm import assemble, execute, run
+
+
+def lower(source_code: str) -> ir.IRProgram:
+    return generate_ir(parse(Tokenizer.tokenize(source_code)))
+
+
+def test_lower_binary_op() -> None:
+    program = lower("1 + 2")
+    body = [str(ins) for ins in program.instructions[2:]]
+    assert body == ['LoadIntConst(1, r3)', 'LoadIntConst(2, r4)', 'Call(+, [r3, r4], r5)']
+    assert program.result == ir.IRVar(5)
+
+def test_lower_while_loop_uses_labels_and_jumps() -> None:
+    program = lower("{ var i = 0; while i < 3 do { i = i + 1; } i }")
+    kinds = [type(ins).__name__ for ins in program.instructions]
+    assert kinds.count('Label') == 3
+    assert kinds.count('CondJump') == 1
+    assert kinds.count('Jump') == 1
+
+def test_vm_arithmetic() -> None:
+    assert execute(lower("(1 + 2) * 3 - 4 / 2")) == 7
+    assert execute(lower("-7 % 2")) == -1
+
+def test_vm_loop(capsys) -> None:
+    execute(lower("{ var i = 0; var acc = 0; while i < 5 do { acc = acc + i; i = i + 1; } print_int(acc); }"))
+    assert capsys.readouterr().out == "10\n"
+
+def test_vm_short_circuit(capsys) -> None:
+    assert execute(lower("{ var x = 0; if x == 0 or 1 / x > 0 then 1 else 2 }")) == 1
+
+def test_bytecode_is_flat_int_array() -> None:
+    bytecode = assemble(lower("{ var x = 1; x = x + 1; x }"))
+    assert bytecode.code.typecode == 'q'
+    assert len(bytecode.code) % 4 == 0
+    assert run(bytecode) == 2
+
+def test_operands_keep_values_from_before_later_assignments() -> None:
+    programs = {
+        "{ var x = 2; x * (x = 3) * x }": 18,
+        "{ var x = 2; x + (x = 5) * x }": 27,
+        "{ var x = 1; var y = (x = 4) * (x = 5); y + x }": 25,
+    }
+    for source_code, expected in programs.items():
+        tree = parse(Tokenizer.tokenize(source_code))
+        results = [interpret(tree), compile_closures(tree)(), compile_python(tree)(),
+                   execute(generate_ir(tree)), execute(optimize_ir(generate_ir(tree)))]
+        assert results == [expected] * 5, source_code
+
+def test_lowers_long_operator_chain() -> None:
+    terms = ' - '.join(str(i) for i in range(1, 5000))
+    assert execute(lower(f"1000000 - {terms}")) == 1000000 - sum(range(1, 5000))
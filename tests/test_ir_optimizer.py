@@ -0,0 +1,74 @@
+from compiler import ir
+from compiler.cfg import build_cfg, from_ssa, sequentialize_copies, to_ssa
+from compiler.ir import IRVar
+from compiler.ir_generator import generate_ir
+from compiler.ir_optimizer import PassManager
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+from compiler.vm import execute
+
+loop_program = """
+{
+    var i = 0;
+    var acc = 0;
+    var a = 3;
+    while i < 10 do {
+        var k = a * 4 + 1;
+        if i % 2 == 0 and a * 4 + 1 > 5 then acc = acc + k else acc = acc - 1;
+        i = i + 1;
+    }
+    var x = 1;
+    var y = 2;
+    while i > 7 do { var t = x; x = y; y = t; i = i - 1; }
+    print_int(x * 10 + y);
+    acc
+}
+"""
+
+
+def lower(source_code: str) -> ir.IRProgram:
+    return generate_ir(parse(Tokenizer.tokenize(source_code)))
+
+
+def test_ssa_defines_each_register_once() -> None:
+    cfg = build_cfg(lower(loop_program))
+    to_ssa(cfg)
+    dests = [ins.defines() for ins in cfg.instructions() if ins.defines() is not None]
+    assert len(dests) == len(set(dests))
+    assert any(isinstance(ins, ir.Phi) for ins in cfg.instructions())
+    from_ssa(cfg)
+    assert execute(cfg.to_program()) == execute(lower(loop_program))
+
+def test_passes_preserve_behavior(capsys) -> None:
+    program = lower(loop_program)
+    expected = execute(program)
+    expected_out = capsys.readouterr().out
+    assert expected_out == "21\n"
+    optimized = PassManager().run(program)
+    assert execute(optimized) == expected
+    assert capsys.readouterr().out == expected_out
+
+def test_passes_report_removed_instructions() -> None:
+    pass_manager = PassManager()
+    pass_manager.run(lower(loop_program))
+    assert pass_manager.removed['copy-propagation'] > 0
+    assert pass_manager.removed['gvn'] > 0
+    assert pass_manager.removed['licm'] > 0
+    assert pass_manager.instructions_after < pass_manager.instructions_before
+    assert 'gvn: removed' in pass_manager.report()
+
+def test_invariant_code_leaves_loop() -> None:
+    optimized = PassManager().run(lower("{ var a = 3; var i = 0; while i < 5 do { i = i + a * 7; } i }"))
+    loop_start = next(n for n, ins in enumerate(optimized.instructions) if isinstance(ins, ir.Label))
+    multiplies = [n for n, ins in enumerate(optimized.instructions) if isinstance(ins, ir.Call) and ins.fun == '*']
+    assert len(multiplies) == 1 and multiplies[0] < loop_start
+    assert execute(optimized) == 21
+
+def test_division_is_not_hoisted() -> None:
+    optimized = PassManager().run(lower("{ var d = 0; var i = 0; while i < 0 do { i = i + 1 / d; } i }"))
+    assert execute(optimized) == 0
+
+def test_sequentialize_swap() -> None:
+    a, b, temp = IRVar(1), IRVar(2), IRVar(3)
+    copies = sequentialize_copies([(a, b), (b, a)], lambda: temp)
+    assert [str(c) for c in copies] == ['Copy(r1, r3)', 'Copy(r2, r1)', 'Copy(r3, r2)']
@@ -0,0 +1,50 @@
+import sys
+
+from compiler.__main__ import main
+from compiler.metrics import Instrumentation, StageMetrics
+
+
+def test_disabled_records_nothing() -> None:
+    metrics = Instrumentation()
+    assert not metrics.enabled
+    with metrics.stage('parse') as stage:
+        stage.count = lambda: 1 / 0
+    assert metrics.stages == []
+
+def test_hooks_receive_counts() -> None:
+    received: list[StageMetrics] = []
+    metrics = Instrumentation(hooks=[received.append])
+    with metrics.stage('tokenize', unit='tokens') as stage:
+        tokens = ['a', 'b', 'c']
+        stage.count = lambda: len(tokens)
+    assert received == metrics.stages
+    assert (received[0].stage, received[0].items, received[0].unit) == ('tokenize', 3, 'tokens')
+    assert received[0].seconds >= 0
+    assert received[0].allocated_bytes is None
+
+def test_memory_tracking() -> None:
+    metrics = Instrumentation(track_memory=True)
+    metrics.start()
+    try:
+        with metrics.stage('allocate'):
+            data = [object() for _ in range(1000)]
+    finally:
+        metrics.stop()
+    stage = metrics.stages[0]
+    assert stage.allocations is not None and stage.allocations >= 1000
+    assert stage.peak_bytes is not None and stage.peak_bytes >= stage.allocated_bytes > 0
+    assert len(data) == 1000
+    assert 'allocate' in metrics.format_table()
+
+def test_driver_timings_and_profile(tmp_path, monkeypatch, capsys) -> None:
+    source = tmp_path / 'program.txt'
+    source.write_text("{ var x = 2; print_int(x * 3); }")
+    profile = tmp_path / 'out.pstats'
+    monkeypatch.setattr(sys, 'argv', ['compiler', 'interpret', '--no-cache', '--timings',
+                                      f'--profile={profile}', str(source)])
+    assert main() == 0
+    captured = capsys.readouterr()
+    assert captured.out == "6\n"
+    stages = [line.split()[0] for line in captured.err.splitlines()[1:]]
+    assert stages == ['read', 'tokenize', 'parse', 'typecheck', 'optimize', 'closures', 'execute', 'total']
+    assert profile.stat().st_size > 0
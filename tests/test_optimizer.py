@@ -0,0 +1,82 @@
+from compiler import ast
+from compiler.closure_compiler import compile_closures
+from compiler.optimizer import optimize
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+from compiler.type_checker import typecheck
+
+L = (1, 0)
+
+
+def opt(source_code: str) -> ast.Expression:
+    tree = parse(Tokenizer.tokenize(source_code))
+    typecheck(tree)
+    return optimize(tree)
+
+
+def value(tree: ast.Expression):
+    assert isinstance(tree, ast.Literal)
+    return tree.value
+
+def last(tree: ast.Expression) -> ast.Expression:
+    assert isinstance(tree, ast.Block)
+    return tree.expressions[-1]
+
+
+def test_folds_literals() -> None:
+    assert value(opt("1 + 2 * 3")) == 7
+    assert value(opt("-7 / 2")) == -3
+    assert value(opt("9223372036854775807 + 1")) == -9223372036854775808
+    assert value(opt("not (1 < 2) or false")) is False
+    assert isinstance(opt("1 / 0"), ast.BinaryOp)
+
+def test_identities() -> None:
+    assert isinstance(last(opt("{ var x = 1; x * 1 + 0 }")), ast.Identifier)
+    tree = last(opt("{ var x = 1; (x + 1) + 2 }"))
+    assert isinstance(tree, ast.BinaryOp) and isinstance(tree.left, ast.Identifier)
+    assert value(tree.right) == 3
+    assert value(last(opt("{ var x = 1; x * 0 }"))) == 0
+    assert value(last(opt("{ var b = true; b and false }"))) is False
+    assert isinstance(last(opt("{ var b = true; true and b }")), ast.Identifier)
+    # The call has to happen even though the result is known.
+    assert isinstance(opt("read_int() * 0"), ast.BinaryOp)
+
+def test_constant_conditions() -> None:
+    tree = opt("if 1 < 2 then print_int(1) else print_int(2)")
+    assert isinstance(tree, ast.Function) and value(tree.args[0]) == 1
+    assert value(opt("if false then print_int(1)")) is None
+    assert value(opt("{ while 2 < 1 do { print_int(1); } }")) is None
+    tree = opt("{ var x = 1; if true then x = 2; x }")
+    assert [type(e) for e in tree.expressions] == [ast.Variable, ast.Block, ast.Identifier]
+    assert [type(e) for e in tree.expressions[1].expressions] == [ast.Assignment, ast.Literal]
+
+def test_dead_statements() -> None:
+    tree = opt("{ var x = 1; x + 1; 2 * 3; print_int(x); x }")
+    assert isinstance(tree, ast.Block)
+    assert [type(e) for e in tree.expressions] == [ast.Variable, ast.Function, ast.Identifier]
+
+def test_shadowed_constants() -> None:
+    tree = last(opt("{ var true = false; true and true }"))
+    assert isinstance(tree, ast.BinaryOp) and isinstance(tree.left, ast.Identifier)
+    assert value(opt("{ { var true = 1; }; true }")) is True
+
+def test_preserves_behavior(capsys) -> None:
+    source_code = """
+    {
+        var i = 0;
+        var acc = 0;
+        while i < 10 * 10 do {
+            acc = acc + i * (2 + 3) - 0;
+            if 1 == 1 or i > 5 then i = i + 1 else i = i + 2;
+        }
+        print_int(acc);
+    }
+    """
+    compile_closures(opt(source_code))()
+    assert capsys.readouterr().out == "24750\n"
+
+def test_deep_trees_do_not_recurse() -> None:
+    chain: ast.Expression = ast.Literal(L, 0)
+    for _ in range(50_000):
+        chain = ast.BinaryOp(L, chain, '+', ast.Literal(L, 1))
+    assert value(optimize(chain)) == 50_000
@@ -1,8 +1,9 @@
 import pytest
 
 from compiler import tokenizer
-from compiler.ast import BinaryOp, Literal
-from compiler.parser import parse
+from compiler.ast import BinaryOp, Block, Identifier, Literal
+from compiler.parser import ParseError, parse
+from compiler.types import ErrorType
 
 
 def test_parser_simple() -> None:
@@ -36,3 +37,68 @@ def test_with_clauses() -> None:
               tokenizer.Token(type="identifier", text="*", location=(1, 1)),
               tokenizer.Token(type="identifier", text="c", location=(1,1))]
     
+
+
+def test_parse_token_stream() -> None:
+    parsed = parse(tokenizer.Tokenizer.iter_tokens("{ var x = 1; x + 2 }"))
+    assert isinstance(parsed.expressions[1], BinaryOp)
+    assert parsed.expressions[1].right == Literal(location=(1, 17), value=2)
+
+def test_operator_precedence() -> None:
+    parsed = parse(tokenizer.Tokenizer.tokenize("a or b and c < d + e * f"))
+    assert parsed.op == 'or'
+    assert parsed.right.op == 'and'
+    assert parsed.right.right.op == '<'
+    assert parsed.right.right.right.op == '+'
+    assert parsed.right.right.right.right.op == '*'
+
+def test_left_associativity() -> None:
+    parsed = parse(tokenizer.Tokenizer.tokenize("1 - 2 - 3"))
+    assert parsed.left.op == '-'
+    assert parsed.right.value == 3
+
+def test_recovers_at_statement_boundaries() -> None:
+    source_code = "{ var x = ; var y = 2; x + * 3; { 1 + } y }"
+    diagnostics = []
+    parsed = parse(tokenizer.Tokenizer.tokenize(source_code), diagnostics=diagnostics)
+    assert [d.location for d in diagnostics] == [(1, 10), (1, 27), (1, 38)]
+    assert diagnostics[0].message == 'expected "(", an integer literal or an identifier'
+    assert isinstance(parsed, Block)
+    assert parsed.expressions[0].name == Identifier((1, 6), 'x')
+    assert parsed.expressions[0].declared_type is ErrorType()
+    assert parsed.expressions[2] == Block((1, 40), [])
+    assert parsed.expressions[3] == Identifier((1, 40), 'y')
+    with pytest.raises(ParseError, match=r"\(1, 10\): expected"):
+        parse(tokenizer.Tokenizer.tokenize(source_code))
+
+def test_reports_leftover_tokens() -> None:
+    diagnostics = []
+    parsed = parse(tokenizer.Tokenizer.tokenize("{ 1 } 2 3"), diagnostics=diagnostics)
+    assert parsed == Block((1, 6), [Literal((1, 2), 1)])
+    assert [str(d) for d in diagnostics] == ['(1, 6): Couldn\'t parse the whole expression: unexpected "2"']
+    with pytest.raises(ParseError, match=r"\(1, 6\): Couldn't parse"):
+        parse(tokenizer.Tokenizer.tokenize("{ 1 } 2 3"))
+
+def test_recovers_from_unclosed_blocks() -> None:
+    diagnostics = []
+    parse(tokenizer.Tokenizer.tokenize("{ var a = 1; { if a then"), diagnostics=diagnostics)
+    assert [str(d) for d in diagnostics] == [
+        '(1, 20): expected "(", an integer literal or an identifier',
+        '(1, 20): expected "}"',
+    ]
+
+def test_deep_nesting() -> None:
+    depth = 5000
+    parsed = parse(tokenizer.Tokenizer.tokenize('{ ' * depth + '(' * depth + '1' + ')' * depth + ' }' * depth))
+    for _ in range(depth):
+        assert isinstance(parsed, Block)
+        parsed = parsed.expressions[0]
+    assert parsed == Literal((1, 3 * depth), 1)
+    diagnostics = []
+    parse(tokenizer.Tokenizer.tokenize('{ ' * depth + 'var x = ;'), diagnostics=diagnostics)
+    assert [d.message for d in diagnostics] == ['expected "(", an integer literal or an identifier', 'expected "}"']
+
+def test_body_spans() -> None:
+    spans = []
+    parse(tokenizer.Tokenizer.tokenize("{ { 1 } } }"), body_spans=spans, diagnostics=[])
+    assert spans == [(1, 8)]
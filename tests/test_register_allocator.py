@@ -0,0 +1,43 @@
+from compiler import ir
+from compiler.ir_generator import generate_ir
+from compiler.parser import parse
+from compiler.register_allocator import allocate_registers, live_intervals
+from compiler.tokenizer import Tokenizer
+
+loop_program = "{ var i = 0; var acc = 0; while i < 10 do { acc = acc + i * i; i = i + 1; } print_int(acc); }"
+
+
+def lower(source_code: str) -> ir.IRProgram:
+    return generate_ir(parse(Tokenizer.tokenize(source_code)))
+
+
+def variable_register(program: ir.IRProgram, name_value: int) -> ir.IRVar:
+    """The register a `var` initialized with the literal `name_value` is copied into."""
+    for load, copy in zip(program.instructions, program.instructions[1:]):
+        if isinstance(load, ir.LoadIntConst) and load.value == name_value and isinstance(copy, ir.Copy):
+            return copy.dest
+    raise AssertionError(name_value)
+
+
+def test_loop_variables_live_across_back_edge() -> None:
+    program = lower("{ var i = 7; while i < 10 do { i = i + 1; } print_int(1); }")
+    i = variable_register(program, 7)
+    interval = live_intervals(program)[i]
+    back_edge = max(n for n, ins in enumerate(program.instructions) if isinstance(ins, ir.Jump))
+    assert interval.start < back_edge <= interval.end
+
+def test_overlapping_intervals_get_different_registers() -> None:
+    program = lower(loop_program)
+    intervals = live_intervals(program)
+    assignment = allocate_registers(program)
+    assert set(assignment) == set(intervals)
+    for a in intervals.values():
+        for b in intervals.values():
+            if a.var != b.var and a.start <= b.end and b.start <= a.end:
+                assert assignment[a.var] != assignment[b.var]
+
+def test_spills_cold_registers_first() -> None:
+    program = lower("{ var i = 7; var unused = 1; var limit = 10; while i < limit do { i = i + 1; } print_int(unused); }")
+    assignment = allocate_registers(program, registers=['%rbx', '%r12'])
+    assert variable_register(program, 7) in assignment
+    assert variable_register(program, 1) not in assignment
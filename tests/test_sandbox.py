@@ -0,0 +1,47 @@
+import pytest
+
+from compiler.__main__ import main
+from compiler.parser import parse
+from compiler.sandbox import Limits, ResourceLimitExceeded, run_governed
+from compiler.tokenizer import Tokenizer
+from compiler.type_checker import typecheck
+
+
+def run(source_code: str, limits: Limits, engine: str = 'closures'):
+    tree = parse(Tokenizer.tokenize(source_code))
+    typecheck(tree)
+    return run_governed(tree, limits, engine)
+
+
+@pytest.mark.parametrize('engine', ['closures', 'tree'])
+def test_step_limit_counts_iterations_and_calls(engine: str, capsys) -> None:
+    source_code = "{ var i = 0; while i < 10 do { print_int(i); i = i + 1; } i }"
+    assert run(source_code, Limits(max_steps=20), engine) == 10
+    capsys.readouterr()
+    with pytest.raises(ResourceLimitExceeded) as e:
+        run(source_code, Limits(max_steps=19), engine)
+    assert e.value.limit == 'step'
+    assert e.value.location == (1, 58)
+    assert capsys.readouterr().out == "0\n1\n2\n3\n4\n5\n6\n7\n8\n9\n"
+
+@pytest.mark.parametrize('engine', ['closures', 'tree'])
+def test_timeout_stops_endless_loops(engine: str) -> None:
+    with pytest.raises(ResourceLimitExceeded, match="time limit of 0.05 exceeded"):
+        run("{ var x = 0; while true do { x = x + 1; } }", Limits(timeout=0.05), engine)
+
+def test_static_limits() -> None:
+    source_code = "{ var a = 1; { var b = 2; var c = 3; } { var d = 4; { a + d } } }"
+    assert run(source_code, Limits(max_scope_depth=3, max_variables=3)) == 5
+    with pytest.raises(ResourceLimitExceeded) as e:
+        run(source_code, Limits(max_scope_depth=2))
+    assert (e.value.limit, e.value.location) == ('scope depth', (1, 62))
+    with pytest.raises(ResourceLimitExceeded) as e:
+        run(source_code, Limits(max_variables=2))
+    assert (e.value.limit, e.value.location) == ('variable', (1, 30))
+
+def test_driver_reports_exceeded_limits(tmp_path, capsys) -> None:
+    source = tmp_path / 'program.txt'
+    source.write_text("{ while true do { } }")
+    assert main(['interpret', '--no-cache', '--max-steps=1000', str(source)]) == 1
+    assert capsys.readouterr().err == "Error: step limit of 1000 exceeded at (1, 20)\n"
+    assert main(['interpret', '--no-cache', '--engine=ir', '--timeout=1', str(source)]) == 1
@@ -0,0 +1,40 @@
+import io
+import os
+import subprocess
+import sys
+import threading
+
+from compiler import client
+from compiler.server import CompileServer, RequestHandler
+
+
+def test_client_round_trip(tmp_path, monkeypatch, capsys) -> None:
+    socket_path = str(tmp_path / 'compiler.sock')
+    server = CompileServer(socket_path, RequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(''))
+    try:
+        source = tmp_path / 'program.txt'
+        source.write_text("{ var x = 20; print_int(x + 1); }")
+        assert client.main([f'--socket={socket_path}', 'interpret', '--no-cache', str(source)]) == 0
+        assert capsys.readouterr().out == "21\n"
+
+        source.write_text("1 + true")
+        assert client.main([f'--socket={socket_path}', 'check', '--no-cache', str(source)]) == 1
+        assert "must be of type Int" in capsys.readouterr().err
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_client_without_server(tmp_path, capsys) -> None:
+    assert client.main([f'--socket={tmp_path / "missing.sock"}', 'check', 'program.txt']) == 1
+    assert "no compiler server" in capsys.readouterr().err
+
+def test_help_imports_no_compiler_modules() -> None:
+    src_dir = os.path.join(os.path.dirname(__file__), '..', 'src')
+    code = ("import sys; from compiler.__main__ import main; main(['--help']); "
+            "print(sorted(m for m in sys.modules if m.startswith('compiler.')))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            env={**os.environ, 'PYTHONPATH': src_dir})
+    assert result.stdout.splitlines()[-1] == "['compiler.__main__']"
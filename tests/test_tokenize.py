@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from compiler.tokenizer import Tokenizer, Token
@@ -20,5 +21,25 @@ def test_with_comments() -> None:
     values = Tokenizer.tokenize("if 3 < while\n# aaaa\n//      asd")
     assert get_tokenlist(values) == ['if', '3', '<', 'while']
 
+def test_locations_from_offsets() -> None:
+    values = Tokenizer.tokenize("if 3\n  while x")
+    assert [token.offset for token in values] == [0, 3, 7, 13]
+    assert [token.location for token in values] == [(1, 0), (1, 3), (2, 2), (2, 8)]
+
+def test_keyword_types() -> None:
+    values = Tokenizer.tokenize("while x")
+    assert [token.type for token in values] == ['while', 'identifier']
+
+def test_iter_tokens_from_file_object() -> None:
+    source_code = "if 3\n  while x # comment\n{ y }"
+    streamed = list(Tokenizer.iter_tokens(io.StringIO(source_code)))
+    assert get_tokenlist(streamed) == get_tokenlist(Tokenizer.tokenize(source_code))
+    assert [token.location for token in streamed] == [token.location for token in Tokenizer.tokenize(source_code)]
+
+def test_iter_tokens_is_lazy() -> None:
+    stream = Tokenizer.iter_tokens("1 + $")
+    assert next(stream).text == '1'
+    assert next(stream).text == '+'
+
 def get_tokenlist(obj_list):
        return [token.text for token in obj_list]
\ No newline at end of file
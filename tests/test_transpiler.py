@@ -0,0 +1,44 @@
+import ast as pyast
+
+from compiler.bench import expression_chain, nested_blocks
+from compiler.closure_compiler import compile_closures
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+from compiler.transpiler import compile_python, transpile
+from compiler.type_checker import typecheck
+
+
+def run(source_code: str):
+    return compile_python(parse(Tokenizer.tokenize(source_code)))()
+
+
+def test_arithmetic_wraps_like_64_bit_integers() -> None:
+    assert run("1 + 2 * 3") == 7
+    assert run("-7 / 2") == -3
+    assert run("-7 % 2") == -1
+    assert run("9223372036854775807 * 2") == -2
+    assert run("9223372036854775807 + 1") == -9223372036854775808
+    assert run("-(0 - 9223372036854775807 - 1)") == -9223372036854775808
+
+def test_loops_and_output(capsys) -> None:
+    run("{ var i = 0; var acc = 0; while i < 5 do { acc = acc + i; i = i + 1; } print_int(acc); print_bool(acc > 9); }")
+    assert capsys.readouterr().out == "10\ntrue\n"
+
+def test_evaluation_order_with_side_effects() -> None:
+    assert run("{ var x = 1; x + (x = 10) }") == 11
+    assert run("{ var x = 1; var y = (if x < 2 then (x = 5) else 0) * x; y }") == 25
+    assert run("{ var x = 0; false and (x = 1) > 0; true or (x = 2) > 0; x }") == 0
+    assert run("{ var x = 1; { var x = 2; x = x + 1; } x }") == 1
+
+def test_generates_python_loops() -> None:
+    module = transpile(parse(Tokenizer.tokenize("{ var i = 0; while i < 3 do { i = i + 1; } i }")))
+    assert any(isinstance(node, pyast.While) for node in pyast.walk(module))
+
+def test_deep_programs_match_closures(capsys) -> None:
+    for source_code in [expression_chain(3000), nested_blocks(200)]:
+        tree = parse(Tokenizer.tokenize(source_code))
+        typecheck(tree)
+        compile_closures(tree)()
+        expected = capsys.readouterr().out
+        compile_python(tree)()
+        assert capsys.readouterr().out == expected
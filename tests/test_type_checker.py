@@ -0,0 +1,110 @@
+import pytest
+
+from compiler import ast
+from compiler.__main__ import main
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+from compiler.type_checker import typecheck
+from compiler.types import Bool, Int, Unit
+
+
+def check(source_code: str):
+    return typecheck(parse(Tokenizer.tokenize(source_code)))
+
+
+def test_basic_types() -> None:
+    assert check("1 + 2") is Int()
+    assert check("1 < 2") is Bool()
+    assert check("{ var x = 1; while x < 2 do { x = x + 1; } }") is Unit()
+    assert check("unit") is Unit()
+
+def test_logical_operators() -> None:
+    assert check("not (1 < 2) and true or false") is Bool()
+    with pytest.raises(ValueError, match="operands of binary operator 'and' must be of type Bool"):
+        check("1 and true")
+    with pytest.raises(ValueError, match="operand of unary 'not' must be of type Bool"):
+        check("not 1")
+
+def test_diagnostics() -> None:
+    with pytest.raises(ValueError, match="must be of type Int"):
+        check("1 + (2 < 3)")
+    with pytest.raises(ValueError, match="condition expression must be of type Bool"):
+        check("if 1 then 2 else 3")
+    with pytest.raises(ValueError, match="type mismatch in argument for function"):
+        check("print_int(true)")
+    with pytest.raises(NameError, match="Name 'y' not defined"):
+        check("{ var x = 1; y }")
+
+def test_declared_types() -> None:
+    assert check("{ var x: Int = 1; x }") is Int()
+    assert check("{ var b: Bool = 1 < 2; b }") is Bool()
+    with pytest.raises(ValueError, match="type mismatch in declaration of variable 'x'"):
+        check("{ var x: Int = true; x }")
+    diagnostics = []
+    typecheck(parse(Tokenizer.tokenize("{ var x: Int = true; x + 1 }")), diagnostics=diagnostics)
+    assert [(d.location, d.message) for d in diagnostics] == [((1, 19), "type mismatch in declaration of variable 'x'")]
+
+def test_deep_trees_do_not_recurse() -> None:
+    depth = 50_000
+    chain: ast.Expression = ast.Literal((1, 0), 0)
+    for _ in range(depth):
+        chain = ast.BinaryOp((1, 0), chain, '+', ast.Literal((1, 0), 1))
+    assert typecheck(chain) is Int()
+
+    nested: ast.Expression = ast.Literal((1, 0), 1)
+    for _ in range(depth):
+        nested = ast.Block((1, 0), [nested])
+    assert typecheck(nested) is Int()
+
+    # The innermost block reads a variable declared in the outermost one.
+    scoped: ast.Expression = ast.Identifier((1, 0), 'x')
+    for _ in range(depth):
+        scoped = ast.Block((1, 0), [scoped])
+    declaration = ast.Variable((1, 0), ast.Identifier((1, 0), 'x'), ast.Literal((1, 0), True))
+    assert typecheck(ast.Block((1, 0), [declaration, scoped])) is Bool()
+
+def test_collects_all_type_errors() -> None:
+    source_code = """{
+        var x = 1 + true;
+        var y: Int = 2;
+        if y then x = false;
+        print_int(z);
+        y = x * 2;
+        3(4)
+    }"""
+    diagnostics = []
+    typecheck(parse(Tokenizer.tokenize(source_code)), diagnostics=diagnostics)
+    assert [(d.location[0], d.message) for d in diagnostics] == [
+        (2, "operands of binary operator '+' must be of type Int"),
+        (4, "condition expression must be of type Bool"),
+        (5, "Name 'z' not defined"),
+    ]
+
+def test_check_command_reports_every_error(tmp_path, capsys) -> None:
+    source = tmp_path / 'program.txt'
+    source.write_text("{ var a = 1 +; var b = not 2; a }")
+    assert main(['check', '--no-cache', str(source)]) == 1
+    assert capsys.readouterr().err.splitlines() == [
+        'Error: (1, 13): expected "(", an integer literal or an identifier',
+        "Error: (1, 28): operand of unary 'not' must be of type Bool",
+    ]
+
+def test_call_errors_name_the_function() -> None:
+    diagnostics = []
+    typecheck(parse(Tokenizer.tokenize("{ print_int(1, 2); print_int(true) }")), diagnostics=diagnostics)
+    assert [d.message for d in diagnostics] == [
+        "incorrect number of arguments for function 'print_int'",
+        "type mismatch in argument for function 'print_int'",
+    ]
+
+def test_invalid_assignment_targets() -> None:
+    diagnostics = []
+    typecheck(parse(Tokenizer.tokenize("{ var y = 1; 1 = 2; y + 1 = 2; -y = true + 1 }")), diagnostics=diagnostics)
+    assert [(d.location, d.message) for d in diagnostics] == [
+        ((1, 18), "invalid assignment target"),
+        ((1, 29), "invalid assignment target"),
+        ((1, 45), "operands of binary operator '+' must be of type Int"),
+        ((1, 45), "invalid assignment target"),
+    ]
+    with pytest.raises(ValueError, match="invalid assignment target"):
+        typecheck(parse(Tokenizer.tokenize("1 = 2")))
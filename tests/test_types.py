@@ -0,0 +1,25 @@
+import pickle
+
+from compiler.types import Bool, FunType, Int, Unit
+
+
+def test_primitive_types_are_singletons() -> None:
+    assert Int() is Int()
+    assert Bool() is Bool()
+    assert Unit() is Unit()
+    assert Int() is not Bool()
+
+def test_function_types_are_hash_consed() -> None:
+    assert FunType([Int(), Bool()], Unit()) is FunType((Int(), Bool()), Unit())
+    assert FunType([Int()], Unit()) is not FunType([Bool()], Unit())
+    assert str(FunType([Int(), Bool()], Unit())) == "(Int, Bool) -> None"
+
+def test_types_as_dict_keys() -> None:
+    table = {Int(): 'int', FunType([Int()], Int()): 'fun'}
+    assert table[Int()] == 'int'
+    assert table[FunType([Int()], Int())] == 'fun'
+
+def test_pickling_preserves_identity() -> None:
+    fun = FunType([Int()], Bool())
+    assert pickle.loads(pickle.dumps(fun)) is fun
+    assert pickle.loads(pickle.dumps(Unit())) is Unit()
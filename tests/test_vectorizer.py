@@ -0,0 +1,78 @@
+import pytest
+
+from compiler import ast
+from compiler.closure_compiler import compile_closures
+from compiler.interpreter import resolve
+from compiler.parser import parse
+from compiler.tokenizer import Tokenizer
+from compiler.type_checker import typecheck
+from compiler.vectorizer import analyze_loop, trip_count
+
+
+def analyze(source_code: str):
+    tree = parse(Tokenizer.tokenize(source_code))
+    loop = next(node for node in ast.walk(tree) if isinstance(node, ast.WhileLoop))
+    return analyze_loop(loop, resolve(tree))
+
+
+def test_recognizes_counted_loops() -> None:
+    loop = analyze("{ var n = 10; var i = 0; var acc = 0; var last = 0; "
+                   "while i < n do { acc = acc + i * 2; last = i % 3; i = i + 1; } }")
+    assert loop is not None
+    assert (loop.step, loop.comparison) == (1, '<')
+    assert [a.then.sign for a in loop.accumulations] == [1]
+    assert len(loop.assignments) == 1
+
+    loop = analyze("{ var i = 100; var acc = 0; "
+                   "while 0 <= i do { if i % 3 == 0 then acc = acc - i else acc = acc + 1; i = i - 2; } }")
+    assert loop is not None
+    assert (loop.step, loop.comparison) == (-2, '>=')
+
+def test_rejects_loops_with_effects_or_dependencies() -> None:
+    assert analyze("{ var i = 0; while i < 10 do { print_int(i); i = i + 1; } }") is None
+    assert analyze("{ var i = 0; var n = 10; while i < n do { n = n - 1; i = i + 1; } }") is None
+    assert analyze("{ var i = 0; var a = 0; var b = 0; while i < 10 do { a = a + 1; b = b + a; i = i + 1; } }") is None
+    assert analyze("{ var i = 0; var a = 0; while i < 10 do { a = a * 2; i = i + 1; } }") is None
+    assert analyze("{ var i = 0; var s = 1; while i < 10 do { i = i + s; } }") is None
+    assert analyze("{ var i = 0; while i < 10 do { i = i - 1; } }") is None
+    assert analyze("{ var i = 0; var a = 0; while i < 10 do { i = i + 1; a = a + i; } }") is None
+
+def test_trip_count() -> None:
+    assert trip_count(0, 10, 3, '<') == 4
+    assert trip_count(0, 9, 3, '<=') == 4
+    assert trip_count(10, 0, -3, '>') == 4
+    assert trip_count(5, 0, 1, '<') == 0
+    assert trip_count(0, 10, 3, '!=') is None
+    assert trip_count(0, 2**63 - 1, 2, '<=') is None
+
+def run(source_code: str, vectorize: bool) -> None:
+    tree = parse(Tokenizer.tokenize(source_code))
+    typecheck(tree)
+    compile_closures(tree, vectorize)()
+
+@pytest.mark.parametrize('source_code', [
+    "{ var i = 0; var acc = 0; var last = 0; while i < 100000 do { acc = acc + i * i % 7; last = i / 3; i = i + 1; } "
+    "print_int(i); print_int(acc); print_int(last); }",
+    "{ var i = 0; var acc = 0; while i < 10000 do { acc = acc + i * 9223372036854775807; i = i + 1; } print_int(acc); }",
+    "{ var i = 5000; var acc = 0; while i > -5000 do "
+    "{ if i % 3 == 0 then acc = acc - i / 7 else acc = acc + -i % 5; i = i - 3; } print_int(i); print_int(acc); }",
+    "{ var i = 0; var acc = 0; while i != 3000 do { acc = acc + (if i < 1500 then 1 else 2); i = i + 3; } print_int(acc); }",
+])
+def test_vectorized_loops_match_scalar_loops(source_code: str, capsys) -> None:
+    pytest.importorskip('numpy')
+    run(source_code, vectorize=False)
+    expected = capsys.readouterr().out
+    run(source_code, vectorize=True)
+    assert capsys.readouterr().out == expected
+
+def test_falls_back_where_arrays_cannot_be_used(capsys) -> None:
+    pytest.importorskip('numpy')
+    # Division by zero halfway through must still raise, after the same output.
+    source_code = "{ var i = 0; var acc = 0; while i < 200000 do { acc = acc + 1000 / (i - 150000); i = i + 1; } }"
+    with pytest.raises(ZeroDivisionError):
+        run(source_code, vectorize=True)
+    # The counter wraps around before reaching the bound.
+    source_code = ("{ var i = 9223372036854775807 - 5000; var n = 0; "
+                   "while i != -9223372036854775807 + 999 do { n = n + 1; i = i + 1; } print_int(n); }")
+    run(source_code, vectorize=True)
+    assert capsys.readouterr().out == "6001\n"